@@ -21,11 +21,14 @@ from .core.pipeline.data_pipeline import (
     condition_pipeline
 )
 from .core.pipeline import PipelineInfo, Pipeline
+from .core.pipeline.chunk import Chunk
+from .core.pipeline.encoded import Encoded
 from .core.flow import Flow
 from .core.flow.step import step
 from .core.producer import Producer
 from .core.producer.batch import BatchProducer
 from .core.producer.spark import SparkProducer
+from .core.producer.checkpoint import Checkpoint, Watermark
 from .core.producer import signals as producer_signals
 from .core.consumer import Consumer
 from .core.consumer.iter import ConsumerIter
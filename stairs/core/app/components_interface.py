@@ -1,6 +1,11 @@
+import os
+import re
+
 from typing import Union
 from stairs.core.producer import Producer
 from stairs.core.producer.batch import BatchProducer
+from stairs.core.producer import files
+from stairs.core.producer.tables import TableReader
 from stairs.core.consumer import Consumer
 from stairs.core.consumer.standalone import StandAloneConsumer
 from stairs.core.consumer.iter import ConsumerIter
@@ -27,7 +32,15 @@ class ComponentsMixin:
                  *pipelines: Pipeline,
                  single_transaction=False,
                  repeat_on_signal=None,
-                 repeat_times=None):
+                 repeat_times=None,
+                 chunk_size=None,
+                 flush_interval=None,
+                 queue_limit=None,
+                 queue_low_limit=None,
+                 transaction_chunk_size=None,
+                 concurrency=None,
+                 read_ahead=None,
+                 track_runs=False):
         """
         Creates Stairs producer component.
 
@@ -71,12 +84,83 @@ class ComponentsMixin:
 
             producer_function("Hello world")
 
+        Producer function could be `async def` generator as well. It's
+        executed by event loop in a separate thread, while jobs are written
+        to streaming service. Async producer could yield awaitables (e.g.
+        coroutines which fetch a page of data), up to `concurrency` of them
+        are executed at once:
+
+            @producer(my_pipeline, concurrency=20)
+            async def producer_function():
+                for page in range(100):
+                    yield fetch_page(page)
+
+        Jobs of awaitables are not ordered, `Checkpoint` yielded after them
+        waits until they are done. Producer with `transaction_chunk_size`
+        can't yield awaitables.
+
 
         `single_transaction` allows you to commit all data which were
         return/yield by producer function to streaming service, at once. It
         useful when you need to achieve high fault tolerance, but it could be a
         problem for memory and network limits.
 
+        `transaction_chunk_size` splits single transaction into chunks of
+        this size. Each chunk committed atomically, and amount of committed
+        chunks is stored, so if producer failed, next run with the same
+        arguments starts from the first not committed chunk (producer should
+        yield data in the same order).
+
+        Jobs are written to streaming service by chunks: up to `chunk_size`
+        jobs for all pipelines by one request (one transaction for redis).
+        Chunk is written earlier, when `flush_interval` seconds passed since
+        previous write, even if producer function doesn't yield new jobs.
+
+        Producer pauses when queue of any pipeline reaches `queue_limit` jobs,
+        and resumes when workers reduce it to `queue_low_limit` jobs (half of
+        `queue_limit` by default). Queues size is checked about once per
+        second, not for each job.
+
+        If producer reads already serialized data (e.g. JSON Lines), it could
+        yield `stairs.Encoded(line, **header)` instead of a dict. Data is not
+        parsed and serialized again by producer, worker decodes it before
+        pipeline functions are called.
+
+        Producer function could yield `stairs.Checkpoint` (offset, cursor,
+        etc.) between data. Checkpoint is stored in redis, when all data
+        yielded before it is written to streaming service. If producer
+        function has `checkpoint` argument, `producer:run --resume` (or
+        `producer_function.resume()`) passes the last stored checkpoint there:
+
+            @producer(my_pipeline)
+            def producer_function(checkpoint=None):
+                for page in range(checkpoint or 0, 100):
+                    yield from read_page(page)
+                    yield Checkpoint(page + 1)
+
+        For `repeat_times` and `repeat_on_signal` producers, it's possible to
+        read only new data on each run. Producer function with `watermark`
+        argument receives the last `stairs.Watermark` (e.g. max `updated_at`)
+        yielded by previous successful run. It's stored after all jobs of the
+        run are written (in the same transaction for redis):
+
+            @producer(my_pipeline, repeat_on_signal=on_pipeline_empty)
+            def producer_function(watermark=None):
+                for row in read_rows(updated_after=watermark):
+                    yield row
+                    yield Watermark(row['updated_at'])
+
+        Producer function with `shard_index` and `shard_count` arguments
+        could be executed by several processes at once, each one should yield
+        only its part of data:
+
+            python manage.py producer:run producer_name --shards 8
+
+        `read_ahead` allows to read producer function in a separate thread,
+        up to `read_ahead` jobs ahead of writing. So reading data source and
+        writing jobs are executed at the same time. When producer done, it
+        prints how long reader and writer waited for each other.
+
         `repeat_on_signal` allows you to repeat producer based on some circle
         action. When producer done, stairs waiting until `repeat_on_signal`
         function return True, and then rerun this producer.
@@ -94,6 +178,16 @@ class ComponentsMixin:
             def my_producer():
                 return dict()
 
+        `producer_signals.on_run_completed` doesn't scan queues. Each
+        producer run gets run id, and stairs counts outstanding jobs of the
+        run through all pipelines (`track_runs` enables it for other
+        signals). Signal fires right after the last job of the run done:
+
+            @producer(my_pipeline,
+                      repeat_on_signal=producer_signals.on_run_completed)
+            def my_producer():
+                return dict()
+
         You can define custom repeat_on_signal function as following:
 
             def custom_producer_repeat(producer: Producer):
@@ -102,9 +196,22 @@ class ComponentsMixin:
         :param pipelines: list of Stairs pipelines
         :param single_transaction: True - if you want to commit data which were
         yield in one transaction
+        :param transaction_chunk_size: amount of jobs committed in one
+        transaction, when `single_transaction` is True
         :param repeat_on_signal: function which define when we need to repeat
         producer
         :param repeat_times: amount of times we need to repeat producer
+        :param chunk_size: max amount of jobs written to streaming service
+        at once
+        :param flush_interval: max time (in seconds) which job waits in
+        buffer before writing
+        :param queue_limit: max amount of jobs in pipeline queue
+        :param queue_low_limit: amount of jobs in pipeline queue when paused
+        producer resumes
+        :param concurrency: max amount of awaitables executed at once by
+        async producer
+        :param read_ahead: max amount of jobs read ahead of writing
+        :param track_runs: True - count outstanding jobs of each run
         :return: function wrapper which returns Producer
         """
         def _producer_handler_wrap(handler) -> Producer:
@@ -113,15 +220,64 @@ class ComponentsMixin:
                                 default_callbacks=list(pipelines or []),
                                 single_transaction=single_transaction,
                                 repeat_on_signal=repeat_on_signal,
-                                repeat_times=repeat_times)
+                                repeat_times=repeat_times,
+                                chunk_size=chunk_size,
+                                flush_interval=flush_interval,
+                                queue_limit=queue_limit,
+                                queue_low_limit=queue_low_limit,
+                                transaction_chunk_size=transaction_chunk_size,
+                                concurrency=concurrency,
+                                read_ahead=read_ahead,
+                                track_runs=track_runs)
 
             return producer
 
         return _producer_handler_wrap
 
+    def frame_producer(self,
+                       *pipelines: Pipeline,
+                       chunk_rows=10000,
+                       explode=False,
+                       **producer_kwargs):
+        """
+        Creates producer, which function returns/yields pandas DataFrames or
+        NumPy record arrays. Each frame is sent by `stairs.Chunk` jobs of
+        `chunk_rows` rows, column by column, without conversion of each row
+        to a dict:
+
+            @frame_producer(my_pipeline, chunk_rows=5000)
+            def producer_function():
+                for frame in pandas.read_csv("data.csv", chunksize=100000):
+                    yield frame
+
+        Vectorized pipeline functions get whole columns. If pipeline doesn't
+        support chunks, use `explode`: chunk goes through streaming service
+        as one job, but pipeline is executed for each row separately.
+
+        :param pipelines: list of Stairs pipelines
+        :param chunk_rows: amount of rows in one job
+        :param explode: True - execute pipeline for each row of a chunk
+        :param producer_kwargs: other arguments of producer (see `producer`)
+        :return: function wrapper which returns Producer
+        """
+        def _frame_producer_handler_wrap(handler) -> Producer:
+            producer = Producer(app=self,
+                                handler=handler,
+                                default_callbacks=list(pipelines or []),
+                                frame_chunk_rows=chunk_rows,
+                                explode=explode,
+                                **producer_kwargs)
+
+            return producer
+
+        return _frame_producer_handler_wrap
+
     def batch_producer(self, producer: Producer,
                        repeat_on_signal=None,
-                       repeat_times=None) -> BatchProducer:
+                       repeat_times=None,
+                       queue_limit=None,
+                       queue_low_limit=None,
+                       concurrency=None) -> BatchProducer:
         """
         Next iteration for Producer.
         Batch producer allows you to generate jobs for regular producer. It's
@@ -193,6 +349,13 @@ class ComponentsMixin:
                 return random.randint(0, 1)
 
 
+        `queue_limit` and `queue_low_limit` control when batch producer pauses
+        and resumes, based on amount of jobs in `producer` queue (by default
+        the same limits as producer has).
+
+        Batch producer function could be `async def` generator, with up to
+        `concurrency` awaitables executed at once (see `producer`).
+
         :param producer: Stairs producer instance
         :return: Stairs Batch producer instance
         """
@@ -202,11 +365,149 @@ class ComponentsMixin:
                                            handler=handler,
                                            simple_producer=producer,
                                            repeat_on_signal=repeat_on_signal,
-                                           repeat_times=repeat_times)
+                                           repeat_times=repeat_times,
+                                           queue_limit=queue_limit,
+                                           queue_low_limit=queue_low_limit,
+                                           concurrency=concurrency)
             return batch_producer
 
         return _batch_producer_handler_wrap
 
+    def file_producer(self,
+                      *pipelines: Pipeline,
+                      path: str,
+                      format: str = None,
+                      name: str = None,
+                      chunk_bytes: int = 64 * 1024 * 1024,
+                      delimiter: str = ',',
+                      rows_per_job: int = None,
+                      **producer_kwargs) -> BatchProducer:
+        """
+        Creates producers which read big file in parallel.
+
+        Batch producer (`name`) splits the file into parts: CSV and JSON Lines
+        into byte ranges of about `chunk_bytes` aligned to lines, Parquet
+        into row groups. Simple producer (`name`_reader) reads one part using
+        memory mapping, so several `producer:run_jobs` processes could read
+        the file at once (default `name` of "logs.jsonl" is "logs_file"):
+
+            logs = app.file_producer(my_pipeline, path="logs.jsonl")
+
+            python manage.py producer:run logs_file --nobatch_reading
+            python manage.py producer:run_jobs logs_file_reader
+
+        JSON Lines are sent as `stairs.Encoded` jobs (lines are not parsed by
+        producer). CSV rows are sent as dicts (keys from the header line).
+        If `rows_per_job` defined, CSV rows are sent as `stairs.Chunk` of
+        this size. Parquet is always sent by chunks (requires pyarrow).
+
+        :param pipelines: list of Stairs pipelines
+        :param path: path to the file
+        :param format: csv, jsonl or parquet, by default based on extension
+        :param name: name of batch producer, by default based on file name
+        :param chunk_bytes: approximate size of the part of text file
+        :param delimiter: CSV delimiter
+        :param rows_per_job: amount of rows in one chunk job
+        :param producer_kwargs: arguments of simple producer (see `producer`)
+        :return: Stairs Batch producer instance
+        """
+        file_format = files.get_format(path, format)
+
+        if name is None:
+            file_name = os.path.splitext(os.path.basename(path))[0]
+            name = "%s_file" % re.sub(r'\W', '_', file_name)
+
+        def read_file(start, end, fieldnames=None):
+            return files.read_file_part(path, file_format, start, end,
+                                        fieldnames=fieldnames,
+                                        delimiter=delimiter,
+                                        rows_per_job=rows_per_job)
+
+        def split_file():
+            return files.split_file(path, file_format, chunk_bytes,
+                                    delimiter=delimiter)
+
+        read_file.__name__ = "%s_reader" % name
+        split_file.__name__ = name
+
+        reader = self.producer(*pipelines, **producer_kwargs)(read_file)
+        return self.batch_producer(reader)(split_file)
+
+    def table_producer(self,
+                       *pipelines: Pipeline,
+                       connect,
+                       table: str,
+                       key: str,
+                       name: str = None,
+                       columns: list = None,
+                       where: str = None,
+                       range_size: int = 100000,
+                       fetch_size: int = 1000,
+                       rows_per_job: int = None,
+                       paramstyle: str = None,
+                       cursor_factory=None,
+                       **producer_kwargs) -> BatchProducer:
+        """
+        Creates producers which read database table in parallel, using any
+        DB-API driver.
+
+        Batch producer (`name`) splits values of `key` column into ranges:
+        integer keys by `range_size` values, other ordered keys by
+        `range_size` rows. Simple producer (`name`_reader) reads one range
+        by one query (`key >= start AND key < end`) and `fetchmany`, so
+        several `producer:run_jobs` processes could read the table at once:
+
+            users = app.table_producer(my_pipeline,
+                                       connect=lambda: sqlite3.connect("db"),
+                                       table="users",
+                                       key="id")
+
+            python manage.py producer:run users --nobatch_reading
+            python manage.py producer:run_jobs users_reader
+
+        `connect` is called in each process. Use `cursor_factory` to create
+        server-side cursor (e.g. `lambda c: c.cursor(name="stairs")` for
+        psycopg2), otherwise driver could load whole range into memory.
+
+        :param pipelines: list of Stairs pipelines
+        :param connect: function without arguments, returns DB-API connection
+        :param table: table name (or any SQL "from" expression)
+        :param key: indexed column to split the table by
+        :param name: name of batch producer, by default `table`
+        :param columns: columns to read, by default all
+        :param where: additional SQL condition
+        :param range_size: amount of key values (or rows) in one range
+        :param fetch_size: amount of rows fetched at once
+        :param rows_per_job: if defined, rows are sent as `stairs.Chunk` of
+        this size
+        :param paramstyle: DB-API paramstyle, by default from driver module
+        :param cursor_factory: function which creates cursor for connection
+        :param producer_kwargs: arguments of simple producer (see `producer`)
+        :return: Stairs Batch producer instance
+        """
+        reader = TableReader(connect,
+                             table,
+                             key,
+                             columns=columns,
+                             where=where,
+                             paramstyle=paramstyle,
+                             cursor_factory=cursor_factory,
+                             fetch_size=fetch_size)
+        name = name or re.sub(r'\W', '_', table)
+
+        def read_table(start, end, last=False):
+            return reader.read(start, end, last=last,
+                               rows_per_job=rows_per_job)
+
+        def split_table():
+            return reader.split(range_size)
+
+        read_table.__name__ = "%s_reader" % name
+        split_table.__name__ = name
+
+        table_reader = self.producer(*pipelines, **producer_kwargs)(read_table)
+        return self.batch_producer(table_reader)(split_table)
+
     def producer_redirect(self,
                           based_on: Producer,
                           *pipelines: Pipeline):
@@ -243,13 +544,25 @@ class ComponentsMixin:
                                 default_callbacks=list(pipelines),
                                 single_transaction=based_on.single_transaction,
                                 repeat_on_signal=based_on.repeat_on_signal,
-                                repeat_times=based_on.repeat_times)
+                                repeat_times=based_on.repeat_times,
+                                chunk_size=based_on.chunk_size,
+                                flush_interval=based_on.flush_interval,
+                                queue_limit=based_on.queue_limit,
+                                queue_low_limit=based_on.queue_low_limit,
+                                transaction_chunk_size=based_on
+                                .transaction_chunk_size,
+                                concurrency=based_on.concurrency,
+                                read_ahead=based_on.read_ahead,
+                                track_runs=based_on.track_runs,
+                                frame_chunk_rows=based_on.frame_chunk_rows,
+                                explode=based_on.explode)
 
             return producer
 
         return _producer_redirect_handler_wrap
 
-    def spark_producer(self, *pipelines: Pipeline):
+    def spark_producer(self, *pipelines: Pipeline, queue_limit=None,
+                       chunk_size=None):
         """
         Producer where you can use Spark RDD inside. Result of producer function
         should Spark RDD which then will be executing using `foreachPartition`
@@ -258,14 +571,22 @@ class ComponentsMixin:
         It also support BatchProducer and you can operate with that in the
         same way like Stairs Producer component.
 
+        Rows of each partition are written to the queues by chunks of
+        `chunk_size` rows, writing is paused while pipelines queues have
+        more than `queue_limit` jobs.
+
         :param pipelines: Stairs pipelines instances
+        :param queue_limit: max amount of jobs in pipelines queues
+        :param chunk_size: amount of rows written to the queues at once
         """
         from stairs.core.producer.spark import SparkProducer
 
         def _spark_producer_handler_wrap(handler) -> SparkProducer:
             producer = SparkProducer(app=self,
                                      handler=handler,
-                                     default_callbacks=list(pipelines))
+                                     default_callbacks=list(pipelines),
+                                     queue_limit=queue_limit,
+                                     chunk_size=chunk_size)
 
             return producer
 
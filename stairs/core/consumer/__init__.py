@@ -1,8 +1,7 @@
 import inspect
 
-from stepist.flow.utils import validate_handler_data
-
 from stairs.core import app_components
+from stairs.core.utils.binding import bind_handler
 
 
 class Consumer(app_components.AppConsumer):
@@ -14,6 +13,7 @@ class Consumer(app_components.AppConsumer):
 
     def __init__(self, app, handler, as_worker=False):
         self.handler = handler
+        self.handler_binding = bind_handler(handler)
         self.as_worker = as_worker
         self.app = app
 
@@ -25,12 +25,22 @@ class Consumer(app_components.AppConsumer):
         app_components.AppConsumer.__init__(self, self.app)
 
     def __call__(self, **data):
-        data = validate_handler_data(self.handler, data)
+        data = self.handler_binding(data)
         output_result = self.handler(**data)
 
         if not self.as_worker:
             return output_result
 
+    def call_batch(self, items):
+        """
+        Call consumer handler with list of inputs at once. Used when consumer
+        subscribed to pipeline with `batch_size`.
+        """
+        output_result = self.handler(items)
+
+        if not self.as_worker:
+            return output_result
+
     def __name__(self):
         module_name = inspect.getmodule(self.handler).__name__
         return "%s:%s" % (self.handler.__name__, module_name)
@@ -1,18 +1,19 @@
 import time
 
-from stepist.flow.utils import validate_handler_data
 from stepist.flow.steps.next_step import call_next_step
 
 from stairs.core.session.project_session import get_project
 
 from stairs.core.consumer import Consumer
 from stairs.core import app_components
+from stairs.core.utils.binding import bind_handler
 
 
 class ConsumerIter(Consumer):
 
     def __init__(self, app, handler):
         self.handler = handler
+        self.handler_binding = bind_handler(handler)
         self.app = app
 
         self.step = self.app \
@@ -23,11 +24,15 @@ class ConsumerIter(Consumer):
         app_components.AppConsumer.__init__(self, self.app)
 
     def __call__(self, **kwargs):
-        handler_data = validate_handler_data(self.handler, kwargs)
+        handler_data = self.handler_binding(kwargs)
 
         result = self.handler(**handler_data)
         call_next_step(result, self.step)
 
+    def call_batch(self, items):
+        for result in self.handler(items):
+            call_next_step(result, self.step)
+
     def iter(self, die_when_empty=False):
         """
         User interface for jobs_iterator.
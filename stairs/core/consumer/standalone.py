@@ -1,5 +1,3 @@
-from stepist.flow.utils import validate_handler_data
-
 from stairs.core.session import project_session
 
 from stairs.core.consumer import Consumer
@@ -11,7 +9,7 @@ class StandAloneConsumer(Consumer):
         Consumer.__init__(self, *args, **kwargs, as_worker=True)
 
     def __call__(self, *args, **kwargs):
-        kwargs = validate_handler_data(self.handler, kwargs)
+        kwargs = self.handler_binding(kwargs)
         return self.handler(*args, **kwargs)
 
     def run_worker(self):
@@ -1,10 +1,10 @@
 import uuid
 
-from stepist.flow.utils import validate_handler_data
 from stepist.flow.steps.hub import Hub
 from stepist.flow.steps.next_step import call_next_step
 
 from stairs.core.app_components import AppStep
+from stairs.core.utils.binding import bind_handler
 
 
 def step(*next_steps, save_result=False, name=None):
@@ -65,6 +65,7 @@ class StairsStep(StairsStepAbstract, AppStep):
 
         self.pipeline = pipeline
         self.handler = handler
+        self.handler_binding = bind_handler(handler)
         self.next_steps = next_steps
 
         self.name = name or self.handler.__name__
@@ -96,7 +97,7 @@ class StairsStep(StairsStepAbstract, AppStep):
         return flow_result
 
     def execute_step(self, **data):
-        handler_data = validate_handler_data(self.handler, data)
+        handler_data = self.handler_binding(data)
 
         new_data = self.handler(self.flow, **handler_data)
 
@@ -8,6 +8,10 @@ from stairs.core.utils import signals
 
 from stairs.core import app_components
 from stairs.core.pipeline import data_pipeline
+from stairs.core.pipeline.chunk import to_job_data, iter_rows, CHUNK_KEY, \
+    EXPLODE_KEY
+from stairs.core.pipeline.encoded import ENCODED_KEY, decode_job
+from stairs.core.worker.outbox import use_outbox
 
 
 class PipelineInfo:
@@ -104,6 +108,14 @@ class Pipeline(app_components.AppPipeline):
             raise RuntimeError("Worker pipeline no compiled, "
                                "run worker.compile()")
 
+        if ENCODED_KEY in kwargs:
+            kwargs = decode_job(kwargs)
+
+        if kwargs.pop(EXPLODE_KEY, False):
+            for row in iter_rows(kwargs, kwargs[CHUNK_KEY]):
+                self(**row)
+            return None
+
         for callback in self.before_callbacks:
             callback(**kwargs)
 
@@ -118,7 +130,9 @@ class Pipeline(app_components.AppPipeline):
 
     def run_stepist_worker(self,
                            die_on_error=True,
-                           die_when_empty=False) -> None:
+                           die_when_empty=False,
+                           prefetch_count=None,
+                           max_retries=None) -> None:
         """
         Run stepist app which listening streaming service and generating
         jobs for pipeline functions.
@@ -128,9 +142,23 @@ class Pipeline(app_components.AppPipeline):
 
         :param die_on_error: If True - exit on error
         :param die_when_empty: If True - exit when streaming service empty
+        :param prefetch_count: If defined - take jobs from streaming service
+        in batches, see StairsProject.run_pipelines
+        :param max_retries: If defined - retry failed jobs later, see
+        StairsProject.run_pipelines
         """
         steps_to_run = self.get_workers_steps()
 
+        if prefetch_count or max_retries:
+            get_project().run_bulk_worker(steps_to_run,
+                                          prefetch_count=prefetch_count or 1,
+                                          die_on_error=die_on_error,
+                                          die_when_empty=die_when_empty,
+                                          max_retries=max_retries)
+            return
+
+        get_project().track_runs()
+        use_outbox(steps_to_run)
         get_project().stepist_app.run(steps_to_run,
                                       die_on_error=die_on_error,
                                       die_when_empty=die_when_empty)
@@ -241,7 +269,7 @@ class Pipeline(app_components.AppPipeline):
         return all_empty
 
     def add_job(self, data):
-        call_next_step(data, self.step)
+        call_next_step(to_job_data(data), self.step)
 
     def get_queue_name(self):
         return self.step.get_queue_name()
@@ -0,0 +1,237 @@
+"""
+Chunk jobs - one job which carries many rows.
+
+Chunk job is a regular job dict, where each value is a column (list of
+values, one per row) and special `CHUNK_KEY` item stores amount of rows:
+
+    {'a': [1, 2, 3], 'b': ['x', 'y', 'z'], CHUNK_KEY: 3}
+
+Columns are plain lists, so chunk goes through streaming service as one
+message without any special encoding. Pipeline components route columns in
+the same way as regular values. Functions marked as `vectorized` get whole
+columns as NumPy arrays, all other functions are called for each row.
+
+Column could be also a dict of columns (e.g. after KeysToDict
+transformation), in this case each row gets dict value.
+"""
+from collections import Mapping
+
+from stairs.core.pipeline.encoded import Encoded
+
+CHUNK_KEY = '__stairs_chunk__'
+
+# Chunk should be split to rows, before pipeline execution
+EXPLODE_KEY = '__stairs_explode__'
+
+
+class Chunk:
+    """
+    Block of rows which producer can yield instead of one row. Whole chunk
+    will be forwarded to streaming service as one job.
+
+        @app.producer(my_pipeline)
+        def my_producer():
+            for rows in read_by_blocks(1000):
+                yield Chunk.from_rows(rows)
+
+    Columns could be lists, NumPy arrays or any other sequences with
+    `tolist` method (e.g. pandas Series).
+
+    If `explode` is True, chunk goes through streaming service as one job,
+    but pipeline is executed for each row separately (for pipelines which
+    don't support chunks).
+    """
+
+    def __init__(self, columns: dict, length: int = None,
+                 explode: bool = False):
+        self.columns = {key: to_column(value)
+                        for key, value in columns.items()}
+
+        if length is None:
+            length = get_columns_length(self.columns)
+        self.length = length
+        self.explode = explode
+
+    @classmethod
+    def from_rows(cls, rows):
+        rows = list(rows)
+        return cls(columns_from_rows(rows), length=len(rows))
+
+    def to_job(self) -> dict:
+        job = dict(self.columns)
+        job[CHUNK_KEY] = self.length
+        if self.explode:
+            job[EXPLODE_KEY] = True
+        return job
+
+    def __len__(self):
+        return self.length
+
+
+def is_chunk_job(data) -> bool:
+    return CHUNK_KEY in data
+
+
+def to_job_data(data):
+    """
+    Convert Chunk (or Encoded) to the job dict, other data returned as is.
+    """
+    if isinstance(data, (Chunk, Encoded)):
+        return data.to_job()
+
+    return data
+
+
+def to_column(values):
+    """
+    Convert sequence (list, NumPy array, pandas Series) to the list.
+    """
+    if isinstance(values, list):
+        return values
+
+    if isinstance(values, Mapping):
+        return {key: to_column(value) for key, value in values.items()}
+
+    if hasattr(values, 'tolist'):
+        return values.tolist()
+
+    return list(values)
+
+
+def get_columns_length(columns):
+    for column in columns.values():
+        if isinstance(column, Mapping):
+            return get_columns_length(column)
+        return len(column)
+
+    return 0
+
+
+def get_row_value(column, i):
+    if isinstance(column, Mapping):
+        return {key: get_row_value(value, i) for key, value in column.items()}
+
+    return column[i]
+
+
+def iter_rows(columns, length):
+    """
+    Yields dict for each row of columns. `CHUNK_KEY` is skipped.
+    """
+    keys = [key for key in columns.keys() if key != CHUNK_KEY]
+
+    for i in range(length):
+        yield {key: get_row_value(columns[key], i) for key in keys}
+
+
+def columns_from_rows(rows):
+    """
+    Convert list of rows (dicts) to dict of columns. Rows without some key
+    will have None value in this column.
+    """
+    keys = dict()
+    for row in rows:
+        for key in row.keys():
+            keys[key] = None
+
+    return {key: [row.get(key) for row in rows] for key in keys}
+
+
+def have_same_keys(rows) -> bool:
+    """
+    True if all rows (dicts) have the same keys.
+    """
+    keys = None
+    for row in rows:
+        if keys is None:
+            keys = row.keys()
+        elif row.keys() != keys:
+            return False
+
+    return True
+
+
+def take_column_rows(column, indexes):
+    if isinstance(column, Mapping):
+        return {key: take_column_rows(value, indexes)
+                for key, value in column.items()}
+
+    return [column[i] for i in indexes]
+
+
+def take_rows(chunk_job, indexes):
+    """
+    Returns chunk job only with specified rows.
+    """
+    new_chunk_job = {key: take_column_rows(column, indexes)
+                     for key, column in chunk_job.items() if key != CHUNK_KEY}
+    new_chunk_job[CHUNK_KEY] = len(indexes)
+
+    return new_chunk_job
+
+
+def explode_jobs(jobs):
+    """
+    Replace each chunk job by regular jobs (one per row).
+    """
+    exploded_jobs = []
+
+    for job in jobs:
+        if CHUNK_KEY in job:
+            exploded_jobs.extend(iter_rows(job, job[CHUNK_KEY]))
+        else:
+            exploded_jobs.append(job)
+
+    return exploded_jobs
+
+
+def to_arrays(columns):
+    """
+    Convert columns to NumPy arrays, for vectorized functions.
+    """
+    import numpy
+
+    arrays = dict()
+    for key, column in columns.items():
+        if isinstance(column, Mapping):
+            arrays[key] = to_arrays(column)
+        else:
+            arrays[key] = numpy.asarray(column)
+
+    return arrays
+
+
+def from_vectorized_result(result, length):
+    """
+    Convert result of vectorized function (dict of arrays) back to columns.
+    Scalar values are broadcast to all rows.
+    """
+    columns = dict()
+
+    for key, value in result.items():
+        if isinstance(value, Mapping):
+            columns[key] = from_vectorized_result(value, length)
+        elif is_scalar(value):
+            if getattr(value, 'ndim', None) == 0:
+                # NumPy scalar to python value
+                value = value.item()
+            columns[key] = [value] * length
+        else:
+            columns[key] = to_column(value)
+            if len(columns[key]) != length:
+                raise RuntimeError("Vectorized function returned column `%s` "
+                                   "with %s rows instead of %s" %
+                                   (key, len(columns[key]), length))
+
+    return columns
+
+
+def is_scalar(value):
+    if isinstance(value, (str, bytes)):
+        return True
+
+    # NumPy scalars and 0-d arrays
+    if getattr(value, 'ndim', None) == 0:
+        return True
+
+    return not hasattr(value, '__len__')
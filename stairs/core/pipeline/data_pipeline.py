@@ -2,14 +2,15 @@ import copy
 import uuid
 from typing import Union
 from stepist.flow.steps.next_step import call_next_step as stepist_next_step
-from stepist.flow.utils import validate_handler_data
 
 from stairs.core.pipeline.pipeline_objects import (PipelineFlow,
                                                    PipelineFlowProducer,
                                                    PipelineOutput,
                                                    PipelineFunction,
                                                    PipelineConnectorComponent,
-                                                   PipelineFunctionProducer)
+                                                   PipelineFunctionProducer,
+                                                   PipelineBatchFunction,
+                                                   PipelineBatchOutput)
 
 from stairs.core.flow import Flow
 from stairs.core.consumer import Consumer
@@ -17,11 +18,14 @@ from stairs.core.consumer.standalone import StandAloneConsumer
 from stairs.core.consumer.iter import ConsumerIter
 
 from stairs.core.pipeline import pipeline_graph
+from stairs.core.pipeline.forwarding import get_forwarder
 from stairs.core.pipeline.pipeline_graph import concatenate_sequentially
 
 from stairs.core.pipeline.pipeline_objects import \
     transformation as transformations_types
 
+from stairs.core.utils.binding import bind_handler
+
 
 class DataPipeline:
     """
@@ -130,17 +134,33 @@ class DataPipeline:
 
 
 class ConditionPipeline:
-    def __init__(self, statement, do_pipeline, otherwise_pipeline=None):
+    def __init__(self, statement, do_pipeline, otherwise_pipeline=None,
+                 batch_size=None, max_wait_ms=None):
         self.statement = statement
+        self.statement_binding = bind_handler(statement)
         self.do_pipeline = do_pipeline
         self.otherwise_pipeline = otherwise_pipeline
+        self.forwarder = get_forwarder(batch_size, max_wait_ms)
 
-    def call_by_condition(self, data):
-        statement_data = validate_handler_data(self.statement, data)
+    def call_by_condition(self, data, forwarder=None):
+        """
+        :param forwarder: JobsForwarder which should be used instead of
+        condition's one
+        """
+        statement_data = self.statement_binding(data)
         if self.statement(**statement_data):
-            self.do_pipeline.add_job(data)
+            pipeline = self.do_pipeline
         else:
-            self.otherwise_pipeline.add_job(data)
+            pipeline = self.otherwise_pipeline
+
+        if pipeline is None:
+            return
+
+        forwarder = forwarder or self.forwarder
+        if forwarder is not None:
+            forwarder.add(pipeline, data)
+        else:
+            pipeline.add_job(data)
 
     def key(self):
         otherwise_key = self.otherwise_pipeline.key() if self.otherwise_pipeline else "no_otherwise"
@@ -149,6 +169,37 @@ class ConditionPipeline:
         )
 
 
+class RouterPipeline:
+    """
+    Forwards data to one of the pipelines, chosen by the result of key
+    function (one dict lookup instead of chain of conditions).
+    """
+
+    def __init__(self, key_func, routes: dict, default=None,
+                 batch_size=None, max_wait_ms=None):
+        self.key_func = key_func
+        self.key_func_binding = bind_handler(key_func)
+        self.routes = dict(routes)
+        self.default = default
+        self.forwarder = get_forwarder(batch_size, max_wait_ms)
+
+    def call_by_key(self, data):
+        route_key = self.key_func(**self.key_func_binding(data))
+
+        pipeline = self.routes.get(route_key, self.default)
+        if pipeline is None:
+            return
+
+        if self.forwarder is not None:
+            self.forwarder.add(pipeline, data)
+        else:
+            pipeline.add_job(data)
+
+    def key(self):
+        return "route:%s" % "/".join(sorted(str(route_key)
+                                            for route_key in self.routes))
+
+
 class DataFrame:
     """
     Pipeline component which represents batch data which will be forward to
@@ -261,7 +312,8 @@ class DataFrame:
         return DataFrame(data_pipeline)
 
     def subscribe_flow_as_producer(self, flow: Flow, as_worker=False,
-                                   name=None) -> 'DataFrame':
+                                   name=None,
+                                   fanout_batch_size=None) -> 'DataFrame':
         """
         Subscribe stairs.Flow as a producer component. It's similar to
         DataFrame.subscribe_flow but with producer behaviour.
@@ -271,7 +323,8 @@ class DataFrame:
 
         Flow as a producer should return iterator (e.g. list) of dicts like
         objects. Stairs will iterate Flow and forward each item to streaming
-        service.
+        service. If next component is a worker, items are written to its
+        queue by batches of `fanout_batch_size` jobs.
 
         :param flow: stairs.Flow object which return `Mapping` like data
 
@@ -282,6 +335,9 @@ class DataFrame:
         :param name: Custom name for function which will process current
         DataFrame data
 
+        :param fanout_batch_size: max amount of items written to the next
+        worker queue at once
+
         :return: new DataFrame which will represents data after Flow
         subscription
         """
@@ -298,7 +354,8 @@ class DataFrame:
                                            as_worker=as_worker,
                                            name=name,
                                            config=config,
-                                           update_pipe_data=True)
+                                           update_pipe_data=True,
+                                           fanout_batch_size=fanout_batch_size)
 
         # Add new pipeline component to common graph
         data_pipeline.add_pipeline_component(
@@ -365,7 +422,8 @@ class DataFrame:
         # Return new DataFrame built on new pipeline graph
         return DataFrame(data_pipeline)
 
-    def call_pipeline(self, pipeline, when=None, as_worker=True) -> 'DataFrame':
+    def call_pipeline(self, pipeline, when=None, as_worker=True,
+                      batch_size=None, max_wait_ms=None) -> 'DataFrame':
         """
         Call kind of commands allows you to forward current DataFrame data
         to new pipeline and ignore any results from this pipeline.
@@ -382,19 +440,29 @@ class DataFrame:
         New pipeline will be executed in a background and will not related
         to current one.
 
+        With `batch_size` forwarded jobs are written to the pipeline queue
+        in bulk: up to `batch_size` jobs at once, or when the first of them
+        waits more than `max_wait_ms` (see `forwarding` module).
+
         :param pipeline: App.pipeline instance
+        :param batch_size: max amount of jobs written at once
+        :param max_wait_ms: max time forwarded job waits to be written
         :return: Return new DataFrame built on new pipeline graph
         """
+        forwarder = None
+        if as_worker:
+            forwarder = get_forwarder(batch_size, max_wait_ms)
 
         def forward_data_to_pipeline(**kwargs):
             if isinstance(pipeline, ConditionPipeline):
-                pipeline.call_by_condition(kwargs)
+                pipeline.call_by_condition(kwargs, forwarder=forwarder)
+            elif not as_worker:
+                pipeline(**kwargs)
+            elif forwarder is not None:
+                forwarder.add(pipeline, kwargs)
             else:
-                if as_worker:
-                    pipeline.add_job(kwargs)
-                else:
-                    pipeline(**kwargs)
-                    
+                pipeline.add_job(kwargs)
+
             return dict()
 
         return self.subscribe_func(forward_data_to_pipeline,
@@ -402,6 +470,44 @@ class DataFrame:
                                    when=when,
                                    as_worker=False)
 
+    def route(self, key_func, routes: dict, default=None, when=None,
+              batch_size=None, max_wait_ms=None) -> 'DataFrame':
+        """
+        Forward current DataFrame data to one of the pipelines. `key_func`
+        is called once for each job, and its result is looked up in
+        `routes`:
+
+            data.route(lambda event_type: event_type,
+                       {'click': clicks_pipeline, 'view': views_pipeline},
+                       default=other_events_pipeline)
+
+        Like `call_pipeline`, results of the pipelines are ignored and new
+        DataFrame represents the same data.
+
+        :param key_func: function which gets DataFrame data (same as
+        `subscribe_func`) and returns route key
+        :param routes: dict of route key -> App.pipeline instance
+        :param default: pipeline for keys which are not in `routes`, if None
+        such data is not forwarded
+        :param batch_size: max amount of jobs written to the pipeline queue
+        at once, see `call_pipeline`
+        :param max_wait_ms: max time forwarded job waits to be written
+        :return: Return new DataFrame built on new pipeline graph
+        """
+        router = RouterPipeline(key_func, routes,
+                                default=default,
+                                batch_size=batch_size,
+                                max_wait_ms=max_wait_ms)
+
+        def route_data_to_pipeline(**kwargs):
+            router.call_by_key(kwargs)
+            return dict()
+
+        return self.subscribe_func(route_data_to_pipeline,
+                                   name=router.key(),
+                                   when=when,
+                                   as_worker=False)
+
     def apply_pipeline(self, app_pipeline, config=None) -> 'DataFrame':
         """
         Apply new pipeline with a current one.
@@ -455,7 +561,8 @@ class DataFrame:
 
     def subscribe_consumer(self, consumer: Union[Consumer, ConsumerIter,
                                                StandAloneConsumer],
-                           name=None, as_worker=False, when=None) -> 'DataFrame':
+                           name=None, as_worker=False, when=None,
+                           batch_size=None, max_wait_ms=None) -> 'DataFrame':
         """
         Subscribes consumer component.
 
@@ -464,6 +571,9 @@ class DataFrame:
 
         Consumer results will be completely ignored.
 
+        If `batch_size` defined, consumer gets list of inputs (up to
+        `batch_size` jobs, see `subscribe_func` for more details).
+
         :param consumer: Consumer, ConsumerIter or StandAlone consumers
         components
 
@@ -474,6 +584,11 @@ class DataFrame:
         input data to streaming service queue, and then read in a different
         process)
 
+        :param batch_size: max amount of jobs which consumer handles at once
+
+        :param max_wait_ms: how long to wait for a new jobs, when batch is
+        not full
+
         :return: Return new DataFrame with Consumer component
         """
         data_pipeline = self.data_pipeline.deepcopy()
@@ -481,14 +596,23 @@ class DataFrame:
         name = name or "%s:%s" % (self.data_pipeline.worker_info.key(),
                                   consumer.name())
 
-        p_component = PipelineOutput(
+        p_component_cls = PipelineOutput
+        batch_kwargs = dict()
+        if batch_size:
+            p_component_cls = PipelineBatchOutput
+            batch_kwargs = dict(batch_size=batch_size, max_wait_ms=max_wait_ms)
+            # batch collected from streaming service, so it's always worker
+            as_worker = True
+
+        p_component = p_component_cls(
             self.data_pipeline,
             name=name,
             component=consumer,
             config=data_pipeline.worker_info.config,
             as_worker=as_worker,
             when_handler=when,
-            update_pipe_data=True
+            update_pipe_data=True,
+            **batch_kwargs
         )
 
         data_pipeline.add_pipeline_component(
@@ -499,7 +623,8 @@ class DataFrame:
         return DataFrame(data_pipeline)
 
     def subscribe_func(self, func, as_worker=False, name=None,
-                       when=None, key_wrapper=None) -> 'DataFrame':
+                       when=None, key_wrapper=None, batch_size=None,
+                       max_wait_ms=None, vectorized=False) -> 'DataFrame':
         """
         Subscribes any user functions or methods.
 
@@ -516,6 +641,33 @@ class DataFrame:
         object:
             {'a': 1, 'b': 3, 'c': 4}
 
+        If `batch_size` defined, function handles batch of jobs at once. It
+        gets list of inputs (dict per job) and should return list of results
+        in the same order:
+
+            def score(items):
+                scores = model.predict([item['text'] for item in items])
+                return [dict(score=score) for score in scores]
+
+            data.subscribe_func(score, batch_size=100, max_wait_ms=50)
+
+        Worker takes up to `batch_size` jobs from streaming service (waiting
+        for a new jobs not longer than `max_wait_ms`), calls function once and
+        forwards each result with data of its job. Batch function is always
+        a worker.
+
+        If `vectorized` is True, function gets whole columns of chunk jobs
+        (see `stairs.Chunk`) as NumPy arrays, and should return dict of
+        arrays (or scalars) with the same amount of rows:
+
+            def normalize(x):
+                return dict(x=(x - x.mean()) / x.std())
+
+            data.subscribe_func(normalize, vectorized=True)
+
+        Regular (not chunk) jobs are passed as arrays with one row. Functions
+        without `vectorized` flag are called for each row of the chunk.
+
         :param func: Any functions you want
 
         :param as_worker: If True call function using streaming service. (Put
@@ -524,7 +676,12 @@ class DataFrame:
 
         :param name: Custom name for a function
 
-        :param update_pipe_data:
+        :param batch_size: max amount of jobs which function handles at once
+
+        :param max_wait_ms: how long to wait for a new jobs, when batch is
+        not full
+
+        :param vectorized: If True function handles columns of chunk jobs
 
         :return: Return new DataFrame with function component
         """
@@ -533,15 +690,29 @@ class DataFrame:
         name = name or "%s:%s" % (self.data_pipeline.worker_info.key(),
                                   func.__name__)
 
+        p_component_cls = PipelineFunction
+        batch_kwargs = dict()
+        if batch_size:
+            if vectorized:
+                raise RuntimeError("Function `%s` can't be batch and "
+                                   "vectorized at the same time" % name)
+            p_component_cls = PipelineBatchFunction
+            batch_kwargs = dict(batch_size=batch_size, max_wait_ms=max_wait_ms)
+            # batch collected from streaming service, so it's always worker
+            as_worker = True
+        elif vectorized:
+            batch_kwargs = dict(vectorized=vectorized)
+
         config = data_pipeline.worker_info.config
-        p_component = PipelineFunction(self.data_pipeline,
-                                       func,
-                                       as_worker=as_worker,
-                                       name=name,
-                                       config=config,
-                                       when_handler=when,
-                                       key_wrapper=key_wrapper,
-                                       update_pipe_data=True)
+        p_component = p_component_cls(self.data_pipeline,
+                                      func,
+                                      as_worker=as_worker,
+                                      name=name,
+                                      config=config,
+                                      when_handler=when,
+                                      key_wrapper=key_wrapper,
+                                      update_pipe_data=True,
+                                      **batch_kwargs)
 
         data_pipeline.add_pipeline_component(
             p_component,
@@ -552,7 +723,8 @@ class DataFrame:
 
     def subscribe_func_as_producer(self, func, as_worker=False, name=None,
                                    _update_pipe_data=True,
-                                   when=None) -> 'DataFrame':
+                                   when=None,
+                                   fanout_batch_size=None) -> 'DataFrame':
         """
         Subscribes function as a producer component. It's similar to
         DataFrame.subscribe_func but with producer behaviour.
@@ -562,7 +734,8 @@ class DataFrame:
 
         Function as a producer should return iterator (e.g. list) of dicts like
         objects. Stairs will iterate by this function and forward each item
-        to streaming service.
+        to streaming service. If next component is a worker, items are
+        written to its queue by batches of `fanout_batch_size` jobs.
 
         :param func: Function which return batch of `Mapping` like data
 
@@ -573,6 +746,9 @@ class DataFrame:
         :param name: Custom name for a function which will process current
         DataFrame data
 
+        :param fanout_batch_size: max amount of items written to the next
+        worker queue at once
+
         :return: Return new DataFrame with function component
         """
 
@@ -587,7 +763,8 @@ class DataFrame:
                                                name=name,
                                                config=config,
                                                when_handler=when,
-                                               update_pipe_data=_update_pipe_data)
+                                               update_pipe_data=_update_pipe_data,
+                                               fanout_batch_size=fanout_batch_size)
 
         data_pipeline.add_pipeline_component(
             p_component,
@@ -595,7 +772,8 @@ class DataFrame:
         )
         return DataFrame(data_pipeline)
 
-    def apply_func(self, func, as_worker=False, name=None) -> 'DataFrame':
+    def apply_func(self, func, as_worker=False, name=None, batch_size=None,
+                   max_wait_ms=None, vectorized=False) -> 'DataFrame':
         """
         Apply function for future data in current DataFrame.
 
@@ -608,6 +786,10 @@ class DataFrame:
             As a result you will have:
             {'c': 3}
 
+        `batch_size` and `max_wait_ms` allows to handle batch of jobs at once,
+        `vectorized` allows to handle columns of chunk jobs, see
+        `subscribe_func` for more details.
+
         :param func: Function which return batch of `Mapping` like data
 
         :param as_worker: If True call function through streaming service. (Put
@@ -617,6 +799,13 @@ class DataFrame:
         :param name: Custom name for a function which will process current
         DataFrame data
 
+        :param batch_size: max amount of jobs which function handles at once
+
+        :param max_wait_ms: how long to wait for a new jobs, when batch is
+        not full
+
+        :param vectorized: If True function handles columns of chunk jobs
+
         :return: Return new DataFrame with function component
         """
         data_pipeline = self.data_pipeline.deepcopy()
@@ -624,13 +813,27 @@ class DataFrame:
         name = name or "%s:%s" % (self.data_pipeline.worker_info.key(),
                                   func.__name__)
 
+        p_component_cls = PipelineFunction
+        batch_kwargs = dict()
+        if batch_size:
+            if vectorized:
+                raise RuntimeError("Function `%s` can't be batch and "
+                                   "vectorized at the same time" % name)
+            p_component_cls = PipelineBatchFunction
+            batch_kwargs = dict(batch_size=batch_size, max_wait_ms=max_wait_ms)
+            # batch collected from streaming service, so it's always worker
+            as_worker = True
+        elif vectorized:
+            batch_kwargs = dict(vectorized=vectorized)
+
         config = data_pipeline.worker_info.config
-        p_component = PipelineFunction(self.data_pipeline,
-                                       func,
-                                       as_worker=as_worker,
-                                       name=name,
-                                       config=config,
-                                       update_pipe_data=False)
+        p_component = p_component_cls(self.data_pipeline,
+                                      func,
+                                      as_worker=as_worker,
+                                      name=name,
+                                      config=config,
+                                      update_pipe_data=False,
+                                      **batch_kwargs)
 
         data_pipeline.add_pipeline_component(
             p_component,
@@ -639,8 +842,8 @@ class DataFrame:
 
         return DataFrame(data_pipeline)
 
-    def apply_func_as_producer(self, func, as_worker=False, name=None)\
-            -> 'DataFrame':
+    def apply_func_as_producer(self, func, as_worker=False, name=None,
+                               fanout_batch_size=None) -> 'DataFrame':
         """
         Similar to subscribe_func_as_producer,  but in this case result
         of current data will be completely replace by new function (similar to
@@ -655,12 +858,18 @@ class DataFrame:
         :param name: Custom name for a function which will process current
         DataFrame data
 
+        :param fanout_batch_size: max amount of items written to the next
+        worker queue at once
+
         :return: Return new DataFrame with function component
         """
-        return self.subscribe_func_as_producer(func,
-                                               as_worker=as_worker,
-                                               name=name,
-                                               _update_pipe_data=False)
+        return self.subscribe_func_as_producer(
+            func,
+            as_worker=as_worker,
+            name=name,
+            _update_pipe_data=False,
+            fanout_batch_size=fanout_batch_size
+        )
 
     def apply_flow(self, flow, name=None, as_worker=False,) -> 'DataFrame':
         """
@@ -750,6 +959,9 @@ def compile_pipeline(pipeline):
     Should be executed once for one pipeline (pipeline component). Otherwise
     Stepist will raise Error about handler duplication
 
+    Also precompute routing plan for each component, so components don't
+    need to analyze data keys on each call.
+
 
     :param pipeline: pipeline with graph object.
     :return: dict (map) stepist_unique_id: stepist.step
@@ -762,6 +974,7 @@ def compile_pipeline(pipeline):
     for i, graph_item in enumerate(dfs_iteration):
         unique_id = pipeline.get_stepist_id(graph_item.p_component.id)
         graph_item.p_component.stepist_id = unique_id
+        graph_item.p_component.compile_routing_plan()
 
         if len(graph_item.next) == 0:
             step = stepist_app.step(
@@ -787,13 +1000,45 @@ def compile_pipeline(pipeline):
         else:
             raise RuntimeError("next more than one, implement map support")
 
+        graph_item.p_component.stepist_step = step
+        graph_item.p_component.next_worker_step = \
+            get_next_worker_step(graph_item.p_component, step)
         stepist_steps[unique_id] = step
 
     return stepist_steps
 
 
-def condition_pipeline(statement, do_pipeline, otherwise_pipeline=None):
-    return ConditionPipeline(statement, do_pipeline, otherwise_pipeline)
+def get_next_worker_step(p_component, step):
+    """
+    Producer component which yields rows to the worker step, writes them
+    to the queue by batches.
+
+    :return: next stepist step, if rows should be written by batches
+    """
+    if not isinstance(p_component, (PipelineFunctionProducer,
+                                    PipelineFlowProducer)):
+        return None
+
+    next_step = step.next_step
+    if next_step is None or not getattr(next_step, 'as_worker', False) or \
+            next_step.factory is not None:
+        return None
+
+    return next_step
+
+
+def condition_pipeline(statement, do_pipeline, otherwise_pipeline=None,
+                       batch_size=None, max_wait_ms=None):
+    """
+    Forward data to `do_pipeline` if `statement` is True, otherwise to
+    `otherwise_pipeline` (see `DataFrame.call_pipeline`).
+
+    :param batch_size: max amount of jobs written to the pipelines queues
+    at once, see `forwarding` module
+    :param max_wait_ms: max time forwarded job waits to be written
+    """
+    return ConditionPipeline(statement, do_pipeline, otherwise_pipeline,
+                             batch_size=batch_size, max_wait_ms=max_wait_ms)
 
 
 def concatenate(*data_frames: DataFrame,
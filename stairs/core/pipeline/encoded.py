@@ -0,0 +1,63 @@
+"""
+Pre-encoded jobs - job data which producer already has in serialized form
+(e.g. line of JSON Lines file).
+
+Encoded job goes through streaming service as a string, together with small
+header of plain keys (e.g. keys used for routing). Producer doesn't parse
+and serialize data again, payload is decoded by worker right before pipeline
+functions are called:
+
+    {'source': 'nginx', ENCODED_KEY: '{"ip": "...", "path": "..."}'}
+"""
+from stairs.core.session.project_session import get_project
+
+ENCODED_KEY = '__stairs_encoded__'
+
+
+class Encoded:
+    """
+    Serialized job data (JSON object as str or bytes), which producer can
+    yield instead of a dict. Header keys are available without decoding,
+    and override keys of the payload.
+
+        @app.producer(my_pipeline)
+        def my_producer():
+            with open("log.jsonl", "rb") as f:
+                for line in f:
+                    yield Encoded(line, source="nginx")
+
+    Payload is decoded by project data pickler (ujson by default).
+    """
+    __slots__ = ('payload', 'header')
+
+    def __init__(self, payload, **header):
+        if isinstance(payload, (bytes, bytearray, memoryview)):
+            payload = bytes(payload).decode('utf-8')
+
+        self.payload = payload
+        self.header = header
+
+    def to_job(self) -> dict:
+        job = dict(self.header)
+        job[ENCODED_KEY] = self.payload
+        return job
+
+
+def is_encoded_job(data) -> bool:
+    return ENCODED_KEY in data
+
+
+def decode_job(data, loads=None) -> dict:
+    """
+    Data of encoded job with decoded payload, header keys override payload.
+    """
+    if loads is None:
+        loads = get_project().data_pickler.loads
+
+    job = loads(data[ENCODED_KEY])
+
+    for key, value in data.items():
+        if key != ENCODED_KEY:
+            job[key] = value
+
+    return job
@@ -0,0 +1,210 @@
+"""
+Batched forwarding of jobs to other pipelines (`DataFrame.call_pipeline`
+and `condition_pipeline` with `batch_size`).
+
+Inside worker outbox (see `stairs.core.worker.outbox`) forwarded jobs are
+collected by the outbox and written together with other jobs of the
+processed job (or batch of jobs). Otherwise forwarder buffers them and
+writes in bulk, when `batch_size` jobs are buffered or the oldest one
+waits more than `max_wait_ms`.
+
+Buffers with `max_wait_ms` are written by background flusher thread, when
+the oldest job waits too long (for RabbitMQ, which connection is not
+thread-safe, `max_wait_ms` is checked when next job is forwarded). The rest
+of jobs is written at process exit. Jobs which can't be written stay in the
+buffer. Jobs buffered by forwarder are lost if process dies before they are
+written.
+"""
+import time
+import atexit
+import weakref
+import logging
+import threading
+
+from stepist.flow import session
+from stepist.flow.steps.step import StepData
+
+from stairs.core.pipeline.chunk import to_job_data
+from stairs.core.session.project_session import get_project
+from stairs.core.worker import outbox, queues, runs
+
+
+logger = logging.getLogger(__name__)
+
+# All forwarders of the process, flushed at exit
+_forwarders = weakref.WeakSet()
+
+# Set when job is buffered, so flusher recalculates its wait time
+_wakeup = threading.Event()
+_flusher_lock = threading.Lock()
+_flusher = None
+
+
+class JobsForwarder:
+    """
+    Buffer of jobs forwarded to pipelines, one per `call_pipeline`
+    component.
+
+    Buffer could be written by the thread which forwards jobs and by
+    flusher thread, writing is serialized by `write_lock`.
+    """
+
+    def __init__(self, batch_size, max_wait_ms=None):
+        """
+        :param batch_size: max amount of buffered jobs
+        :param max_wait_ms: max time job could stay in the buffer, None -
+        until buffer is full (or process exit)
+        """
+        self.batch_size = batch_size
+        self.max_wait_ms = max_wait_ms
+
+        # list of (step, StepData)
+        self.jobs = []
+        self.first_job_time = None
+        self.lock = threading.Lock()
+        self.write_lock = threading.RLock()
+
+        _forwarders.add(self)
+
+    def add(self, pipeline, data):
+        step = pipeline.get_stepist_step()
+        job_data = to_job_data(data)
+
+        if outbox.get_current_outbox() is not None:
+            queues.add_jobs(step.app, [(step, [job_data])])
+            return
+
+        meta_data = session.get_meta_data()
+
+        # job of tracked run is registered now, so run isn't completed
+        # while job is in the buffer
+        run_id = runs.get_run_id(meta_data)
+        if run_id is not None:
+            get_project().runs.add(run_id, 1)
+
+        with self.lock:
+            self.jobs.append((step, StepData(flow_data=job_data,
+                                             meta_data=meta_data)))
+
+            is_first_job = self.first_job_time is None
+            if is_first_job:
+                self.first_job_time = time.time()
+
+            is_ready = len(self.jobs) >= self.batch_size or \
+                self.is_wait_time_exceeded()
+
+        if is_ready:
+            self.flush()
+        elif is_first_job and self.max_wait_ms is not None and \
+                queues.is_thread_safe_engine(step.app):
+            start_flusher()
+            _wakeup.set()
+
+    def flush(self):
+        """
+        Write buffered jobs, one request per pipeline queue. If writing
+        failed, jobs are returned to the buffer.
+        """
+        with self.write_lock:
+            self.write_jobs()
+
+    def write_jobs(self):
+        with self.lock:
+            jobs = self.jobs
+            first_job_time = self.first_job_time
+            self.jobs = []
+            self.first_job_time = None
+
+        if not jobs:
+            return
+
+        jobs_by_step = dict()
+        for step, step_data in jobs:
+            jobs_by_step.setdefault(step, []).append(step_data)
+
+        stepist_app = jobs[0][0].app
+        try:
+            queues.write_jobs(stepist_app, list(jobs_by_step.items()))
+        except Exception:
+            with self.lock:
+                self.jobs = jobs + self.jobs
+                self.first_job_time = first_job_time
+            raise
+
+    def flush_at_exit(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Can't write %s forwarded jobs, they are lost",
+                             len(self.jobs))
+
+    def is_wait_time_exceeded(self) -> bool:
+        return self.get_wait_time_left() == 0
+
+    def get_wait_time_left(self):
+        """
+        :return: seconds before buffer should be written, None if there is
+        no time limit (or buffer is empty)
+        """
+        first_job_time = self.first_job_time
+        if self.max_wait_ms is None or first_job_time is None:
+            return None
+
+        return max(0, first_job_time + self.max_wait_ms / 1000 - time.time())
+
+
+def get_forwarder(batch_size=None, max_wait_ms=None):
+    """
+    :return: JobsForwarder, or None if jobs should be forwarded one by one
+    """
+    if not batch_size:
+        return None
+
+    return JobsForwarder(batch_size, max_wait_ms=max_wait_ms)
+
+
+def start_flusher():
+    global _flusher
+
+    with _flusher_lock:
+        if _flusher is None:
+            _flusher = threading.Thread(target=flush_on_wait_time,
+                                        daemon=True)
+            _flusher.start()
+
+
+def flush_on_wait_time():
+    """
+    Flusher thread, writes buffers which jobs wait longer than `max_wait_ms`.
+    """
+    while True:
+        _wakeup.clear()
+
+        timeout = None
+        for forwarder in list(_forwarders):
+            time_left = forwarder.get_wait_time_left()
+            if time_left is None:
+                continue
+
+            if time_left == 0:
+                try:
+                    forwarder.flush()
+                except Exception:
+                    logger.exception("Can't write %s forwarded jobs, will "
+                                     "try again with the next job",
+                                     len(forwarder.jobs))
+                continue
+
+            if timeout is None or time_left < timeout:
+                timeout = time_left
+
+        _wakeup.wait(timeout)
+
+
+@atexit.register
+def flush_all():
+    """
+    Write jobs of all forwarders (at process exit).
+    """
+    for forwarder in list(_forwarders):
+        forwarder.flush_at_exit()
@@ -3,6 +3,8 @@ import queue
 
 class GraphItem:
 
+    __slots__ = ('p_component', 'id', 'next')
+
     def __init__(self, pipeline_component, next=None):
         self.p_component = pipeline_component
 
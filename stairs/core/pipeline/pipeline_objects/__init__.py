@@ -1,16 +1,25 @@
 import copy
+import time
 import types
 import logging
 
 from collections import Iterable, Mapping
 
-from stepist.flow.utils import validate_handler_data, StopFlowFlag
+from stepist.flow import session
+from stepist.flow.utils import StopFlowFlag
 
 from stairs.core.utils.execeptions import StopPipelineFlag
+from stairs.core.utils.binding import bind_handler
 from stairs.core.utils.signals import on_component_called, on_component_finished
 
+from stairs.core.pipeline import chunk
+from stairs.core.pipeline.chunk import CHUNK_KEY
 from stairs.core.pipeline.pipeline_objects import context as pipeline_context
 from stairs.core.session import unique_id_session
+from stairs.core.session.project_session import get_project
+from stairs.core.worker import outbox
+from stairs.core.worker import runs
+from stairs.core.worker import queues as worker_queues
 
 
 logger = logging.getLogger(__name__)
@@ -18,8 +27,20 @@ logger = logging.getLogger(__name__)
 
 class PipelineComponent:
 
+    # Amount of produced rows written to the next worker queue at once
+    DEFAULT_FANOUT_BATCH_SIZE = 100
+
+    __slots__ = ('component', 'pipeline', 'config', 'update_pipe_data',
+                 '_context_list', 'when_handler', 'as_worker', 'pre_id', 'id',
+                 'name', 'key_wrapper', 'stepist_id', 'stepist_step',
+                 'routing_plan', 'vectorized',
+                 'fanout_batch_size', 'next_worker_step',
+                 'component_binding', 'when_binding',
+                 'on_component_called_signal', 'on_component_finished_signal')
+
     def __init__(self, pipeline, component, name, config, as_worker=False,
-                 id=None, update_pipe_data=False, when_handler=None, key_wrapper=None):
+                 id=None, update_pipe_data=False, when_handler=None, key_wrapper=None,
+                 vectorized=False, fanout_batch_size=None):
 
         self.component = component
         self.pipeline = pipeline
@@ -32,19 +53,40 @@ class PipelineComponent:
 
         self.when_handler = when_handler
 
+        # Handlers signatures analyzed once, see `bind_handler`
+        self.component_binding = bind_handler(component)
+        self.when_binding = bind_handler(when_handler)
+
         self.as_worker = as_worker
 
         self.pre_id = id or name
         self.id = self.gen_unique_id()
         self.name = name
         self.key_wrapper = key_wrapper
+
+        # Component gets whole columns of chunk jobs (see `chunk` module)
+        self.vectorized = vectorized
+        if vectorized and when_handler:
+            raise RuntimeError("`when` handler is not supported for "
+                               "vectorized component `%s`" % name)
+
         self.stepist_id = None
+        self.stepist_step = None
+
+        # Producer components write rows to the queue of the next worker
+        # step by batches, see `write_to_next_worker`
+        self.fanout_batch_size = \
+            fanout_batch_size or self.DEFAULT_FANOUT_BATCH_SIZE
+        self.next_worker_step = None
+
+        # Precomputed routing of data keys, see `compile_routing_plan`
+        self.routing_plan = None
 
         self.on_component_called_signal = on_component_called()
         self.on_component_finished_signal = on_component_finished()
 
     def run_component(self, data):
-        data = validate_handler_data(self.component, data)
+        data = self.component_binding(data)
         try:
             self.on_component_called_signal.send_signal(name=self.name)
             component_result = self.component(**data)
@@ -61,10 +103,88 @@ class PipelineComponent:
 
         return component_result
 
+    def run_vectorized(self, columns, length):
+        """
+        Run vectorized component with NumPy arrays as an input.
+
+        :return: result columns (see `chunk` module)
+        """
+        result = self.run_component(chunk.to_arrays(columns))
+        self.ensure_component_result_is_valid(result)
+
+        return chunk.from_vectorized_result(result, length)
+
+    def run_vectorized_row(self, data):
+        """
+        Run vectorized component for regular (one row) job.
+        """
+        columns = {key: [value] for key, value in data.items()}
+        result_columns = self.run_vectorized(columns, 1)
+
+        return next(chunk.iter_rows(result_columns, 1))
+
+    def chunk_output(self, kwargs, indexes, results):
+        """
+        Build output chunk job from results of the rows.
+
+        :param kwargs: input chunk job
+        :param indexes: indexes of input rows, for each result
+        :param results: list of rows results
+        """
+        if not indexes:
+            raise StopFlowFlag("No rows left in chunk")
+
+        if indexes != list(range(kwargs[CHUNK_KEY])):
+            kwargs = chunk.take_rows(kwargs, indexes)
+
+        if chunk.have_same_keys(results):
+            # each cell of result columns overwrites the same cell of kwargs
+            output = self.validate_output_data(kwargs)
+            return self.validate_output_data(
+                chunk.columns_from_rows(results), output)
+
+        # rows returned different keys, so each result is routed over
+        # kwargs of its own row (as for regular jobs)
+        rows = []
+        for row_kwargs, result in zip(chunk.iter_rows(kwargs, len(indexes)),
+                                      results):
+            output = self.validate_output_data(row_kwargs)
+            rows.append(self.validate_output_data(result, output))
+
+        output = chunk.columns_from_rows(rows)
+        output[CHUNK_KEY] = len(indexes)
+        return output
+
+    def write_to_next_worker(self, rows):
+        """
+        Write produced rows to the queue of the next (worker) step by
+        batches of `fanout_batch_size` jobs, instead of one write per row.
+
+        It's a generator without items, so stepist has nothing to forward
+        when it iterates over the result.
+        """
+        stepist_app = self.stepist_step.app
+
+        batch = []
+        for row_data in rows:
+            batch.append(row_data)
+            if len(batch) >= self.fanout_batch_size:
+                worker_queues.add_jobs(stepist_app,
+                                       [(self.next_worker_step, batch)])
+                batch = []
+
+        if batch:
+            worker_queues.add_jobs(stepist_app,
+                                   [(self.next_worker_step, batch)])
+
+        yield from ()
+
     def add_context(self, p_component, transformation):
         self._context_list.append(
             pipeline_context.ComponentContext(p_component, transformation)
         )
+        # contexts changed, routing plan should be rebuilt
+        self.routing_plan = None
 
     def gen_unique_id(self):
         return "%s:%s" % (
@@ -76,67 +196,42 @@ class PipelineComponent:
         new_component = copy.copy(self)
         # regenerate unique id
         new_component.id = new_component.gen_unique_id()
+        # routing plan depends on component id
+        new_component.routing_plan = None
 
         return new_component
 
-    def validate_output_data(self, data):
-        output_data = dict()
-        data_to_transform = dict()
+    def get_context_list(self):
+        return self._context_list
 
-        # remove all data related to current component
-        for key, value in data.items():
-            # skip values if it's not "subscribe" statement
-            related_to_current_component = pipeline_context\
-                .belongs_to_component(self, key)
+    def compile_routing_plan(self):
+        """
+        Precompute how data keys should be routed by current component.
+        Executed during pipeline compilation, when all next components
+        (contexts) are known.
+        """
+        self.routing_plan = pipeline_context.RoutingPlan(self)
+        return self.routing_plan
 
-            # skip data which was address to current component but it was
-            # "apply" type component
-            if related_to_current_component and not self.update_pipe_data:
-                continue
-
-            if not pipeline_context.is_context_key(key):
-                if not self._context_list:
-                    output_data[key] = value
+    def get_routing_plan(self):
+        if self.routing_plan is None:
+            return self.compile_routing_plan()
 
-                # collect data for transformation
-                data_to_transform[key] = value
-            else:
-                # in case if data related to current component
-                # but it should update global pipeline data, let's reassign
-                # it to next component
-                if related_to_current_component and self.update_pipe_data:
-                    unassign_key = pipeline_context.unassign_data(self, key)
-                    data_to_transform[unassign_key] = value
-                else:
-                    output_data[key] = value
-
-        # in case if component has context list (has next components)
-        # let's reassign data
-        if self._context_list:
-            # apply transformation and assign context labels
-            for context in self._context_list:
-                data = context.transformation(data_to_transform)
-                output_data.update(context.assign_labels(data))
-        else:
-            # in case if current component is last one
-            # and self.udpate_pipe_data, let's keep data
-            if self.update_pipe_data:
-                output_data.update(data_to_transform)
+        return self.routing_plan
 
-        return output_data
+    def validate_output_data(self, data, output_data=None):
+        """
+        :param output_data: dict which should be populated by routed data,
+        new dict created if not specified
+        """
+        return self.get_routing_plan().get_output_data(data, output_data)
 
     def run_on_when_handler(self, data):
-        when_data = validate_handler_data(self.when_handler, data)
+        when_data = self.when_binding(data)
         return self.when_handler(**when_data)
 
     def validate_input_data(self, data):
-        input_data = dict()
-        for key, value in data.items():
-            if pipeline_context.belongs_to_component(self, key):
-                new_key = pipeline_context.unassign_data(self, key)
-                input_data[new_key] = value
-
-        return input_data
+        return self.get_routing_plan().get_input_data(data)
 
     def ensure_component_result_is_valid(self, data):
         if not isinstance(data, Mapping):
@@ -146,6 +241,7 @@ class PipelineComponent:
 
 
 class PipelineFlow(PipelineComponent):
+    __slots__ = ()
 
     def __init__(self, pipeline, component, **kwargs):
         component.compile(pipeline)
@@ -155,21 +251,39 @@ class PipelineFlow(PipelineComponent):
                                    **kwargs)
 
     def __call__(self, **kwargs):
+        if CHUNK_KEY in kwargs:
+            return self.call_chunk(kwargs)
+
         component_data = self.validate_input_data(kwargs)
 
         result = self.run_component(component_data)
         self.ensure_component_result_is_valid(result)
 
         # It's important to run kwargs validation and result validation
-        # separately, otherwise result will be overlap by kwargs
-        output_kwargs = self.validate_output_data(kwargs)
-        output_result = self.validate_output_data(result)
-        output = {**output_kwargs, **output_result}
+        # separately, result should overwrite kwargs data
+        output = self.validate_output_data(kwargs)
+        return self.validate_output_data(result, output)
 
-        return output
+    def call_chunk(self, kwargs):
+        columns = self.validate_input_data(kwargs)
+
+        indexes, results = [], []
+        for i, row in enumerate(chunk.iter_rows(columns, kwargs[CHUNK_KEY])):
+            try:
+                result = self.run_component(row)
+            except StopFlowFlag:
+                continue
+
+            self.ensure_component_result_is_valid(result)
+            indexes.append(i)
+            results.append(result)
+
+        return self.chunk_output(kwargs, indexes, results)
 
 
 class PipelineFlowProducer(PipelineComponent):
+    __slots__ = ()
+
     def __init__(self, pipeline, component, **kwargs):
         component.compile(pipeline)
         PipelineComponent.__init__(self,
@@ -178,43 +292,121 @@ class PipelineFlowProducer(PipelineComponent):
                                    **kwargs)
 
     def __call__(self, **kwargs):
+        rows = self.produce(**kwargs)
+
+        if self.next_worker_step is not None:
+            return self.write_to_next_worker(rows)
+
+        return rows
+
+    def produce(self, **kwargs):
+        if CHUNK_KEY in kwargs:
+            yield from self.call_chunk(kwargs)
+            return
+
         component_data = self.validate_input_data(kwargs)
 
         result = self.run_component(component_data)
 
         if isinstance(result, types.GeneratorType) or isinstance(result, Iterable):
+            # kwargs are the same for each row, route them only once
+            output_kwargs = self.validate_output_data(kwargs)
+
             for row_data in result:
                 self.ensure_component_result_is_valid(row_data)
                 # It's important to run kwargs validation and result validation
-                # separately, otherwise result will be overlap by kwargs
-                output_kwargs = self.validate_output_data(kwargs)
-                output_row_data = self.validate_output_data(row_data)
-                output = {**output_kwargs, **output_row_data}
-
-                yield output
+                # separately, row data should overwrite kwargs data
+                yield self.validate_output_data(row_data, dict(output_kwargs))
         else:
             raise RuntimeError("Flow producer should be a generator")
 
+    def call_chunk(self, kwargs):
+        """
+        All rows produced for the chunk are forwarded as one chunk job.
+        """
+        columns = self.validate_input_data(kwargs)
+
+        indexes, rows = [], []
+        for i, row in enumerate(chunk.iter_rows(columns, kwargs[CHUNK_KEY])):
+            try:
+                result = self.run_component(row)
+            except StopFlowFlag:
+                continue
+
+            for row_data in result:
+                self.ensure_component_result_is_valid(row_data)
+                indexes.append(i)
+                rows.append(row_data)
+
+        if indexes:
+            yield self.chunk_output(kwargs, indexes, rows)
+
 
 class PipelineFunction(PipelineComponent):
+    __slots__ = ()
+
     def __call__(self, **kwargs):
+        if CHUNK_KEY in kwargs:
+            return self.call_chunk(kwargs)
+
         component_data = self.validate_input_data(kwargs)
 
         if self.when_handler and not self.run_on_when_handler(component_data):
             result = component_data
+        elif self.vectorized:
+            result = self.run_vectorized_row(component_data)
         else:
             result = self.run_component(component_data)
 
         self.ensure_component_result_is_valid(result)
 
-        output_kwargs = self.validate_output_data(kwargs)
-        output_result = self.validate_output_data(result)
+        output = self.validate_output_data(kwargs)
+        return self.validate_output_data(result, output)
+
+    def call_chunk(self, kwargs):
+        columns = self.validate_input_data(kwargs)
+        length = kwargs[CHUNK_KEY]
 
-        return {**output_kwargs, **output_result}
+        if self.vectorized:
+            result = self.run_vectorized(columns, length)
+
+            output = self.validate_output_data(kwargs)
+            return self.validate_output_data(result, output)
+
+        # row-wise adapter, function called for each row
+        indexes, results = [], []
+        for i, row in enumerate(chunk.iter_rows(columns, length)):
+            if self.when_handler and not self.run_on_when_handler(row):
+                result = row
+            else:
+                try:
+                    result = self.run_component(row)
+                except StopFlowFlag:
+                    continue
+
+            self.ensure_component_result_is_valid(result)
+            indexes.append(i)
+            results.append(result)
+
+        return self.chunk_output(kwargs, indexes, results)
 
 
 class PipelineFunctionProducer(PipelineComponent):
+    __slots__ = ()
+
     def __call__(self, **kwargs):
+        rows = self.produce(**kwargs)
+
+        if self.next_worker_step is not None:
+            return self.write_to_next_worker(rows)
+
+        return rows
+
+    def produce(self, **kwargs):
+        if CHUNK_KEY in kwargs:
+            yield from self.call_chunk(kwargs)
+            return
+
         component_data = self.validate_input_data(kwargs)
 
         if self.when_handler and not self.run_on_when_handler(component_data):
@@ -224,23 +416,55 @@ class PipelineFunctionProducer(PipelineComponent):
 
         if isinstance(result, types.GeneratorType) or isinstance(result, Iterable):
             try:
+                # kwargs are the same for each row, route them only once
+                output_kwargs = self.validate_output_data(kwargs)
+
                 for row_data in result:
                     self.ensure_component_result_is_valid(row_data)
-                    # It's important to run kwargs validation and result validation
-                    # separately, otherwise result will be overlap by kwargs
-                    output_kwargs = self.validate_output_data(kwargs)
-                    output_row_data = self.validate_output_data(row_data)
-                    output = {**output_kwargs, **output_row_data}
-
-                    yield output
+                    # It's important to run kwargs validation and result
+                    # validation separately, row data should overwrite kwargs
+                    yield self.validate_output_data(row_data,
+                                                    dict(output_kwargs))
             except StopPipelineFlag:
                 return
         else:
             raise RuntimeError("Function producer should be a generator")
 
+    def call_chunk(self, kwargs):
+        """
+        All rows produced for the chunk are forwarded as one chunk job.
+        """
+        columns = self.validate_input_data(kwargs)
+
+        indexes, rows = [], []
+        for i, row in enumerate(chunk.iter_rows(columns, kwargs[CHUNK_KEY])):
+            if self.when_handler and not self.run_on_when_handler(row):
+                result = row
+            else:
+                try:
+                    result = self.run_component(row)
+                except StopFlowFlag:
+                    continue
+
+            try:
+                for row_data in result:
+                    self.ensure_component_result_is_valid(row_data)
+                    indexes.append(i)
+                    rows.append(row_data)
+            except StopPipelineFlag:
+                continue
+
+        if indexes:
+            yield self.chunk_output(kwargs, indexes, rows)
+
 
 class PipelineOutput(PipelineComponent):
+    __slots__ = ()
+
     def __call__(self, **kwargs):
+        if CHUNK_KEY in kwargs:
+            return self.call_chunk(kwargs)
+
         component_data = self.validate_input_data(kwargs)
 
         if self.when_handler and self.run_on_when_handler(component_data):
@@ -250,8 +474,242 @@ class PipelineOutput(PipelineComponent):
 
         return self.validate_output_data(kwargs)
 
+    def call_chunk(self, kwargs):
+        columns = self.validate_input_data(kwargs)
+
+        indexes = []
+        for i, row in enumerate(chunk.iter_rows(columns, kwargs[CHUNK_KEY])):
+            if not self.when_handler or self.run_on_when_handler(row):
+                try:
+                    self.run_component(row)
+                except StopFlowFlag:
+                    continue
+            indexes.append(i)
+
+        return self.chunk_output(kwargs, indexes, [{} for _ in indexes])
+
+
+class PipelineBatchComponent(PipelineComponent):
+    """
+    Component which handles batch of jobs in one call.
+
+    Batch component is always a worker. When it gets a job from streaming
+    service, it takes more jobs from the same queue (up to `batch_size` jobs
+    or until `max_wait_ms` passed) and calls user function once with list of
+    inputs (one dict per job). Then results are scattered back to each job.
+
+    Batch components return generator of outputs (one per job), so stepist
+    forwards each of them to the next component. Each output is forwarded
+    with meta data of its own job (e.g. run id, see `RunTracker`).
+    """
+    __slots__ = ('batch_size', 'max_wait_ms')
+
+    # How often to check queue for new jobs while waiting `max_wait_ms`
+    poll_interval = 0.005
+
+    def __init__(self, pipeline, component, batch_size, max_wait_ms=None,
+                 **kwargs):
+        PipelineComponent.__init__(self,
+                                   pipeline=pipeline,
+                                   component=component,
+                                   **kwargs)
+        self.batch_size = batch_size
+        self.max_wait_ms = max_wait_ms or 0
+
+    def __call__(self, **kwargs):
+        jobs, received_jobs = self.gather_jobs(kwargs)
+
+        rows, rows_meta_data = [], []
+        for job_data, meta_data in jobs:
+            # batch handled row by row, so chunks are split to rows
+            for row in chunk.explode_jobs([job_data]):
+                rows.append(row)
+                rows_meta_data.append(meta_data)
+
+        try:
+            outputs = self.run_batch(rows)
+        except Exception:
+            # jobs which we took from streaming service should not be lost
+            self.return_jobs(received_jobs)
+            raise
+
+        # outputs could fail to be forwarded or written, inside outbox jobs
+        # are returned when it's discarded
+        return_on_error = outbox.get_current_outbox() is None
+        outbox.on_discard(self.return_jobs, received_jobs)
+
+        if self.stepist_step is None or self.stepist_step.is_last_step():
+            # stepist doesn't iterate outputs of the last step
+            self.complete_jobs(received_jobs)
+            return (output for output in outputs)
+
+        # generator, so stepist will forward each output to the next step
+        return self.forward_outputs(outputs, rows_meta_data, received_jobs,
+                                    return_on_error)
+
+    def forward_outputs(self, outputs, rows_meta_data, received_jobs,
+                        return_on_error=True):
+        """
+        Yields outputs with meta data of their jobs.
+
+        If next step fails, stepist stops iterating outputs (exception is
+        raised outside of the generator), so jobs are returned when
+        generator is closed before all outputs are forwarded.
+        """
+        current_meta_data = session.get_meta_data()
+        forwarded = False
+        try:
+            for output, meta_data in zip(outputs, rows_meta_data):
+                session.set_meta_data(meta_data)
+                yield output
+            forwarded = True
+        finally:
+            session.set_meta_data(current_meta_data)
+            if not forwarded and return_on_error:
+                self.return_jobs(received_jobs)
+
+        # outputs are forwarded (and registered in run tracker)
+        self.complete_jobs(received_jobs)
+
+    def complete_jobs(self, received_jobs):
+        """
+        Mark jobs which we took from streaming service as done for run
+        tracker (stepist completes only the first job of the batch).
+        """
+        for job in received_jobs:
+            run_id = runs.get_run_id(job.get('meta_data') or {})
+            if run_id is not None:
+                outbox.after_flush(get_project().runs.complete, run_id)
+
+    def gather_jobs(self, first_job):
+        """
+        Collect jobs for one batch, the first one is a job which stepist
+        gave us.
+
+        :return: list of (job data, meta data) tuples, and list of jobs
+        payloads which were taken from streaming service directly.
+        """
+        jobs = [(first_job, session.get_meta_data())]
+        received_jobs = []
+
+        if self.stepist_step is None or not self.stepist_step.as_worker:
+            return jobs, received_jobs
+
+        worker_engine = self.stepist_step.app.worker_engine
+        deadline = time.time() + self.max_wait_ms / 1000
+
+        while len(jobs) < self.batch_size:
+            new_jobs = worker_queues.receive_jobs(worker_engine,
+                                                  self.stepist_step,
+                                                  self.batch_size - len(jobs))
+            if new_jobs:
+                received_jobs.extend(new_jobs)
+                jobs.extend((job['flow_data'], job.get('meta_data') or {})
+                            for job in new_jobs)
+                continue
+
+            time_left = deadline - time.time()
+            if time_left <= 0:
+                break
+            time.sleep(min(self.poll_interval, time_left))
+
+        return jobs, received_jobs
+
+    def return_jobs(self, received_jobs):
+        if received_jobs:
+            worker_queues.return_jobs(self.stepist_step.app.worker_engine,
+                                      self.stepist_step,
+                                      received_jobs)
+
+    def select_by_when_handler(self, inputs):
+        """
+        :return: indexes of inputs which should be processed by component
+        """
+        if not self.when_handler:
+            return list(range(len(inputs)))
+
+        return [i for i, data in enumerate(inputs)
+                if self.run_on_when_handler(data)]
+
+    def run_component_batch(self, items):
+        if not items:
+            return []
+
+        try:
+            self.on_component_called_signal.send_signal(name=self.name)
+            batch_result = self.call_batch(items)
+            self.on_component_finished_signal.send_signal(name=self.name)
+        except StopPipelineFlag as e:
+            raise StopFlowFlag(e)
+
+        return batch_result
+
+    def call_batch(self, items):
+        return self.component(items)
+
+    def run_batch(self, jobs):
+        raise NotImplementedError()
+
+
+class PipelineBatchFunction(PipelineBatchComponent):
+    """
+    Batch version of PipelineFunction. User function gets list of inputs
+    and should return list of results (`Mapping` like objects) in the same
+    order.
+    """
+    __slots__ = ()
+
+    def run_batch(self, jobs):
+        inputs = [self.validate_input_data(job) for job in jobs]
+
+        # jobs skipped by `when` handler keep their data (as PipelineFunction)
+        results = list(inputs)
+
+        selected = self.select_by_when_handler(inputs)
+        batch_result = self.run_component_batch([inputs[i] for i in selected])
+
+        batch_result = list(batch_result or [])
+        if len(batch_result) != len(selected):
+            raise RuntimeError("Batch function `%s` should return list of "
+                               "results, one for each input" % self.name)
+
+        for i, result in zip(selected, batch_result):
+            if self.key_wrapper is not None:
+                result = {self.key_wrapper: result}
+            results[i] = result
+
+        outputs = []
+        for job, result in zip(jobs, results):
+            self.ensure_component_result_is_valid(result)
+
+            output = self.validate_output_data(job)
+            outputs.append(self.validate_output_data(result, output))
+
+        return outputs
+
+
+class PipelineBatchOutput(PipelineBatchComponent):
+    """
+    Batch version of PipelineOutput. Consumer gets list of inputs, result is
+    ignored.
+    """
+    __slots__ = ()
+
+    def call_batch(self, items):
+        return self.component.call_batch(items)
+
+    def run_batch(self, jobs):
+        inputs = [self.validate_input_data(job) for job in jobs]
+
+        selected = self.select_by_when_handler(inputs)
+        self.run_component_batch([inputs[i] for i in selected])
+
+        return [self.validate_output_data(job) for job in jobs]
+
 
 class PipelineConnectorComponent(PipelineComponent):
+    __slots__ = ()
+
     def __init__(self, pipeline, name="Connector"):
         PipelineComponent.__init__(self,
                                    pipeline=pipeline,
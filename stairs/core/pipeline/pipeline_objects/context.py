@@ -1,3 +1,11 @@
+from stairs.core.pipeline.chunk import CHUNK_KEY
+from stairs.core.pipeline.pipeline_objects import transformation as \
+    transformations_types
+
+
+# Route marker for keys which forwarded to the next component, but have lower
+# priority than keys labeled by current component from the same data
+WEAK_FORWARD = 'weak'
 
 
 class ComponentContext:
@@ -5,6 +13,7 @@ class ComponentContext:
     Provide context for component, which data should be transferred and who
     will be responsible for this data in the future.
     """
+    __slots__ = ('to_p_component', 'transformation')
 
     def __init__(self, p_component, component_keys_transformation):
         """
@@ -20,11 +29,241 @@ class ComponentContext:
         output_data = dict()
 
         for key, value in data.items():
-            key = "%s->%s" % (key, self.to_p_component.id)
-            output_data[key] = value
+            output_data[self.assign_label(key)] = value
 
         return output_data
 
+    def assign_label(self, key):
+        return "%s->%s" % (key, self.to_p_component.id)
+
+    def is_key_transformation(self):
+        """
+        True if transformation could be applied for each key separately
+        (one key -> one key or nothing).
+        """
+        return isinstance(self.transformation, (transformations_types.KeyToKey,
+                                                transformations_types.AllKeys))
+
+
+class RoutingPlan:
+    """
+    Precomputed routing of data keys for one pipeline component.
+
+    Data which goes through the pipeline has two kinds of keys:
+        - "plain" keys (`key`) - result of user functions
+        - context keys (`key->component_id`) - data addressed to some component
+
+    Instead of checking and splitting each key on every call, routing plan
+    resolves each key once (and keeps the result) into:
+        - input route: name under which current component reads the key
+        - output route: drop the key, forward it as is, or pass it to the
+          next components under precomputed labels (`key->next_component_id`)
+
+    Transformations which work per key (KeyToKey, AllKeys) are resolved into
+    labels directly. Transformations which need all data at once
+    (e.g. KeysToDict) are applied on collected data after routing.
+    """
+
+    __slots__ = ('component_id', 'update_pipe_data', 'has_contexts',
+                 'key_contexts', 'group_contexts', 'context_targets',
+                 'input_routes', 'output_routes', 'label_sources',
+                 'label_sources_complete')
+
+    # Protect plan from unlimited growth, when user functions return
+    # unique keys all the time
+    max_cached_keys = 10 ** 4
+
+    def __init__(self, p_component):
+        self.component_id = p_component.id
+        self.update_pipe_data = p_component.update_pipe_data
+
+        contexts = p_component.get_context_list()
+
+        self.has_contexts = bool(contexts)
+        self.key_contexts = [c for c in contexts if c.is_key_transformation()]
+        self.group_contexts = [c for c in contexts
+                               if not c.is_key_transformation()]
+
+        self.context_targets = {c.to_p_component.id for c in contexts}
+
+        self.input_routes = dict()
+        self.output_routes = dict()
+
+        # label -> keys which routed under this label, allows to check weak
+        # forwards without scanning all data
+        self.label_sources = dict()
+        self.label_sources_complete = True
+
+    def get_input_data(self, data):
+        input_routes = self.input_routes
+        input_data = dict()
+
+        for key, value in data.items():
+            try:
+                name = input_routes[key]
+            except KeyError:
+                name = self.resolve_input_key(key)
+
+            if name is not None:
+                input_data[name] = value
+
+        return input_data
+
+    def get_output_data(self, data, output_data=None):
+        """
+        Route data to the next components.
+
+        :param data: component input or result data
+        :param output_data: dict to populate with routed data, instead of
+        allocating new one. Values already stored there will be overwritten.
+        :return: output_data
+        """
+        output_routes = self.output_routes
+
+        if output_data is None:
+            output_data = dict()
+
+        group_data = dict() if self.group_contexts else None
+        weak_forwards = None
+
+        for key, value in data.items():
+            try:
+                forward, name, labels = output_routes[key]
+            except KeyError:
+                forward, name, labels = self.resolve_output_key(key)
+
+            if forward is True:
+                output_data[key] = value
+            elif forward is WEAK_FORWARD:
+                # should not overwrite labels of the current component
+                # from the same data, applied after all labels are set
+                if weak_forwards is None:
+                    weak_forwards = []
+                weak_forwards.append((key, value))
+
+            for label in labels:
+                output_data[label] = value
+
+            if name is not None and group_data is not None:
+                group_data[name] = value
+
+        if weak_forwards is not None:
+            # values already stored in output_data (e.g. routed kwargs) are
+            # overwritten, as any other key
+            for key, value in weak_forwards:
+                if not self.is_labeled(key, data):
+                    output_data[key] = value
+
+        for context in self.group_contexts:
+            transformed_data = context.transformation(group_data)
+            output_data.update(context.assign_labels(transformed_data))
+
+        return output_data
+
+    def is_labeled(self, label, data):
+        """
+        True if current component assigns `label` to some key of the data
+        (all routes are resolved already).
+        """
+        if self.label_sources_complete:
+            for key in self.label_sources.get(label, ()):
+                if key in data:
+                    return True
+            return False
+
+        # some routes are not cached, check all data
+        for key in data.keys():
+            route = self.output_routes.get(key)
+            if route is None:
+                route = self.resolve_output_key(key)
+            if label in route[2]:
+                return True
+
+        return False
+
+    def resolve_input_key(self, key):
+        name, target = split_context_key(key)
+
+        if target != self.component_id:
+            name = None
+
+        self.cache_route(self.input_routes, key, name)
+        return name
+
+    def resolve_output_key(self, key):
+        """
+        Returns route for the key as a tuple of:
+            - forward: True if key should be kept in output as is,
+              WEAK_FORWARD if it should be kept only when current component
+              has no data for the same key
+            - name: name of data which used by next components transformations
+            - labels: list of output keys for the next components
+        """
+        name, target = split_context_key(key)
+
+        if key == CHUNK_KEY:
+            # amount of rows in chunk job, goes through all components
+            route = (True, None, ())
+        elif target is None:
+            # "plain" key, last component keeps it as is
+            route = (not self.has_contexts, name, self.get_labels(name))
+        elif target == self.component_id:
+            # data addressed to current component, but only "subscribe"
+            # components forward it to the next components
+            if self.update_pipe_data:
+                route = (False, name, self.get_labels(name))
+            else:
+                route = (False, None, ())
+        elif target in self.context_targets:
+            # data addressed to the next component, but current component
+            # could address the same key there as well
+            route = (WEAK_FORWARD, None, ())
+        else:
+            # data addressed to other component
+            route = (True, None, ())
+
+        labels = route[2]
+        if self.cache_route(self.output_routes, key, route):
+            for label in labels:
+                self.label_sources[label] = \
+                    self.label_sources.get(label, ()) + (key, )
+        elif labels:
+            self.label_sources_complete = False
+
+        return route
+
+    def get_labels(self, name):
+        if not self.has_contexts:
+            # last component keeps data only for "subscribe" components
+            return (name, ) if self.update_pipe_data else ()
+
+        labels = []
+        for context in self.key_contexts:
+            new_name = context.transformation.transform_and_assign(name)
+            if new_name is not None:
+                labels.append(context.assign_label(new_name))
+
+        return tuple(labels)
+
+    def cache_route(self, routes, key, route):
+        if len(routes) < self.max_cached_keys:
+            routes[key] = route
+            return True
+
+        return False
+
+
+def split_context_key(key):
+    """
+    Split key into data name and component id, component id is None
+    for "plain" keys.
+    """
+    if '->' not in key:
+        return key, None
+
+    name, _, component_id = key.partition('->')
+    return name, component_id
+
 
 def is_context_key(key):
     return '->' in key
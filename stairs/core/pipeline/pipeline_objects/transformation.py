@@ -47,4 +47,7 @@ class AllKeys:
         if self.transformation_map:
             return self.key_to_key(data_to_transform)
         else:
-            return data_to_transform
\ No newline at end of file
+            return data_to_transform
+
+    def transform_and_assign(self, key):
+        return self.key_to_key.transform_and_assign(key)
\ No newline at end of file
@@ -1,13 +1,23 @@
+import json
 import time
+import hashlib
+import inspect
+import itertools
 
 from functools import wraps
-from stepist.flow import session
-from stepist.flow.steps.next_step import call_next_step
-
 from stairs.core.session.project_session import get_project
 
 from stairs.core import app_components
-from stairs.core.producer.utils import producer_retry
+from stairs.core.producer.aio import iter_async_jobs
+from stairs.core.producer.reader import ThreadedReader
+from stairs.core.producer.frames import iter_frame_jobs
+from stairs.core.producer.utils import get_workers_steps, to_jobs
+from stairs.core.producer.checkpoint import accepts_checkpoint, \
+    accepts_watermark, write_jobs, skip_checkpoints
+from stairs.core.worker.writer import JobsWriter, TransactionalJobsWriter, \
+    ChunksProgress, CheckpointState, WatermarkState
+from stairs.core.worker.backpressure import QueueBackpressure
+from stairs.core.worker.runs import RUN_ID_KEY
 
 
 class Producer(app_components.AppProducer):
@@ -16,16 +26,53 @@ class Producer(app_components.AppProducer):
     """
     retry_sleep_time = 5
 
+    # Jobs are written to streaming service by chunks, see JobsWriter
+    default_chunk_size = 1000
+    default_flush_interval = 1
+
+    # Max amount of jobs in pipeline queue, before producer pauses
+    DEFAULT_QUEUE_LIMIT = 10 ** 6
+
+    default_concurrency = 10
+
     def __init__(self, app, handler, default_callbacks: list,
                  single_transaction=False, repeat_on_signal=None,
-                 repeat_times=None):
+                 repeat_times=None, chunk_size=None, flush_interval=None,
+                 queue_limit=None, queue_low_limit=None,
+                 transaction_chunk_size=None, concurrency=None,
+                 read_ahead=None, track_runs=False, frame_chunk_rows=None,
+                 explode=False):
 
         self.app = app
 
         self.single_transaction = single_transaction
+        # If defined, single transaction is split to chunks of this size,
+        # each chunk committed separately (see run_transaction_chunks)
+        self.transaction_chunk_size = transaction_chunk_size
+
+        # Max amount of jobs to write at once, and max time (in seconds)
+        # which job could wait in buffer before writing
+        self.chunk_size = chunk_size or self.default_chunk_size
+        if flush_interval is None:
+            flush_interval = self.default_flush_interval
+        self.flush_interval = flush_interval
+
+        # Producer pauses when pipelines queues reach `queue_limit` jobs, and
+        # resumes when they have less than `queue_low_limit` jobs.
+        self.queue_limit = queue_limit or self.DEFAULT_QUEUE_LIMIT
+        self.queue_low_limit = queue_low_limit
 
         # The main generator which yields data
         self.handler = handler
+        # Max amount of awaitables executed at once by async handler
+        self.concurrency = concurrency or self.default_concurrency
+        # If defined, handler is executed in a separate thread, with buffer
+        # for `read_ahead` jobs (see ThreadedReader)
+        self.read_ahead = read_ahead
+        # If defined, pandas DataFrames and NumPy record arrays are split to
+        # chunks of `frame_chunk_rows` rows, with `explode` flag (see Chunk)
+        self.frame_chunk_rows = frame_chunk_rows
+        self.explode = explode
 
         # Callbacks which should be run always
         self.default_callbacks = default_callbacks or []
@@ -36,6 +83,14 @@ class Producer(app_components.AppProducer):
         # signal
         self.repeat_times = repeat_times
 
+        # Count outstanding jobs of each run through all pipelines, and
+        # publish event when all of them done (see RunTracker). Signals
+        # which need it have `track_runs` attribute.
+        self.track_runs = track_runs or \
+            getattr(repeat_on_signal, 'track_runs', False)
+        self.current_run_id = None
+        self.last_run_id = None
+
         # Stepist step basically to forward jobs to current producer
         # e.g. from Batch Producer
         self.stepist_step = self.app\
@@ -48,6 +103,15 @@ class Producer(app_components.AppProducer):
         app_components.AppProducer.__init__(self, app)
 
     def __call__(self, **kwargs):
+        return self.run_repeated(kwargs)
+
+    def run_repeated(self, user_kwargs=None, resume=False):
+        """
+        Execute producer, repeated by `repeat_on_signal` / `repeat_times`.
+        With `resume` the first execution is continued from the last stored
+        checkpoint.
+        """
+        user_kwargs = user_kwargs or dict()
 
         if self.default_callbacks:
             get_project().print("Generating jobs for: ")
@@ -57,37 +121,205 @@ class Producer(app_components.AppProducer):
             get_project().print("No callbacks found, running producer ..")
 
         if self.repeat_on_signal:
-            self.run_signal_repeat(**kwargs)
+            self.run_signal_repeat(user_kwargs, resume=resume)
         elif self.repeat_times:
-            for _ in range(self.repeat_times):
-                self.run(**kwargs)
+            for i in range(self.repeat_times):
+                self.run_producer(user_kwargs, resume=resume and i == 0)
         else:
-            self.run(**kwargs)
+            return self.run_producer(user_kwargs, resume=resume)
 
     def run(self, **user_kwargs):
         """
         Execute producer from console with specified args and kwargs.
         Also can have custom callbacks specified there.
+
+        :return: amount of written jobs
         """
+        return self.run_producer(user_kwargs, resume=False)
 
+    def resume(self, **user_kwargs):
+        """
+        Execute producer from the last stored checkpoint (see `Checkpoint`).
+        Producers without `checkpoint` argument are executed from the start.
+        """
+        return self.run_producer(user_kwargs, resume=True)
+
+    def run_producer(self, user_kwargs, resume=False):
+        if not self.track_runs:
+            return self.produce(user_kwargs, resume)
+
+        runs = get_project().runs
+        self.current_run_id = runs.start()
+        try:
+            return self.produce(user_kwargs, resume)
+        finally:
+            # producer itself is the last job of the run
+            self.last_run_id, self.current_run_id = self.current_run_id, None
+            runs.complete(self.last_run_id)
+
+    def produce(self, user_kwargs, resume=False):
         callbacks_to_run = self.default_callbacks
 
         single_transaction = self.single_transaction
         user_kwargs = user_kwargs or dict()
 
+        handler_kwargs = dict(user_kwargs)
+        checkpoints = None
+        if accepts_checkpoint(self.handler):
+            handler_kwargs['checkpoint'] = None
+            # Single transaction is written at once, nothing to resume from
+            if not single_transaction:
+                checkpoints = self.get_checkpoints(user_kwargs)
+                handler_kwargs['checkpoint'] = \
+                    self.get_start_checkpoint(checkpoints, resume)
+
+        watermarks = None
+        if accepts_watermark(self.handler):
+            watermarks = self.get_watermarks(user_kwargs)
+            handler_kwargs['watermark'] = self.get_start_watermark(watermarks)
+
         # Running jobs from producer
         if not single_transaction:
-            for job in self.handler(**user_kwargs):
-                self.send_job(job, callbacks_to_run)
+            with self.get_jobs_writer(callbacks_to_run,
+                                      checkpoints=checkpoints,
+                                      watermarks=watermarks) as writer:
+                write_jobs(writer, self.iter_jobs(handler_kwargs))
+
+            if checkpoints is not None:
+                checkpoints.reset()
+
+            return writer.written_jobs
+        elif self.transaction_chunk_size:
+            return self.run_transaction_chunks(callbacks_to_run,
+                                               user_kwargs,
+                                               handler_kwargs,
+                                               watermarks=watermarks)
+        else:
+            jobs_to_send = list(self.iter_jobs(handler_kwargs))
+            return self.send_jobs(jobs_to_send, callbacks_to_run,
+                                  watermarks=watermarks)
+
+    def get_checkpoints(self, user_kwargs) -> CheckpointState:
+        return CheckpointState(self.app.project.stepist_app,
+                               self.app.project.dbs.redis_db,
+                               self.get_progress_key(user_kwargs))
+
+    def get_start_checkpoint(self, checkpoints, resume):
+        if not resume:
+            checkpoints.reset()
+            return None
+
+        checkpoint = checkpoints.get()
+        if checkpoint is not None:
+            get_project().print("Resuming producer from checkpoint: %s" %
+                                (checkpoint, ))
+
+        return checkpoint
+
+    def get_watermarks(self, user_kwargs) -> WatermarkState:
+        return WatermarkState(self.app.project.stepist_app,
+                              self.app.project.dbs.redis_db,
+                              self.get_progress_key(user_kwargs))
+
+    def get_start_watermark(self, watermarks):
+        watermark = watermarks.get()
+        if watermark is not None:
+            get_project().print("Producing data after watermark: %s" %
+                                (watermark, ))
+
+        return watermark
+
+    def reset_watermark(self, **user_kwargs):
+        """
+        Next run of producer with the same arguments reads all data again.
+        """
+        self.get_watermarks(user_kwargs).reset()
+
+    def iter_jobs(self, user_kwargs, ordered=False):
+        """
+        Jobs of producer handler, `async def` generators are executed by
+        event loop in a separate thread (see `aio` module). With `read_ahead`
+        handler is executed in a separate thread as well.
+
+        :param ordered: True if jobs should be in the same order as handler
+        yields them (async handler can't yield awaitables then)
+        """
+        jobs = self.handler(**user_kwargs)
+
+        if inspect.isasyncgen(jobs):
+            jobs = iter_async_jobs(jobs, concurrency=self.concurrency,
+                                   ordered=ordered)
         else:
-            jobs_to_send = list(self.handler(**user_kwargs))
-            self.send_jobs(jobs_to_send, callbacks_to_run)
+            jobs = to_jobs(jobs)
+
+        if self.frame_chunk_rows:
+            jobs = iter_frame_jobs(jobs, self.frame_chunk_rows, self.explode)
+
+        if self.read_ahead:
+            return self.iter_read_ahead(ThreadedReader(jobs, self.read_ahead))
+
+        return jobs
 
-    def run_signal_repeat(self, **user_kwargs):
+    def iter_read_ahead(self, reader: ThreadedReader):
+        yield from reader
+        get_project().print(reader.get_stats_message())
+
+    def run_transaction_chunks(self, callbacks_to_run, user_kwargs,
+                               handler_kwargs=None, watermarks=None):
+        """
+        Commit jobs by chunks of `transaction_chunk_size`, each chunk written
+        atomically for all callbacks. Amount of committed chunks is stored,
+        and if producer failed, next run with the same arguments skips jobs
+        which were committed before.
+
+        Producer handler should yield jobs in the same order for the same
+        arguments (so `async def` handler can't yield awaitables).
+        """
+        stepist_app = self.app.project.stepist_app
+        steps = [callback.step for callback in callbacks_to_run]
+
+        progress = ChunksProgress(stepist_app,
+                                  self.app.project.dbs.redis_db,
+                                  self.get_progress_key(user_kwargs))
+        writer = TransactionalJobsWriter(stepist_app,
+                                         steps,
+                                         chunk_size=self.transaction_chunk_size,
+                                         progress=progress,
+                                         meta_data=self.get_meta_data(),
+                                         backpressure=self.get_backpressure(
+                                             callbacks_to_run),
+                                         watermarks=watermarks)
+
+        jobs_to_skip = writer.get_committed_jobs_count()
+        if jobs_to_skip:
+            get_project().print("Resuming producer, skipping %s jobs committed "
+                                "before" % jobs_to_skip)
+
+        if handler_kwargs is None:
+            handler_kwargs = user_kwargs
+
+        with writer:
+            jobs = skip_checkpoints(self.iter_jobs(handler_kwargs,
+                                                   ordered=True),
+                                    writer)
+            for job in itertools.islice(jobs, jobs_to_skip, None):
+                writer.add(job)
+
+        progress.reset()
+
+        return writer.written_jobs
+
+    def get_progress_key(self, user_kwargs) -> str:
+        kwargs_hash = hashlib.md5(json.dumps(user_kwargs,
+                                             sort_keys=True,
+                                             default=str).encode()).hexdigest()
+        return "%s:%s" % (self.get_producer_id(), kwargs_hash)
+
+    def run_signal_repeat(self, user_kwargs, resume=False):
         repeat_count = 0
 
         while True:
-            self.run(**user_kwargs)
+            self.run_producer(user_kwargs, resume=resume and repeat_count == 0)
             if self.repeat_on_signal is None:
                 return
 
@@ -112,26 +344,51 @@ class Producer(app_components.AppProducer):
                            die_when_empty=die_when_empty)
 
     def send_job(self, job, callbacks_to_run):
-        with session.change_flow_ctx({}, {}):
-
-            # TODO: Make it more safe, it will good to run all callbacks
-            # in one transaction, otherwise there is a small chance to fail some
-            # callback and duplication/lose data
-            for callback in callbacks_to_run:
-                self._job_to_stepist(job, callback.step)
-
-    def send_jobs(self, jobs, callbacks_to_run):
-        with session.change_flow_ctx({}, {}):
-
-            # TODO: Make it more safe, it will good to run all callbacks
-            # in one transaction, otherwise there is a chance to fail some
-            # callback and duplication/lose data
-            for callback in callbacks_to_run:
-                self._job_to_stepist(jobs, callback.step, batch_data=True)
-
-    @producer_retry(5, Exception)
-    def _job_to_stepist(self, stepist_job, step, **kwargs):
-        call_next_step(stepist_job, step, **kwargs)
+        self.send_jobs([job], callbacks_to_run)
+
+    def send_jobs(self, jobs, callbacks_to_run, watermarks=None):
+        """
+        Write all jobs to all callbacks at once (one transaction for redis).
+        """
+        with self.get_jobs_writer(callbacks_to_run, chunk_size=None,
+                                  flush_interval=None,
+                                  watermarks=watermarks) as writer:
+            write_jobs(writer, jobs)
+
+        return writer.written_jobs
+
+    def get_jobs_writer(self, callbacks_to_run, **kwargs) -> JobsWriter:
+        steps = [callback.step for callback in callbacks_to_run]
+
+        writer_kwargs = dict(meta_data=self.get_meta_data(),
+                             chunk_size=self.chunk_size,
+                             flush_interval=self.flush_interval,
+                             backpressure=self.get_backpressure(
+                                 callbacks_to_run))
+        writer_kwargs.update(kwargs)
+
+        return JobsWriter(self.app.project.stepist_app,
+                          steps,
+                          **writer_kwargs)
+
+    def get_meta_data(self) -> dict:
+        """
+        Stepist meta data of producer jobs.
+        """
+        if self.current_run_id is None:
+            return {}
+
+        return {RUN_ID_KEY: self.current_run_id}
+
+    def get_backpressure(self, callbacks_to_run) -> QueueBackpressure:
+        """
+        Producer pauses when queue of any worker of the pipelines is full
+        (not only the first one).
+        """
+        return QueueBackpressure(self.app.project.stepist_app.worker_engine,
+                                 get_workers_steps(callbacks_to_run),
+                                 high_watermark=self.queue_limit,
+                                 low_watermark=self.queue_low_limit)
 
     def redirect_handler(self, handler):
         producer_chain = lambda *args, **kwargs: handler(self.handler(*args,
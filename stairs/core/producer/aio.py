@@ -0,0 +1,172 @@
+"""
+Support of `async def` generators as producers handlers.
+
+Async generator is executed by event loop in a separate thread, and jobs are
+passed to producer thread through bounded queue. So while producer writes
+jobs to streaming service, event loop already requests next data.
+
+Async generator could also yield awaitables (e.g. coroutines which fetch one
+page of data), they are executed concurrently (but not more than
+`concurrency` at once). Result of awaitable could be a job (same as
+producer yields), iterable of jobs or None. Order of jobs from awaitables is not guaranteed.
+
+`stairs.Checkpoint` (or `stairs.Watermark`) waits for all awaitables yielded
+before it, so it is passed after their jobs. Producers which are resumed by
+amount of committed jobs (`transaction_chunk_size`) need the same order of
+jobs on each run, so they can't yield awaitables.
+
+    @app.producer(my_pipeline, concurrency=20)
+    async def my_producer():
+        for page in range(1000):
+            yield fetch_page(page)  # coroutine, returns list of dicts
+"""
+import queue
+import asyncio
+import inspect
+import threading
+
+from stairs.core.producer.checkpoint import Checkpoint, Watermark
+from stairs.core.producer.utils import to_jobs
+
+
+# Time to wait for a free place in jobs queue (in seconds)
+PUT_WAIT_TIME = 0.005
+
+
+class _Done:
+    pass
+
+
+class _Error:
+    def __init__(self, exception):
+        self.exception = exception
+
+
+class _Stopped(Exception):
+    """
+    Producer thread stopped reading jobs.
+    """
+
+
+def iter_async_jobs(async_gen, concurrency=10, buffer_size=1000,
+                    ordered=False):
+    """
+    Iterate by jobs of async generator from the current (sync) thread.
+
+    :param async_gen: async generator object
+    :param concurrency: max amount of awaitables executed at once
+    :param buffer_size: max amount of jobs, which were generated, but not
+    consumed yet
+    :param ordered: True if jobs should be in the same order as generator
+    yields them, awaitables are not allowed then
+    """
+    jobs = queue.Queue(maxsize=buffer_size)
+    stopped = threading.Event()
+
+    thread = threading.Thread(target=_run_event_loop,
+                              args=(async_gen, jobs, stopped, concurrency,
+                                    ordered),
+                              daemon=True)
+    thread.start()
+
+    try:
+        while True:
+            item = jobs.get()
+
+            if isinstance(item, _Done):
+                return
+            if isinstance(item, _Error):
+                raise item.exception
+
+            yield item
+    finally:
+        stopped.set()
+        thread.join()
+
+
+def _run_event_loop(async_gen, jobs, stopped, concurrency, ordered):
+    loop = asyncio.new_event_loop()
+
+    try:
+        loop.run_until_complete(_produce(async_gen, jobs, stopped, concurrency,
+                                         ordered))
+        result = _Done()
+    except _Stopped:
+        return
+    except Exception as e:
+        result = _Error(e)
+    finally:
+        loop.close()
+
+    # consumer could be stopped meanwhile, don't block on full queue
+    while not stopped.is_set():
+        try:
+            jobs.put(result, timeout=PUT_WAIT_TIME)
+            return
+        except queue.Full:
+            continue
+
+
+async def _produce(async_gen, jobs, stopped, concurrency, ordered):
+    semaphore = asyncio.Semaphore(concurrency)
+    tasks = set()
+    errors = []
+
+    async def put(job):
+        while True:
+            if stopped.is_set():
+                raise _Stopped()
+
+            try:
+                jobs.put_nowait(job)
+                return
+            except queue.Full:
+                await asyncio.sleep(PUT_WAIT_TIME)
+
+    async def resolve(awaitable):
+        try:
+            for job in to_jobs(await awaitable):
+                await put(job)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            semaphore.release()
+
+    try:
+        async for item in async_gen:
+            if errors:
+                raise errors[0]
+
+            if inspect.isawaitable(item):
+                if ordered:
+                    if inspect.iscoroutine(item):
+                        item.close()
+                    raise RuntimeError("Producer can't yield awaitables, "
+                                       "order of their jobs is not "
+                                       "guaranteed")
+
+                await semaphore.acquire()
+                task = asyncio.ensure_future(resolve(item))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            else:
+                if isinstance(item, (Checkpoint, Watermark)) and tasks:
+                    # jobs yielded before checkpoint should be passed first
+                    await asyncio.gather(*list(tasks))
+                    if errors:
+                        raise errors[0]
+
+                await put(item)
+
+        if tasks:
+            await asyncio.gather(*tasks)
+
+        if errors:
+            raise errors[0]
+    finally:
+        pending_tasks = list(tasks)
+        for task in pending_tasks:
+            task.cancel()
+        await asyncio.gather(*pending_tasks, return_exceptions=True)
+
+        await async_gen.aclose()
@@ -1,11 +1,15 @@
 import time
-from stepist.flow import session
-from stepist.flow.steps.next_step import call_next_step
+import inspect
 
 from stairs.core.session.project_session import get_project
 
-from stairs.core.producer.utils import producer_retry
 from stairs.core import app_components
+from stairs.core.producer.aio import iter_async_jobs
+from stairs.core.producer.utils import get_workers_steps
+from stairs.core.producer.checkpoint import accepts_checkpoint, \
+    accepts_watermark, write_jobs
+from stairs.core.worker.writer import JobsWriter
+from stairs.core.worker.backpressure import QueueBackpressure
 
 
 class BatchProducer(app_components.AppProducer):
@@ -13,9 +17,18 @@ class BatchProducer(app_components.AppProducer):
     retry_sleep_time = 5
 
     def __init__(self, app, handler, simple_producer,
-                 repeat_on_signal=None, repeat_times=None):
+                 repeat_on_signal=None, repeat_times=None,
+                 queue_limit=None, queue_low_limit=None, concurrency=None):
         self.app = app
 
+        # Max amount of awaitables executed at once by async handler
+        self.concurrency = concurrency or simple_producer.concurrency
+
+        # Batch producer pauses when producer queue reaches `queue_limit`
+        # jobs, and resumes when it has less than `queue_low_limit` jobs.
+        self.queue_limit = queue_limit or simple_producer.queue_limit
+        self.queue_low_limit = queue_low_limit
+
         self.repeat_on_signal = repeat_on_signal
         self.repeat_times = repeat_times
 
@@ -26,29 +39,72 @@ class BatchProducer(app_components.AppProducer):
         app_components.AppProducer.__init__(self, app)
 
     def __call__(self, *args, **kwargs):
+        self.run_repeated(kwargs)
+
+    def run_repeated(self, kwargs=None, resume=False):
+        """
+        Generate batches, repeated by `repeat_on_signal` / `repeat_times`.
+        With `resume` the first generation is continued from the last stored
+        checkpoint.
+        """
+        kwargs = kwargs or dict()
+
         if self.repeat_on_signal:
-            self.run_signal_repeat(**kwargs)
+            self.run_signal_repeat(kwargs, resume=resume)
         elif self.repeat_times:
-            for _ in range(self.repeat_times):
-                self.run(**kwargs)
+            for i in range(self.repeat_times):
+                self.run_producer((), kwargs, resume=resume and i == 0)
         else:
-            self.run(**kwargs)
+            self.run_producer((), kwargs, resume=resume)
 
     def run(self, *args, **kwargs):
-        self.send_jobs(self.handler(*args, **kwargs))
+        self.run_producer(args, kwargs, resume=False)
+
+    def resume(self, *args, **kwargs):
+        """
+        Generate batches from the last stored checkpoint (see `Checkpoint`).
+        """
+        self.run_producer(args, kwargs, resume=True)
+
+    def run_producer(self, args, kwargs, resume=False):
+        handler_kwargs = dict(kwargs)
+        state_kwargs = dict(kwargs, batch_producer=self.key())
+
+        checkpoints = None
+        if accepts_checkpoint(self.handler):
+            checkpoints = self.producer.get_checkpoints(state_kwargs)
+            handler_kwargs['checkpoint'] = \
+                self.producer.get_start_checkpoint(checkpoints, resume)
+
+        watermarks = None
+        if accepts_watermark(self.handler):
+            watermarks = self.producer.get_watermarks(state_kwargs)
+            handler_kwargs['watermark'] = \
+                self.producer.get_start_watermark(watermarks)
+
+        jobs = self.handler(*args, **handler_kwargs)
+
+        if inspect.isasyncgen(jobs):
+            jobs = iter_async_jobs(jobs, concurrency=self.concurrency)
+
+        self.send_jobs(jobs, checkpoints=checkpoints, watermarks=watermarks)
+
+        if checkpoints is not None:
+            checkpoints.reset()
 
-    def run_signal_repeat(self, **user_kwargs):
+    def run_signal_repeat(self, user_kwargs, resume=False):
         repeat_count = 0
 
         while True:
-            self.run(**user_kwargs)
+            self.run_producer((), user_kwargs,
+                              resume=resume and repeat_count == 0)
 
             if self.repeat_on_signal is None:
                 return
 
             get_project().print("Finish %s iteration for batch generation. "
                                 "Run producer:run_jobs to execute producer"
-                                % repeat_count + 1)
+                                % (repeat_count + 1))
 
             while not self.repeat_on_signal(self.producer):
                 time.sleep(self.retry_sleep_time)
@@ -64,22 +120,33 @@ class BatchProducer(app_components.AppProducer):
     def flush(self):
         self.producer.stepist_step.flush_all()
 
-    def send_jobs(self, job_iterator):
-        with session.change_flow_ctx({}, {}):
-            for job in job_iterator:
-                # TODO: Make it more safe using single transaction
-                try:
-                    self.send_job_to_producer(job)
-                except Exception as e:
-                    print("Something happened during batch generation, producer"
-                          " was interrupted and jobs had forwarded to queue")
-                    print("Run producer:flush for `%s` producer "
-                          % self.producer.get_handler_name())
-                    raise
-
-    @producer_retry(5, Exception)
-    def send_job_to_producer(self, stepist_job):
-        call_next_step(stepist_job, self.producer.stepist_step)
+    def send_jobs(self, job_iterator, checkpoints=None, watermarks=None):
+        stepist_app = self.app.project.stepist_app
+        steps = [self.producer.stepist_step]
+
+        # simple producer queue, and queues of its pipelines workers
+        backpressure = QueueBackpressure(stepist_app.worker_engine,
+                                         steps + get_workers_steps(
+                                             self.producer.default_callbacks),
+                                         high_watermark=self.queue_limit,
+                                         low_watermark=self.queue_low_limit)
+        writer = JobsWriter(stepist_app,
+                            steps,
+                            chunk_size=self.producer.chunk_size,
+                            flush_interval=self.producer.flush_interval,
+                            meta_data={},
+                            backpressure=backpressure,
+                            checkpoints=checkpoints,
+                            watermarks=watermarks)
+        try:
+            with writer:
+                write_jobs(writer, job_iterator)
+        except Exception:
+            print("Something happened during batch generation, producer"
+                  " was interrupted and jobs had forwarded to queue")
+            print("Run producer:flush for `%s` producer "
+                  % self.producer.get_handler_name())
+            raise
 
     def key(self):
         return self.handler.__name__
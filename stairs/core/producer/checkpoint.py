@@ -0,0 +1,88 @@
+from stairs.core.utils.binding import bind_handler
+
+
+class Checkpoint:
+    """
+    Position of producer in data source (offset, cursor, last id, etc.).
+
+    Producer could yield checkpoint between jobs, it will be stored when all
+    jobs yielded before it are written to streaming service. When producer
+    resumed, last stored checkpoint is passed to producer function as
+    `checkpoint` argument:
+
+        @app.producer(my_pipeline)
+        def my_producer(checkpoint=None):
+            for page in range(checkpoint or 0, 1000):
+                for row in read_page(page):
+                    yield row
+                yield Checkpoint(page + 1)
+
+    Value should be json serializable.
+    """
+    __slots__ = ('value', )
+
+    def __init__(self, value):
+        self.value = value
+
+
+class Watermark:
+    """
+    High-water mark of data read by producer (e.g. max `updated_at` or id).
+
+    Last watermark yielded by producer is stored when all jobs of the run
+    are written. Next run passes it to producer function as `watermark`
+    argument, so producer could read only new data:
+
+        @app.producer(my_pipeline, repeat_times=24)
+        def my_producer(watermark=None):
+            for row in read_rows(updated_after=watermark):
+                yield row
+                yield Watermark(row['updated_at'])
+
+    Value should be json serializable.
+    """
+    __slots__ = ('value', )
+
+    def __init__(self, value):
+        self.value = value
+
+
+def accepts_argument(handler, name) -> bool:
+    """
+    True if producer function has argument `name` (e.g. `checkpoint`).
+    """
+    binding = bind_handler(handler)
+    return binding.args is not None and name in binding.args
+
+
+def accepts_checkpoint(handler) -> bool:
+    return accepts_argument(handler, 'checkpoint')
+
+
+def accepts_watermark(handler) -> bool:
+    return accepts_argument(handler, 'watermark')
+
+
+def write_jobs(writer, jobs):
+    """
+    Add jobs to JobsWriter, checkpoints and watermarks are passed to writer
+    separately.
+    """
+    for job in jobs:
+        if isinstance(job, Checkpoint):
+            writer.add_checkpoint(job.value)
+        elif isinstance(job, Watermark):
+            writer.set_watermark(job.value)
+        else:
+            writer.add(job)
+
+
+def skip_checkpoints(jobs, writer):
+    """
+    Jobs without checkpoints, watermarks are passed to writer.
+    """
+    for job in jobs:
+        if isinstance(job, Watermark):
+            writer.set_watermark(job.value)
+        elif not isinstance(job, Checkpoint):
+            yield job
@@ -0,0 +1,165 @@
+"""
+Reading of big files (CSV, JSON Lines, Parquet) by parallel producers.
+
+File is split into parts by batch producer, and each part is read by
+simple producer (see `ComponentsMixin.file_producer`):
+
+    - CSV and JSON Lines are split into byte ranges, aligned to the start of
+      a line. Ranges are read using memory mapping, so only pages of the
+      current lines are loaded into memory.
+    - Parquet is split by row groups, each row group is read by batches.
+
+Text formats expect one record per line (CSV values with line breaks are not
+supported).
+"""
+import os
+import csv
+import mmap
+
+from stairs.core.pipeline.chunk import Chunk
+from stairs.core.pipeline.encoded import Encoded
+
+
+FORMATS = ('csv', 'jsonl', 'parquet')
+
+FORMATS_BY_EXTENSION = {
+    '.csv': 'csv',
+    '.jsonl': 'jsonl',
+    '.ndjson': 'jsonl',
+    '.parquet': 'parquet',
+    '.pq': 'parquet',
+}
+
+
+def get_format(path, file_format=None) -> str:
+    if file_format is None:
+        extension = os.path.splitext(path)[1].lower()
+        file_format = FORMATS_BY_EXTENSION.get(extension)
+
+    if file_format not in FORMATS:
+        raise RuntimeError("Can't read `%s`, format should be one of: %s" %
+                           (path, ", ".join(FORMATS)))
+
+    return file_format
+
+
+def split_file(path, file_format, chunk_bytes, delimiter=','):
+    """
+    Parts of the file for producers: dicts with `start` and `end` (bytes for
+    text formats, row groups for parquet), and CSV `fieldnames`.
+    """
+    if file_format == 'parquet':
+        yield from split_parquet(path)
+        return
+
+    file_size = os.path.getsize(path)
+    if file_size == 0:
+        return
+
+    with open(path, 'rb') as f, \
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        start = 0
+        part = dict()
+
+        if file_format == 'csv':
+            start = next_line(mm, 0)
+            header = mm[:start].decode('utf-8').rstrip('\r\n')
+            part['fieldnames'] = next(csv.reader([header],
+                                                 delimiter=delimiter))
+
+        for start, end in split_lines(mm, start, file_size, chunk_bytes):
+            yield dict(part, start=start, end=end)
+
+
+def split_lines(mm, start, end, chunk_bytes):
+    """
+    Split byte range to parts of about `chunk_bytes`, each part ends after
+    the line break.
+    """
+    while start < end:
+        part_end = next_line(mm, min(start + chunk_bytes, end) - 1)
+        yield start, part_end
+        start = part_end
+
+
+def next_line(mm, position) -> int:
+    """
+    :return: offset of the line after `position`
+    """
+    line_end = mm.find(b'\n', position)
+    if line_end == -1:
+        return len(mm)
+
+    return line_end + 1
+
+
+def iter_lines(mm, start, end):
+    while start < end:
+        line_end = next_line(mm, start)
+        line = mm[start:line_end].rstrip(b'\r\n')
+        if line:
+            yield line
+        start = line_end
+
+
+def read_file_part(path, file_format, start, end, fieldnames=None,
+                   delimiter=',', rows_per_job=None):
+    """
+    Jobs of the file part.
+
+    JSON Lines are yielded as `Encoded` jobs (lines are not parsed by
+    producer). CSV rows are yielded as dicts, or as `Chunk` of
+    `rows_per_job` rows. Parquet is yielded as chunks of `rows_per_job` rows.
+    """
+    if file_format == 'parquet':
+        yield from read_parquet_part(path, start, end, rows_per_job)
+        return
+
+    with open(path, 'rb') as f, \
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        lines = iter_lines(mm, start, end)
+
+        if file_format == 'jsonl':
+            for line in lines:
+                yield Encoded(line)
+            return
+
+        rows = csv.DictReader((line.decode('utf-8') for line in lines),
+                              fieldnames=fieldnames,
+                              delimiter=delimiter)
+        if not rows_per_job:
+            yield from rows
+            return
+
+        block = []
+        for row in rows:
+            block.append(row)
+            if len(block) >= rows_per_job:
+                yield Chunk.from_rows(block)
+                block = []
+
+        if block:
+            yield Chunk.from_rows(block)
+
+
+def get_parquet_file(path):
+    try:
+        from pyarrow import parquet
+    except ImportError:
+        raise RuntimeError("pyarrow is required to read parquet files")
+
+    return parquet.ParquetFile(path, memory_map=True)
+
+
+def split_parquet(path):
+    for row_group in range(get_parquet_file(path).num_row_groups):
+        yield dict(start=row_group, end=row_group + 1)
+
+
+def read_parquet_part(path, start, end, rows_per_job=None):
+    parquet_file = get_parquet_file(path)
+
+    batches = parquet_file.iter_batches(batch_size=rows_per_job or 65536,
+                                        row_groups=list(range(start, end)))
+    for batch in batches:
+        yield Chunk(batch.to_pydict(), length=batch.num_rows)
@@ -0,0 +1,47 @@
+"""
+pandas DataFrames and NumPy record arrays as producer output.
+
+Frame is split into `Chunk` jobs of `chunk_rows` rows, column by column
+(`tolist` of each column), instead of converting each row to a dict and
+writing it as a separate job.
+"""
+from stairs.core.pipeline.chunk import Chunk
+
+
+def is_frame(data) -> bool:
+    """
+    True for pandas DataFrame or NumPy structured (record) array.
+    """
+    if hasattr(data, 'iloc') and hasattr(data, 'columns'):
+        return True
+
+    dtype = getattr(data, 'dtype', None)
+    return dtype is not None and dtype.names is not None
+
+
+def iter_frame_chunks(frame, chunk_rows, explode=False):
+    if hasattr(frame, 'iloc'):
+        columns = {str(name): frame[name].to_numpy()
+                   for name in frame.columns}
+    else:
+        columns = {name: frame[name] for name in frame.dtype.names}
+
+    length = len(frame)
+    for start in range(0, length, chunk_rows):
+        end = min(start + chunk_rows, length)
+        yield Chunk({name: column[start:end]
+                     for name, column in columns.items()},
+                    length=end - start,
+                    explode=explode)
+
+
+def iter_frame_jobs(jobs, chunk_rows, explode=False):
+    """
+    Replace frames yielded by producer with chunks, other jobs are yielded
+    as is.
+    """
+    for job in jobs:
+        if is_frame(job):
+            yield from iter_frame_chunks(job, chunk_rows, explode=explode)
+        else:
+            yield job
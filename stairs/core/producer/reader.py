@@ -0,0 +1,106 @@
+import time
+import queue
+import threading
+
+
+# Time to wait for a free place in the buffer, before check that consumer
+# is still alive (in seconds)
+PUT_WAIT_TIME = 0.1
+
+
+class _Done:
+    pass
+
+
+class _Error:
+    def __init__(self, exception):
+        self.exception = exception
+
+
+class ThreadedReader:
+    """
+    Reads jobs from producer handler in a separate thread, into a bounded
+    buffer. So handler (source I/O) and writing of jobs to streaming service
+    (broker I/O) are executed at the same time.
+
+    Both sides measure how long they waited for each other:
+        - reader_stall_time: buffer was full, writer is slower than handler
+        - writer_stall_time: buffer was empty, handler is slower than writer
+    """
+
+    def __init__(self, jobs, buffer_size=10000):
+        self.jobs = jobs
+        self.buffer = queue.Queue(maxsize=buffer_size)
+
+        self.reader_stall_time = 0
+        self.writer_stall_time = 0
+
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def __iter__(self):
+        self.thread = threading.Thread(target=self.read, daemon=True)
+        self.thread.start()
+
+        try:
+            while True:
+                item = self.get()
+
+                if isinstance(item, _Done):
+                    return
+                if isinstance(item, _Error):
+                    raise item.exception
+
+                yield item
+        finally:
+            self.stopped.set()
+            self.thread.join()
+
+    def read(self):
+        try:
+            for job in self.jobs:
+                if not self.put(job):
+                    return
+            result = _Done()
+        except Exception as e:
+            result = _Error(e)
+
+        self.put(result)
+
+    def get(self):
+        try:
+            return self.buffer.get_nowait()
+        except queue.Empty:
+            pass
+
+        started_at = time.time()
+        item = self.buffer.get()
+        self.writer_stall_time += time.time() - started_at
+
+        return item
+
+    def put(self, item) -> bool:
+        """
+        :return: False if consumer stopped reading
+        """
+        try:
+            self.buffer.put_nowait(item)
+            return True
+        except queue.Full:
+            pass
+
+        started_at = time.time()
+        try:
+            while not self.stopped.is_set():
+                try:
+                    self.buffer.put(item, timeout=PUT_WAIT_TIME)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        finally:
+            self.reader_stall_time += time.time() - started_at
+
+    def get_stats_message(self) -> str:
+        return "Reader waited for writer %.3f sec, writer waited for reader " \
+               "%.3f sec" % (self.reader_stall_time, self.writer_stall_time)
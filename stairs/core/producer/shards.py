@@ -0,0 +1,179 @@
+"""
+Parallel execution of producers in separate processes.
+
+Sharded producer is executed by `shard_count` processes, each one calls
+producer function with `shard_index` and `shard_count` arguments, and should
+yield only its part of data:
+
+    @app.producer(my_pipeline)
+    def my_producer(shard_index=0, shard_count=1):
+        for i, line in enumerate(open("data.csv")):
+            if i % shard_count == shard_index:
+                yield parse(line)
+
+Processes are forked, and each one opens its own connections to redis and
+streaming service (see `StairsProject.reconnect`). Results of processes are
+collected by the parent process, and printed as one summary. Process which
+exited without result (e.g. killed by OOM killer) is reported as failed.
+"""
+import time
+import queue
+import multiprocessing
+import traceback
+
+from stairs.core.session.project_session import get_project
+from stairs.core.producer.checkpoint import accepts_argument
+
+
+class ShardResult:
+    __slots__ = ('name', 'jobs_count', 'run_time', 'error')
+
+    def __init__(self, name, jobs_count=0, run_time=0, error=None):
+        self.name = name
+        self.jobs_count = jobs_count
+        self.run_time = run_time
+        self.error = error
+
+
+def is_sharded(producer) -> bool:
+    return accepts_argument(producer.handler, 'shard_index') and \
+        accepts_argument(producer.handler, 'shard_count')
+
+
+def run_shards(producer, shard_count, resume=False, **user_kwargs):
+    """
+    Run producer in `shard_count` processes, blocks until all of them done.
+
+    :return: total amount of written jobs
+    """
+    if not is_sharded(producer):
+        raise RuntimeError("Producer `%s` should have `shard_index` and "
+                           "`shard_count` arguments to run in shards" %
+                           producer.get_handler_name())
+
+    method = producer.resume if resume else producer.run
+
+    tasks = []
+    for shard_index in range(shard_count):
+        name = "%s [%s/%s]" % (producer.get_handler_name(),
+                               shard_index + 1,
+                               shard_count)
+        kwargs = dict(user_kwargs,
+                      shard_index=shard_index,
+                      shard_count=shard_count)
+        tasks.append((name, method, kwargs))
+
+    return run_parallel(tasks)
+
+
+# How often to check processes, while waiting for results (in seconds)
+POLL_TIMEOUT = 1
+
+
+def run_parallel(tasks):
+    """
+    Execute each (name, function, kwargs) in a separate process. Function
+    should return amount of written jobs.
+
+    :return: total amount of written jobs
+    """
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+
+    processes = []
+    for i, (name, func, kwargs) in enumerate(tasks):
+        process = context.Process(target=_run_task,
+                                  args=(results, i, name, func, kwargs))
+        process.start()
+        processes.append(process)
+
+    time_started = time.time()
+    total_jobs = 0
+    errors = []
+
+    for result in iter_results(results, tasks, processes):
+        total_jobs += result.jobs_count
+
+        if result.error is not None:
+            errors.append(result)
+            get_project().print("%s failed:\n%s" % (result.name, result.error))
+        else:
+            get_project().print("%s done: %s jobs in %.3f sec" %
+                                (result.name, result.jobs_count,
+                                 result.run_time))
+
+    for process in processes:
+        process.join()
+
+    get_project().print("Written %s jobs by %s processes in %.3f sec" %
+                        (total_jobs, len(processes),
+                         time.time() - time_started))
+
+    if errors:
+        raise RuntimeError("%s of %s processes failed: %s" %
+                           (len(errors), len(processes),
+                            ", ".join(result.name for result in errors)))
+
+    return total_jobs
+
+
+def iter_results(results, tasks, processes):
+    """
+    Results of the processes, as they are done.
+    """
+    pending = set(range(len(processes)))
+
+    while pending:
+        try:
+            index, result = results.get(timeout=POLL_TIMEOUT)
+        except queue.Empty:
+            exited = [index for index in sorted(pending)
+                      if not processes[index].is_alive()]
+            if not exited:
+                continue
+
+            # process could put result right before exit, it's in the
+            # queue already
+            yield from drain_results(results, pending)
+
+            for index in exited:
+                if index in pending:
+                    pending.discard(index)
+                    yield ShardResult(tasks[index][0],
+                                      error="Process exited with code %s "
+                                            "without result" %
+                                            processes[index].exitcode)
+            continue
+
+        if index in pending:
+            pending.discard(index)
+            yield result
+
+
+def drain_results(results, pending):
+    """
+    Results which are in the queue already, only of `pending` processes.
+    """
+    while True:
+        try:
+            index, result = results.get(timeout=POLL_TIMEOUT)
+        except queue.Empty:
+            return
+
+        if index in pending:
+            pending.discard(index)
+            yield result
+
+
+def _run_task(results, index, name, func, kwargs):
+    time_started = time.time()
+    try:
+        # connections of the parent process can't be shared
+        get_project().reconnect()
+
+        jobs_count = func(**kwargs) or 0
+        results.put((index, ShardResult(name,
+                                        jobs_count=jobs_count,
+                                        run_time=time.time() - time_started)))
+    except BaseException:
+        results.put((index, ShardResult(name, error=traceback.format_exc())))
@@ -27,3 +27,19 @@ def on_all_components_empty(producer: Producer):
             all_empty = False
 
     return all_empty
+
+
+def on_run_completed(producer: Producer):
+    """
+    Waits until all jobs of the last producer run (and jobs generated from
+    them by pipelines) are done. Unlike other signals, it doesn't check
+    queues, but waits for completion event of the run (see RunTracker).
+    """
+    if producer.last_run_id is None:
+        return True
+
+    return get_project().runs.wait(producer.last_run_id)
+
+
+# Producer tracks runs, when this signal used in `repeat_on_signal`
+on_run_completed.track_runs = True
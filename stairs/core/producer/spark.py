@@ -1,3 +1,5 @@
+import time
+
 from stairs.core import app_components
 from stairs.core.producer.utils import custom_callbacks_to_dict
 
@@ -7,12 +9,16 @@ class SparkProducer(app_components.AppProducer):
 
     """
     DEFAULT_QUEUE_LIMIT = 10 ** 6
+    DEFAULT_CHUNK_SIZE = 1000
 
-    def __init__(self, app, handler, default_callbacks: list, queue_limit=None):
+    def __init__(self, app, handler, default_callbacks: list, queue_limit=None,
+                 chunk_size=None):
 
         self.app = app
 
         self.queue_limit = queue_limit or self.DEFAULT_QUEUE_LIMIT
+        # Amount of rows of a partition written to the queues at once
+        self.chunk_size = chunk_size or self.DEFAULT_CHUNK_SIZE
 
         # The main generator which yields data
         self.handler = handler
@@ -81,7 +87,10 @@ class SparkProducer(app_components.AppProducer):
         # Running jobs from producer
         spark_rdd = self.handler(*user_args, **user_kwargs)
 
-        SparkJobs(spark_worker, steps_keys_to_run).show_must_go_on(spark_rdd)
+        SparkJobs(spark_worker,
+                  steps_keys_to_run,
+                  chunk_size=self.chunk_size,
+                  queue_limit=self.queue_limit).show_must_go_on(spark_rdd)
 
     def flush(self):
         for pipeline in self.default_callbacks:
@@ -101,18 +110,55 @@ class SparkProducer(app_components.AppProducer):
 
 
 class SparkJobs:
-    def __init__(self, spark_worker, steps_keys):
+    """
+    Writes rows of each partition to the queues by chunks of `chunk_size`
+    rows. Connection is created once per executor process and reused by all
+    partitions. Before each chunk, queues depth is checked, and writing is
+    paused while any queue has more than `queue_limit` jobs.
+    """
+
+    # How long to wait before checking queues depth again (in seconds)
+    queue_limit_pause = 1
+
+    def __init__(self, spark_worker, steps_keys, chunk_size=1000,
+                 queue_limit=None):
         self.spark_worker = spark_worker
         self.steps_keys = steps_keys
+        self.chunk_size = chunk_size
+        self.queue_limit = queue_limit
 
     def show_must_go_on(self, spark_rdd):
         spark_rdd.foreachPartition(self.handle_rdd)
 
     def handle_rdd(self, rdd):
         self.spark_worker.init_connection()
+
+        chunk = []
         for item in rdd:
-            self(item.asDict())
+            chunk.append(item.asDict())
+            if len(chunk) >= self.chunk_size:
+                self.add_jobs(chunk)
+                chunk = []
+
+        if chunk:
+            self.add_jobs(chunk)
 
     def __call__(self, row_data):
+        self.add_jobs([row_data])
+
+    def add_jobs(self, jobs):
+        self.wait_queue_limit()
+
         for key in self.steps_keys:
-            self.spark_worker.add_job(key, row_data)
+            self.spark_worker.add_jobs(key, jobs)
+
+    def wait_queue_limit(self):
+        if not self.queue_limit:
+            return
+
+        while self.max_jobs_count() >= self.queue_limit:
+            time.sleep(self.queue_limit_pause)
+
+    def max_jobs_count(self) -> int:
+        return max(self.spark_worker.jobs_count(key)
+                   for key in self.steps_keys)
@@ -0,0 +1,213 @@
+"""
+Reading of database tables (any DB-API connection) by parallel producers.
+
+Table is split into ranges of key values by batch producer, and each range
+is read by simple producer with one query (see
+`ComponentsMixin.table_producer`):
+
+    SELECT columns FROM table WHERE key >= start AND key < end
+
+So reading of each range uses index on the key, instead of OFFSET which
+becomes slower with each next page. Rows are fetched by `fetchmany`, with
+server-side cursor (if `cursor_factory` creates it) rows are not loaded
+into memory at once.
+
+Rows with NULL key are never read (NULL doesn't match any range).
+
+Integer keys are split by values, not by rows: each range covers
+`range_size` key values between MIN and MAX of the key. So sparse keys
+(e.g. with big gaps) create a batch job for each empty range as well.
+Other keys are split by rows (each `range_size`th key), which requires
+reading all keys of the table by batch producer.
+
+Table, key and columns names are inserted into SQL as is.
+"""
+import sys
+import inspect
+import itertools
+
+from stairs.core.pipeline.chunk import Chunk
+
+
+# SQL placeholders for DB-API `paramstyle`
+PLACEHOLDERS = {
+    'qmark': lambda i: '?',
+    'numeric': lambda i: ':%s' % (i + 1),
+    'named': lambda i: ':p%s' % i,
+    'format': lambda i: '%s',
+    'pyformat': lambda i: '%%(p%s)s' % i,
+}
+
+
+def get_paramstyle(connection) -> str:
+    """
+    DB-API `paramstyle` of the driver module, which defines the connection.
+    """
+    module = inspect.getmodule(type(connection))
+    while module is not None:
+        paramstyle = getattr(module, 'paramstyle', None)
+        if paramstyle is not None:
+            return paramstyle
+
+        package = module.__name__.rpartition('.')[0]
+        module = sys.modules.get(package) if package else None
+
+    raise RuntimeError("Can't detect DB-API paramstyle of %s, define it "
+                       "explicitly" % connection)
+
+
+class TableReader:
+    """
+    Splits the table into ranges of `key` values, and reads rows of a range.
+    """
+
+    def __init__(self, connect, table, key, columns=None, where=None,
+                 paramstyle=None, cursor_factory=None, fetch_size=1000):
+        """
+        :param connect: function without arguments, returns DB-API
+        connection
+        :param cursor_factory: function which creates cursor for connection,
+        by default `connection.cursor()`
+        """
+        self.connect = connect
+        self.table = table
+        self.key = key
+        self.columns = list(columns) if columns else None
+        self.where = where
+        self.paramstyle = paramstyle
+        self.cursor_factory = cursor_factory
+        self.fetch_size = fetch_size
+
+    def split(self, range_size):
+        """
+        Ranges of key values (dicts with `start`, `end` and `last`), each
+        range has up to `range_size` keys (integer keys) or rows (other keys).
+        """
+        connection = self.connect()
+        try:
+            min_key, max_key = self.fetch_one(connection,
+                                              "SELECT MIN(%s), MAX(%s)" %
+                                              (self.key, self.key))
+            if min_key is None:
+                return
+
+            if isinstance(min_key, int) and isinstance(max_key, int):
+                yield from split_int_range(min_key, max_key, range_size)
+            else:
+                yield from self.split_by_rows(connection, range_size)
+        finally:
+            connection.close()
+
+    def split_by_rows(self, connection, range_size):
+        """
+        Ranges of not integer keys, based on each `range_size`th key.
+        """
+        sql = "SELECT %s FROM %s%s ORDER BY %s" % (self.key,
+                                                   self.table,
+                                                   self.get_where_sql(),
+                                                   self.key)
+        cursor = self.get_cursor(connection)
+        try:
+            cursor.execute(sql)
+
+            start = None
+            end = None
+            for i, (key, ) in enumerate(self.fetch_rows(cursor)):
+                if i % range_size == 0:
+                    if start is not None:
+                        yield dict(start=start, end=key, last=False)
+                    start = key
+                end = key
+
+            if start is not None:
+                yield dict(start=start, end=end, last=True)
+        finally:
+            cursor.close()
+
+    def read(self, start, end, last=False, rows_per_job=None):
+        """
+        Rows with `start <= key < end` (`key <= end` for the last range), as
+        dicts or as `Chunk` of `rows_per_job` rows.
+        """
+        connection = self.connect()
+        try:
+            cursor = self.get_cursor(connection)
+            try:
+                sql, params = self.get_range_query(connection, start, end,
+                                                   last)
+                cursor.execute(sql, params)
+                columns = [column[0] for column in cursor.description]
+
+                fetch_size = rows_per_job or self.fetch_size
+                for rows in self.fetch_blocks(cursor, fetch_size):
+                    if rows_per_job:
+                        yield Chunk.from_rows(dict(zip(columns, row))
+                                              for row in rows)
+                    else:
+                        for row in rows:
+                            yield dict(zip(columns, row))
+            finally:
+                cursor.close()
+        finally:
+            connection.close()
+
+    def get_range_query(self, connection, start, end, last):
+        paramstyle = self.paramstyle or get_paramstyle(connection)
+        placeholder = PLACEHOLDERS[paramstyle]
+        conditions = ["%s >= %s" % (self.key, placeholder(0)),
+                      "%s %s %s" % (self.key, '<=' if last else '<',
+                                    placeholder(1))]
+        if self.where:
+            conditions.append("(%s)" % self.where)
+
+        sql = "SELECT %s FROM %s WHERE %s" % (", ".join(self.columns or '*'),
+                                              self.table,
+                                              " AND ".join(conditions))
+
+        params = [start, end]
+        if paramstyle in ('named', 'pyformat'):
+            params = {'p0': start, 'p1': end}
+
+        return sql, params
+
+    def get_where_sql(self):
+        if not self.where:
+            return ""
+
+        return " WHERE %s" % self.where
+
+    def get_cursor(self, connection):
+        if self.cursor_factory is not None:
+            return self.cursor_factory(connection)
+
+        return connection.cursor()
+
+    def fetch_one(self, connection, select_sql):
+        cursor = connection.cursor()
+        try:
+            cursor.execute("%s FROM %s%s" % (select_sql,
+                                             self.table,
+                                             self.get_where_sql()))
+            return cursor.fetchone()
+        finally:
+            cursor.close()
+
+    def fetch_blocks(self, cursor, fetch_size):
+        while True:
+            rows = cursor.fetchmany(fetch_size)
+            if not rows:
+                return
+            yield rows
+
+    def fetch_rows(self, cursor):
+        return itertools.chain.from_iterable(
+            self.fetch_blocks(cursor, self.fetch_size))
+
+
+def split_int_range(min_key, max_key, range_size):
+    for start in range(min_key, max_key + 1, range_size):
+        end = start + range_size
+        if end > max_key:
+            yield dict(start=start, end=max_key, last=True)
+        else:
+            yield dict(start=start, end=end, last=False)
@@ -1,27 +1,24 @@
-import time
-import logging
+from collections import Mapping
 
 from stairs.core.pipeline import Pipeline
+from stairs.core.pipeline.chunk import Chunk
+from stairs.core.pipeline.encoded import Encoded
+from stairs.core.producer.checkpoint import Checkpoint, Watermark
+from stairs.core.producer.frames import is_frame
 
-logger = logging.getLogger(__name__)
 
+def get_workers_steps(pipelines: list) -> list:
+    """
+    Worker steps of all pipelines (entry step and `as_worker` components),
+    queues of which producer should watch.
+    """
+    steps = []
+    for pipeline in pipelines:
+        for step in pipeline.get_workers_steps():
+            if step not in steps:
+                steps.append(step)
 
-def producer_retry(retries_amount, exceptions, sleep_time=1):
-
-    def wrapper(func):
-        def wrap_func(*args, **kwargs):
-
-            for i in range(retries_amount):
-                try:
-                    return func(*args, **kwargs)
-                except exceptions as e:
-                    logger.warning(e)
-                    time.sleep(sleep_time)
-
-            return func(*args, **kwargs)
-
-        return wrap_func
-    return wrapper
+    return steps
 
 
 def custom_callbacks_to_dict(custom_callbacks: list) -> dict:
@@ -31,3 +28,28 @@ def custom_callbacks_to_dict(custom_callbacks: list) -> dict:
         callbacks_key_value[name] = c
 
     return callbacks_key_value
+
+
+def to_jobs(result):
+    """
+    Jobs of producer handler (or awaitable) result, which could be one job
+    or iterable of jobs.
+    """
+    if result is None:
+        return []
+
+    if is_job(result):
+        return [result]
+
+    return result
+
+
+def is_job(data) -> bool:
+    """
+    True if data is one producer job: dict, `Chunk`, `Encoded`, frame (see
+    `frames` module), or checkpoint.
+    """
+    if isinstance(data, (Mapping, Chunk, Encoded, Checkpoint, Watermark)):
+        return True
+
+    return is_frame(data)
@@ -1,7 +1,7 @@
 import inspect
 import ujson
 
-from typing import List
+from typing import Iterable, List
 
 from stepist.app import App as StepistApp
 from stepist.flow.steps.step import Step as StepistStep
@@ -15,6 +15,12 @@ from stairs.core.session import project_session
 from stairs.core.project import dbs, config as stairs_config
 from stairs.core.project import utils
 from stairs.core.utils import signals
+from stairs.core.worker import queues
+from stairs.core.worker.bulk import BulkWorker
+from stairs.core.worker.outbox import use_outbox
+from stairs.core.worker.retry import RetryPolicy
+from stairs.core.worker.runs import RunTracker
+from stairs.core.worker.writer import JobsWriter
 
 
 class StairsProject:
@@ -109,6 +115,9 @@ class StairsProject:
 
         self.dbs = dbs.DBs(self.config)
 
+        # Outstanding jobs counters of tracked producer runs
+        self.runs = RunTracker(self.dbs.redis_db)
+
         # Setup Stepist app and internal communication parts
         if stepist_app is None:
 
@@ -159,7 +168,9 @@ class StairsProject:
                       pipelines_to_run: List[AppPipeline] = None,
                       die_when_empty: bool = False,
                       die_on_error: bool = True,
-                      use_booster: bool = False) -> None:
+                      use_booster: bool = False,
+                      prefetch_count: int = None,
+                      max_retries: int = None) -> None:
         """
         Iterates by streaming queues and listening for a jobs related to
         defined pipelines.
@@ -175,7 +186,17 @@ class StairsProject:
 
         :param die_on_error: If True - function return when error happened.
 
-        :param use_booster: Run pipeline in stepist "booster" mode.
+        :param use_booster: Run pipeline in stepist "booster" mode. Jobs
+        are not counted in this mode, so it's not supported when producers
+        track their runs.
+
+        :param prefetch_count: If defined - take up to `prefetch_count` jobs
+        per request to streaming service, and request next jobs in background
+        while current ones in progress (see `BulkWorker`).
+
+        :param max_retries: If defined - failed jobs are retried later with
+        exponential backoff (up to `max_retries` times), worker doesn't stop
+        or wait for them.
         """
 
         steps_to_run = []
@@ -189,16 +210,84 @@ class StairsProject:
         steps_to_run = [step for step in steps_to_run
                         if utils.is_step_related_to_pipelines(step)]
 
+        if use_booster and (prefetch_count or max_retries):
+            raise RuntimeError("Prefetch and retries are not supported in "
+                               "booster mode")
+
+        if use_booster and self.has_tracked_producers():
+            raise RuntimeError("Producer runs can't be tracked in booster "
+                               "mode")
+
         if use_booster:
             self.print("Start Stairs booster ->")
             self.stepist_app.run_booster(steps_to_run,
                                          die_on_error=die_on_error,
                                          die_when_empty=die_when_empty)
+        elif prefetch_count or max_retries:
+            self.run_bulk_worker(steps_to_run,
+                                 prefetch_count=prefetch_count or 1,
+                                 die_on_error=die_on_error,
+                                 die_when_empty=die_when_empty,
+                                 max_retries=max_retries)
         else:
+            self.track_runs()
+            use_outbox(steps_to_run)
             self.stepist_app.run(steps_to_run,
                                  die_on_error=die_on_error,
                                  die_when_empty=die_when_empty)
 
+    def run_bulk_worker(self,
+                        steps_to_run: List[StepistStep],
+                        prefetch_count: int,
+                        die_when_empty: bool = False,
+                        die_on_error: bool = True,
+                        max_retries: int = None) -> None:
+        """
+        Process jobs of stepist steps using `BulkWorker`, which takes jobs
+        from streaming service in batches.
+        """
+        retry_policy = None
+        if max_retries:
+            retry_policy = RetryPolicy(max_retries=max_retries)
+
+        self.track_runs()
+        worker = BulkWorker(self.stepist_app.worker_engine,
+                            steps_to_run,
+                            prefetch_count=prefetch_count,
+                            die_when_empty=die_when_empty,
+                            die_on_error=die_on_error,
+                            retry_policy=retry_policy)
+        worker.run()
+
+    def reconnect(self) -> None:
+        """
+        Open new connections to redis and streaming service, should be
+        called in forked process before using them.
+        """
+        self.dbs.redis_db.connection_pool.reset()
+        self.dbs.redis_stats.connection_pool.reset()
+
+        queues.reconnect(self.stepist_app.worker_engine)
+
+    def track_runs(self) -> None:
+        """
+        Count jobs of tracked producer runs, which workers add and complete
+        (see `RunTracker`). Jobs could be added to any worker step, so all
+        of them are tracked.
+        """
+        self.runs.track_steps(self.stepist_app.get_workers_steps())
+
+    def has_tracked_producers(self) -> bool:
+        """
+        True if any producer of the project tracks its runs.
+        """
+        for app in self.apps:
+            for producer in app.components.producers.values():
+                if getattr(producer, 'track_runs', False):
+                    return True
+
+        return False
+
     def get_app(self, name: str) -> StairsApp:
         """
         Generic function to get stairs app.
@@ -235,6 +324,29 @@ class StairsProject:
 
         pipeline.add_job(data)
 
+    def add_jobs(self, pipeline_name: str, jobs: Iterable,
+                 chunk_size: int = 1000) -> None:
+        """
+        Add many jobs to streaming service. Jobs are written by chunks, one
+        request per chunk (see `add_job` for more details).
+
+        :param pipeline_name: name of pipeline which will handle data.
+
+        :param jobs: iterable of dict like data (or `stairs.Chunk` objects)
+
+        :param chunk_size: max amount of jobs written at once, if None - write
+        all jobs in one transaction.
+        """
+        pipeline = self.get_pipeline_by_name(pipeline_name)
+        if pipeline is None:
+            raise RuntimeError("Pipeline not found")
+
+        with JobsWriter(self.stepist_app,
+                        [pipeline.get_stepist_step()],
+                        chunk_size=chunk_size) as writer:
+            for job in jobs:
+                writer.add(job)
+
     def get_app_by_name(self, name: str) -> StairsApp:
         for app in self.apps:
             if app.app_name == name:
@@ -0,0 +1,52 @@
+import inspect
+
+
+class HandlerBinding:
+    """
+    Precomputed arguments binding for user handler (function, method or
+    callable object).
+
+    Signature of the handler analyzed only once, when component created. Then
+    for each job we just take the keys which handler expects (or all data, if
+    handler accepts **kwargs).
+    """
+
+    __slots__ = ('handler', 'args', 'accepts_kwargs')
+
+    def __init__(self, handler):
+        self.handler = handler
+
+        try:
+            spec = inspect.getfullargspec(handler)
+        except TypeError:
+            # Handler is not supported by inspect, in this case error will be
+            # raised when handler called
+            self.accepts_kwargs = False
+            self.args = None
+            return
+
+        self.accepts_kwargs = spec.varkw is not None
+        self.args = tuple(spec.args + spec.kwonlyargs)
+
+    def __call__(self, data):
+        """
+        :param data: dict like job data
+        :return: data which could be passed to the handler as **kwargs
+        """
+        if self.accepts_kwargs:
+            return data
+
+        if self.args is None:
+            raise TypeError("Can't get arguments of handler %s" % self.handler)
+
+        return {key: data[key] for key in self.args if key in data}
+
+
+def bind_handler(handler):
+    """
+    Returns HandlerBinding for the handler, None if handler not defined.
+    """
+    if handler is None:
+        return None
+
+    return HandlerBinding(handler)
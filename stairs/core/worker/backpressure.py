@@ -0,0 +1,73 @@
+import time
+
+from stairs.core.session.project_session import get_project
+from stairs.core.worker import queues
+
+
+class QueueBackpressure:
+    """
+    Pauses jobs writing when queues of the steps are too big.
+
+    When queue of any step reaches `high_watermark` jobs, writer waits until
+    workers reduce it to `low_watermark`.
+
+    Queues size is requested not more often than once per `check_interval`
+    seconds. Between checks size is estimated as last known size plus jobs
+    written since, and if estimation reaches `high_watermark` queues are
+    checked earlier.
+    """
+
+    # Time to wait (in seconds) before check queues again, when they are full
+    pause_time = 1
+
+    def __init__(self, worker_engine, steps, high_watermark,
+                 low_watermark=None, check_interval=1):
+        self.worker_engine = worker_engine
+        self.steps = list(steps)
+
+        self.high_watermark = high_watermark
+        if low_watermark is None:
+            low_watermark = high_watermark // 2
+        self.low_watermark = low_watermark
+
+        self.check_interval = check_interval
+
+        self.estimated_jobs_count = 0
+        self.last_check_time = None
+
+    def wait(self, jobs_amount):
+        """
+        Called before writing `jobs_amount` jobs, blocks while queues are full.
+        """
+        if not self.steps:
+            return
+
+        if self.is_check_needed(jobs_amount):
+            self.update_jobs_count()
+
+        if self.estimated_jobs_count >= self.high_watermark:
+            get_project().print("Queue limit exceeded (%s jobs), waiting until "
+                                "it's less than %s jobs" %
+                                (self.estimated_jobs_count,
+                                 self.low_watermark))
+
+            while self.estimated_jobs_count > self.low_watermark:
+                time.sleep(self.pause_time)
+                self.update_jobs_count()
+
+        self.estimated_jobs_count += jobs_amount
+
+    def is_check_needed(self, jobs_amount):
+        if self.last_check_time is None:
+            return True
+
+        if time.time() - self.last_check_time >= self.check_interval:
+            return True
+
+        return self.estimated_jobs_count + jobs_amount >= self.high_watermark
+
+    def update_jobs_count(self):
+        self.estimated_jobs_count = max(queues.jobs_count(self.worker_engine,
+                                                          step)
+                                        for step in self.steps)
+        self.last_check_time = time.time()
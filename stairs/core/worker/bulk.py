@@ -0,0 +1,313 @@
+"""
+Worker which takes jobs from streaming service in bulk.
+"""
+import queue
+import random
+import threading
+import time
+
+from stairs.core.session.project_session import get_project
+from stairs.core.worker import queues
+from stairs.core.worker.outbox import Outbox
+from stairs.core.worker.retry import DelayedQueue
+
+
+class BulkWorker:
+    """
+    Worker loop similar to stepist one, but it takes up to `prefetch_count`
+    jobs per request to streaming service.
+
+    Next batch of jobs is requested in a background thread while current
+    batch is processed. Processed jobs are acknowledged by one request per
+    queue. It's useful when streaming service is "far" from workers and
+    round-trip time is bigger than time to process one job.
+
+    Failed jobs are returned to the queue, same as in stepist worker. If
+    `retry_policy` defined, failed jobs are retried later with exponential
+    backoff (see DelayedQueue), and worker continues with other jobs.
+
+    Jobs which are added while batch is processed, are collected in the
+    outbox and written after the batch, before jobs acknowledgement (see
+    `outbox` module).
+    """
+
+    # Sleep time, when all queues are empty
+    wait_time_for_job = 0.5
+
+    # How often to move due delayed jobs back to the queues (in seconds)
+    delayed_jobs_interval = 0.5
+
+    def __init__(self, worker_engine, steps, prefetch_count=100,
+                 prefetch=True, die_when_empty=False, die_on_error=True,
+                 retry_policy=None):
+        """
+        :param worker_engine: stepist worker engine (streaming service)
+        :param steps: stepist steps (workers) to process jobs for
+        :param prefetch_count: max amount of jobs requested at once
+        :param prefetch: If True - request next batch in background thread
+        :param die_when_empty: If True - return when queues are empty
+        :param die_on_error: If True - raise exception of failed job (when
+        job has no retries left)
+        :param retry_policy: RetryPolicy for failed jobs
+        """
+        self.worker_engine = worker_engine
+        self.steps = list(steps)
+        self.prefetch_count = prefetch_count
+        self.prefetch = prefetch
+        self.die_when_empty = die_when_empty
+        self.die_on_error = die_on_error
+
+        self.delayed_queue = None
+        if retry_policy is not None:
+            self.delayed_queue = DelayedQueue(worker_engine, retry_policy)
+        self.last_delayed_check_time = 0
+
+    def run(self):
+        if not self.steps:
+            return
+
+        fetcher = BatchFetcher(self.worker_engine,
+                               self.steps,
+                               self.prefetch_count,
+                               threaded=self.prefetch)
+        try:
+            self.process(fetcher)
+        finally:
+            fetcher.stop()
+
+    def process(self, fetcher):
+        jobs_processed_before_empty = 0
+        time_started_before_empty = time.time()
+        empty_rounds = 0
+
+        fetcher.request_batch()
+
+        while True:
+            batch = fetcher.get_batch()
+
+            if self.move_delayed_jobs():
+                # queues are not empty anymore
+                empty_rounds = 0
+
+            if not batch:
+                empty_rounds += 1
+
+                # Batch could be requested before previous one processed
+                # (and forwarded new jobs), so check queues once again
+                if empty_rounds > 1:
+                    if jobs_processed_before_empty:
+                        delta_time = round(time.time() -
+                                           time_started_before_empty, 3)
+                        get_project().print(
+                            "No more jobs in queues. Processed %s jobs in "
+                            "%s sec." % (jobs_processed_before_empty,
+                                         delta_time))
+                        get_project().print("Waiting for a jobs ....")
+
+                    jobs_processed_before_empty = 0
+                    time_started_before_empty = time.time()
+
+                    if self.die_when_empty and not self.has_delayed_jobs():
+                        return
+                    time.sleep(self.wait_time_for_job)
+
+                fetcher.request_batch()
+                continue
+
+            empty_rounds = 0
+
+            # prefetch next batch, while current one in progress
+            fetcher.request_batch()
+
+            self.process_batch(batch, fetcher)
+            jobs_processed_before_empty += len(batch)
+
+    def process_batch(self, batch, fetcher):
+        processed = 0
+        succeeded = []
+        outbox = Outbox(batch[0][0].app)
+
+        try:
+            with outbox:
+                for step, job, receipt in batch:
+                    processed += 1
+                    mark = outbox.mark()
+                    try:
+                        step.receive_job(**job)
+                    except Exception:
+                        # jobs added by failed job are dropped with it
+                        outbox.discard(mark)
+
+                        if self.delayed_queue is not None and \
+                                self.delayed_queue.add(step, job):
+                            continue
+
+                        queues.return_jobs(self.worker_engine, step, [job])
+                        if self.die_on_error:
+                            raise
+                    else:
+                        succeeded.append((step, job))
+        finally:
+            try:
+                self.flush_outbox(outbox, succeeded)
+            finally:
+                # Jobs left after error goes back to the queue
+                for step, job, receipt in batch[processed:]:
+                    queues.return_jobs(self.worker_engine, step, [job])
+
+                fetcher.ack(batch)
+
+    def flush_outbox(self, outbox, processed_jobs):
+        """
+        Write jobs added by the batch. If writing failed, processed jobs are
+        returned to the queue.
+        """
+        try:
+            outbox.flush()
+        except Exception:
+            for step, job in processed_jobs:
+                queues.return_jobs(self.worker_engine, step, [job])
+            raise
+
+    def move_delayed_jobs(self) -> int:
+        """
+        :return: amount of delayed jobs returned to the queues
+        """
+        if self.delayed_queue is None:
+            return 0
+
+        if time.time() - self.last_delayed_check_time < \
+                self.delayed_jobs_interval:
+            return 0
+
+        self.last_delayed_check_time = time.time()
+        return self.delayed_queue.move_due_jobs(self.steps)
+
+    def has_delayed_jobs(self):
+        if self.delayed_queue is None:
+            return False
+
+        return self.delayed_queue.jobs_count(self.steps) > 0
+
+
+class BatchFetcher:
+    """
+    Requests batches of jobs from the queues and acknowledges processed jobs.
+
+    In threaded mode all communication with streaming service is done by
+    background thread (some connections are not thread-safe), current thread
+    just sends commands and takes ready batches.
+    """
+
+    def __init__(self, worker_engine, steps, batch_size, threaded=True):
+        self.worker_engine = worker_engine
+        self.steps = list(steps)
+        self.batch_size = batch_size
+        self.threaded = threaded
+
+        self.reserver = None
+        self.thread = None
+
+        self.commands = queue.Queue()
+        self.results = queue.Queue()
+
+        if threaded:
+            self.thread = threading.Thread(target=self.run_commands,
+                                           daemon=True)
+            self.thread.start()
+        else:
+            self.reserver = queues.get_jobs_reserver(worker_engine)
+
+    def request_batch(self):
+        if self.threaded:
+            self.commands.put(('fetch', None))
+
+    def get_batch(self):
+        if not self.threaded:
+            return self.fetch()
+
+        result = self.results.get()
+        if isinstance(result, Exception):
+            raise result
+
+        return result
+
+    def ack(self, batch):
+        receipts = get_receipts(batch)
+        if not receipts:
+            return
+
+        if self.threaded:
+            self.commands.put(('ack', receipts))
+        else:
+            self.ack_receipts(receipts)
+
+    def stop(self):
+        if self.threaded:
+            self.commands.put(('stop', None))
+            self.thread.join()
+
+            # Return prefetched, but not processed jobs back to the queue
+            while not self.results.empty():
+                result = self.results.get()
+                if isinstance(result, Exception):
+                    continue
+
+                for step, job, receipt in result:
+                    queues.return_jobs(self.worker_engine, step, [job])
+                # thread is stopped, so reserver could be used directly
+                self.ack_receipts(get_receipts(result))
+
+        if self.reserver is not None:
+            self.reserver.close()
+
+    def run_commands(self):
+        try:
+            self.reserver = queues.get_jobs_reserver(self.worker_engine)
+        except Exception as e:
+            self.results.put(e)
+            return
+
+        while True:
+            command, args = self.commands.get()
+            if command == 'stop':
+                return
+
+            try:
+                if command == 'fetch':
+                    self.results.put(self.fetch())
+                elif command == 'ack':
+                    self.ack_receipts(args)
+            except Exception as e:
+                self.results.put(e)
+
+    def fetch(self):
+        steps = list(self.steps)
+        random.shuffle(steps)
+
+        batch = []
+        for step in steps:
+            count = self.batch_size - len(batch)
+            if count <= 0:
+                break
+
+            for job, receipt in self.reserver.reserve(step, count):
+                batch.append((step, job, receipt))
+
+        return batch
+
+    def ack_receipts(self, receipts):
+        for step, step_receipts in receipts.items():
+            self.reserver.ack(step, step_receipts)
+
+
+def get_receipts(batch):
+    """
+    Group receipts of the batch jobs by steps.
+    """
+    receipts = dict()
+    for step, job, receipt in batch:
+        if receipt is not None:
+            receipts.setdefault(step, []).append(receipt)
+
+    return receipts
@@ -0,0 +1,185 @@
+"""
+Outbox of the worker.
+
+Jobs which worker adds to the queues while it processes a job (or a batch
+of jobs, see BulkWorker) are collected in the outbox instead of being
+written one by one. When processing is done, outbox is flushed: jobs are
+written by one request per queue (one transaction for redis), and only
+then processed jobs are acknowledged.
+
+Jobs added by a failed job are discarded together with it, so the job
+returned to the queue doesn't leave duplicates of its output. If writing
+fails, processed jobs are returned to the queue as well.
+
+Jobs added with extra arguments (e.g. `skip_booster`) or with custom redis
+transaction are written immediately.
+"""
+import threading
+
+from stairs.core.worker import queues
+
+
+_local = threading.local()
+
+
+def get_current_outbox():
+    """
+    :return: outbox of current thread, or None if jobs are written
+    immediately
+    """
+    return getattr(_local, 'outbox', None)
+
+
+def after_flush(func, *args):
+    """
+    Call function when jobs of current outbox are written (or now, if
+    there is no outbox).
+    """
+    current_outbox = get_current_outbox()
+    if current_outbox is None:
+        func(*args)
+    else:
+        current_outbox.after_flush.append((func, args))
+
+
+def on_discard(func, *args):
+    """
+    Call function if jobs collected by current outbox so far are discarded.
+    """
+    current_outbox = get_current_outbox()
+    if current_outbox is not None:
+        current_outbox.on_discard.append((func, args))
+
+
+class Outbox:
+    """
+    Jobs (and callbacks) collected while outbox is open:
+
+        outbox = Outbox(stepist_app)
+        with outbox:
+            step.receive_job(**job)
+        outbox.flush()
+    """
+
+    def __init__(self, stepist_app):
+        self.stepist_app = stepist_app
+
+        # list of (step, StepData)
+        self.jobs = []
+        self.after_flush = []
+        self.on_discard = []
+
+        capture_jobs(stepist_app)
+
+    def __enter__(self):
+        if get_current_outbox() is not None:
+            raise RuntimeError("Outbox already opened in current thread")
+
+        _local.outbox = self
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        _local.outbox = None
+
+    def add(self, step, step_data):
+        self.jobs.append((step, step_data))
+
+    def mark(self):
+        """
+        :return: current position of the outbox, see `discard`
+        """
+        return len(self.jobs), len(self.after_flush), len(self.on_discard)
+
+    def discard(self, mark=(0, 0, 0)):
+        """
+        Drop jobs and callbacks collected after `mark` (all by default).
+        """
+        jobs_count, after_flush_count, on_discard_count = mark
+
+        callbacks = self.on_discard[on_discard_count:]
+
+        del self.jobs[jobs_count:]
+        del self.after_flush[after_flush_count:]
+        del self.on_discard[on_discard_count:]
+
+        for func, args in reversed(callbacks):
+            func(*args)
+
+    def flush(self):
+        """
+        Write collected jobs, one request per step queue. If writing failed
+        all jobs are discarded.
+        """
+        jobs_by_step = dict()
+        for step, step_data in self.jobs:
+            jobs_by_step.setdefault(step, []).append(step_data)
+
+        try:
+            if jobs_by_step:
+                queues.write_jobs(self.stepist_app,
+                                  list(jobs_by_step.items()))
+        except Exception:
+            self.discard()
+            raise
+
+        callbacks = self.after_flush
+
+        self.jobs = []
+        self.after_flush = []
+        self.on_discard = []
+
+        for func, args in callbacks:
+            func(*args)
+
+
+def capture_jobs(stepist_app):
+    """
+    Collect jobs which stepist steps add (`Step.add_job`) to the outbox of
+    current thread.
+    """
+    if getattr(stepist_app, 'stairs_outbox', False):
+        return
+
+    add_job = stepist_app.add_job
+
+    def outbox_add_job(step, data, skip_booster=False, **kwargs):
+        current_outbox = get_current_outbox()
+        if current_outbox is None or skip_booster or kwargs:
+            return add_job(step, data, skip_booster=skip_booster, **kwargs)
+
+        current_outbox.add(step, data)
+
+    stepist_app.add_job = outbox_add_job
+    stepist_app.stairs_outbox = True
+
+
+def use_outbox(steps):
+    """
+    Write jobs added by workers of `steps` when job is processed (not
+    needed for BulkWorker, which has outbox per batch).
+    """
+    for step in steps:
+        if getattr(step, 'stairs_outbox', False):
+            continue
+
+        step.receive_job = wrap_receive_job(step.app, step.receive_job)
+        step.stairs_outbox = True
+
+
+def wrap_receive_job(stepist_app, receive_job):
+    def outbox_receive_job(**data):
+        if get_current_outbox() is not None:
+            return receive_job(**data)
+
+        outbox = Outbox(stepist_app)
+        with outbox:
+            try:
+                result = receive_job(**data)
+            except Exception:
+                outbox.discard()
+                raise
+
+        outbox.flush()
+        return result
+
+    return outbox_receive_job
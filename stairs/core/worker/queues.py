@@ -0,0 +1,411 @@
+"""
+Helpers to work with stepist worker engines (streaming services) directly,
+when regular "one job per call" stepist interface is not enough.
+"""
+import time
+import inspect
+
+from stepist.flow import session
+from stepist.flow.steps.step import StepData
+from stepist.flow.workers.adapters import simple_queue
+
+from stairs.core.session.project_session import get_project
+from stairs.core.worker import runs
+from stairs.core.worker import outbox
+
+try:
+    from stepist.flow.workers.adapters.rm_queue import RQAdapter
+except ImportError:
+    RQAdapter = None
+
+try:
+    from stepist.flow.workers.adapters.sqs_queue import SQSAdapter
+except ImportError:
+    SQSAdapter = None
+
+
+def receive_jobs(worker_engine, step, count):
+    """
+    Take up to `count` jobs from the step queue without waiting for new jobs.
+
+    Jobs are removed (acknowledged) from the queue, use `return_jobs` to put
+    them back in case of error.
+
+    :return: list of jobs payloads (dicts with `flow_data` and `meta_data`)
+    """
+    if count <= 0:
+        return []
+
+    if isinstance(worker_engine, simple_queue.SimpleQueueAdapter):
+        return _receive_redis_jobs(worker_engine, step, count)
+
+    jobs = []
+    while len(jobs) < count:
+        job = _receive_job(worker_engine, step)
+        if job is None:
+            break
+        jobs.append(job)
+
+    return jobs
+
+
+def return_jobs(worker_engine, step, jobs):
+    """
+    Put jobs (received by `receive_jobs`) back to the step queue.
+    """
+    for job in jobs:
+        step_data = StepData(flow_data=job.get('flow_data'),
+                             meta_data=job.get('meta_data'))
+        worker_engine.add_job(step, step_data)
+
+
+def add_jobs(stepist_app, jobs_by_step, meta_data=None, transaction=None):
+    """
+    Put jobs to the queues of several steps at once.
+
+    For redis all jobs are written by one transaction (MULTI/EXEC), so either
+    all steps get their jobs or none of them. Other worker engines get jobs
+    by `add_jobs` call per step.
+
+    Inside worker outbox (see `outbox` module) jobs are collected and
+    written when outbox is flushed, except jobs with custom transaction.
+
+    :param stepist_app: stepist App
+    :param jobs_by_step: list of (step, list of jobs data) tuples
+    :param meta_data: stepist meta data of the jobs, by default meta data of
+    current flow session
+    :param transaction: function which adds custom commands to the redis
+    transaction (gets redis pipeline), supported only if `is_redis_engine`
+    """
+    if meta_data is None:
+        meta_data = session.get_meta_data()
+
+    if transaction is not None and not is_redis_engine(stepist_app):
+        raise RuntimeError("Custom transaction supported only for redis "
+                           "streaming service")
+
+    run_id = runs.get_run_id(meta_data)
+    if run_id is None:
+        _add_jobs(stepist_app, jobs_by_step, meta_data, transaction)
+        return
+
+    # jobs of tracked run are registered before they could be processed
+    tracker = get_project().runs
+    jobs_count = sum(len(jobs) for step, jobs in jobs_by_step)
+    tracker.add(run_id, jobs_count)
+    try:
+        _add_jobs(stepist_app, jobs_by_step, meta_data, transaction)
+    except Exception:
+        tracker.add(run_id, -jobs_count)
+        raise
+
+    if transaction is None:
+        outbox.on_discard(tracker.add, run_id, -jobs_count)
+
+
+def _add_jobs(stepist_app, jobs_by_step, meta_data, transaction=None):
+    jobs_by_step = [(step, [StepData(flow_data=job, meta_data=meta_data)
+                            for job in jobs])
+                    for step, jobs in jobs_by_step]
+
+    current_outbox = outbox.get_current_outbox()
+    if current_outbox is not None and transaction is None:
+        for step, jobs in jobs_by_step:
+            for step_data in jobs:
+                current_outbox.add(step, step_data)
+        return
+
+    write_jobs(stepist_app, jobs_by_step, transaction)
+
+
+def write_jobs(stepist_app, jobs_by_step, transaction=None):
+    """
+    Write jobs to the queues of several steps, same as `add_jobs` but jobs
+    are StepData objects (each one has its own meta data), and outbox is
+    not used.
+    """
+    if stepist_app.booster:
+        # booster has its own way to deliver jobs
+        for step, jobs in jobs_by_step:
+            for step_data in jobs:
+                stepist_app.add_job(step, step_data)
+        return
+
+    worker_engine = stepist_app.worker_engine
+
+    if isinstance(worker_engine, simple_queue.SimpleQueueAdapter):
+        _add_redis_jobs(worker_engine, jobs_by_step, transaction)
+        return
+
+    for step, jobs in jobs_by_step:
+        if jobs:
+            worker_engine.add_jobs(step, jobs)
+
+
+def is_redis_engine(stepist_app):
+    """
+    True if jobs are written directly to redis, so they could be written
+    in one transaction with other redis data.
+    """
+    return not stepist_app.booster and \
+        isinstance(stepist_app.worker_engine, simple_queue.SimpleQueueAdapter)
+
+
+def is_thread_safe_engine(stepist_app):
+    """
+    True if jobs could be written by several threads (RabbitMQ connection
+    is not thread-safe).
+    """
+    if stepist_app.booster:
+        return False
+
+    return RQAdapter is None or \
+        not isinstance(stepist_app.worker_engine, RQAdapter)
+
+
+def _add_redis_jobs(worker_engine, jobs_by_step, transaction=None):
+    queue = worker_engine.queue
+
+    if worker_engine.jobs_limit:
+        for step, jobs in jobs_by_step:
+            while worker_engine.jobs_count(step) >= worker_engine.jobs_limit:
+                get_project().print("Jobs limit exceeded, waiting %s seconds"
+                                    % worker_engine.jobs_limit_wait_timeout)
+                time.sleep(worker_engine.jobs_limit_wait_timeout)
+
+    pipe = queue.redis_db.pipeline(transaction=True)
+    for step, jobs in jobs_by_step:
+        if not jobs:
+            continue
+
+        # same payload as SimpleQueue.add_job, one LPUSH per step
+        payloads = [queue.pickler.dumps({'data': step_data.get_dict()})
+                    for step_data in jobs]
+        pipe.lpush(worker_engine.get_queue_name(step), *payloads)
+
+    if transaction is not None:
+        transaction(pipe)
+
+    pipe.execute()
+
+
+def jobs_count(worker_engine, step) -> int:
+    """
+    Current amount of jobs in the step queue.
+
+    Stepist `jobs_count` can't be used for all engines: RabbitMQ adapter
+    returns amount of messages at the moment when queue was declared, and
+    SQS adapter fails on boto3 client call.
+    """
+    if isinstance(worker_engine, simple_queue.SimpleQueueAdapter):
+        queue_name = worker_engine.get_queue_name(step)
+        return worker_engine.queue.redis_db.llen(queue_name)
+
+    if RQAdapter is not None and isinstance(worker_engine, RQAdapter):
+        queue = worker_engine.channel_producer.queue_declare(
+            queue=worker_engine.get_queue_name(step),
+            auto_delete=False,
+            passive=True)
+        return queue.method.message_count
+
+    if SQSAdapter is not None and isinstance(worker_engine, SQSAdapter):
+        client = worker_engine.sqs_client
+        queue_url = client.get_queue_url(
+            QueueName=worker_engine.get_queue_name(step))['QueueUrl']
+        response = client.get_queue_attributes(
+            QueueUrl=queue_url,
+            AttributeNames=['ApproximateNumberOfMessages'])
+        return int(response['Attributes']['ApproximateNumberOfMessages'])
+
+    return worker_engine.jobs_count(step)
+
+
+def reconnect(worker_engine):
+    """
+    Open new connections of the worker engine, e.g. in forked process
+    (connections of the parent process should not be used, or closed).
+    """
+    if isinstance(worker_engine, simple_queue.SimpleQueueAdapter):
+        worker_engine.queue.redis_db.connection_pool.reset()
+    elif RQAdapter is not None and isinstance(worker_engine, RQAdapter):
+        import pika
+
+        worker_engine.pika_connection = pika.BlockingConnection(
+            parameters=worker_engine.params)
+        worker_engine.channel_producer = worker_engine.pika_connection.channel()
+        worker_engine.channel_consumer = worker_engine.pika_connection.channel()
+    elif SQSAdapter is not None and isinstance(worker_engine, SQSAdapter):
+        worker_engine.sqs_client = worker_engine.session.client('sqs')
+        worker_engine.sqs_resource = worker_engine.session.resource('sqs')
+
+        for queue_name in list(worker_engine._queues):
+            worker_engine._queues[queue_name] = \
+                worker_engine.sqs_resource.get_queue_by_name(
+                    QueueName=queue_name)
+
+
+def _receive_redis_jobs(worker_engine, step, count):
+    queue = worker_engine.queue
+    queue_name = worker_engine.get_queue_name(step)
+
+    # SimpleQueue pushes jobs to the left side of the list and takes them
+    # from the right side
+    pipe = queue.redis_db.pipeline()
+    for _ in range(count):
+        pipe.rpop(queue_name)
+
+    jobs = []
+    for raw_job in pipe.execute():
+        if raw_job is None:
+            break
+        jobs.append(queue.pickler.loads(raw_job)['data'])
+
+    return jobs
+
+
+def _receive_job(worker_engine, step):
+    receive_args = inspect.getfullargspec(worker_engine.receive_job).args
+    if 'wait_seconds' in receive_args:
+        # don't block worker if queue is empty (e.g. SQS long polling)
+        return worker_engine.receive_job(step, wait_seconds=0)
+
+    return worker_engine.receive_job(step)
+
+
+class JobsReserver:
+    """
+    Takes jobs from worker engine queues in bulk and acknowledges them
+    after processing.
+
+    Default reserver works with any worker engine: jobs are removed from the
+    queue when received (same as stepist worker does), so there is nothing
+    to acknowledge. Failed jobs should be put back by `return_jobs`.
+
+    Reserver (and its connection) should be used only by one thread.
+    """
+
+    def __init__(self, worker_engine):
+        self.worker_engine = worker_engine
+
+    def reserve(self, step, count):
+        """
+        :return: list of (job, receipt) tuples, receipt is used to
+        acknowledge job by `ack` method.
+        """
+        return [(job, None)
+                for job in receive_jobs(self.worker_engine, step, count)]
+
+    def ack(self, step, receipts):
+        pass
+
+    def close(self):
+        pass
+
+
+class SQSJobsReserver(JobsReserver):
+    """
+    Receives up to 10 messages per request and deletes them in batches,
+    messages are invisible for other workers until deleted.
+    """
+
+    # SQS limit for batch receive/delete
+    max_batch_size = 10
+
+    def __init__(self, worker_engine):
+        super().__init__(worker_engine)
+
+        # boto3 clients are thread-safe, but let's keep separate one
+        # for worker thread anyway
+        self.client = worker_engine.session.client('sqs')
+        self.queue_urls = dict()
+
+    def reserve(self, step, count):
+        queue_url = self.get_queue_url(step)
+        pickler = self.worker_engine.data_pickler
+
+        jobs = []
+        while len(jobs) < count:
+            response = self.client.receive_message(
+                QueueUrl=queue_url,
+                MaxNumberOfMessages=min(self.max_batch_size, count - len(jobs)),
+                WaitTimeSeconds=0,
+            )
+            messages = response.get('Messages')
+            if not messages:
+                break
+
+            for msg in messages:
+                receipt = dict(Id=msg['MessageId'],
+                               ReceiptHandle=msg['ReceiptHandle'])
+                jobs.append((pickler.loads(msg['Body']), receipt))
+
+        return jobs
+
+    def ack(self, step, receipts):
+        queue_url = self.get_queue_url(step)
+
+        for i in range(0, len(receipts), self.max_batch_size):
+            self.client.delete_message_batch(
+                QueueUrl=queue_url,
+                Entries=receipts[i:i + self.max_batch_size]
+            )
+
+    def get_queue_url(self, step):
+        queue_name = self.worker_engine.get_queue_name(step)
+
+        if queue_name not in self.queue_urls:
+            response = self.client.get_queue_url(QueueName=queue_name)
+            self.queue_urls[queue_name] = response['QueueUrl']
+
+        return self.queue_urls[queue_name]
+
+
+class RMQJobsReserver(JobsReserver):
+    """
+    Takes messages without acknowledgement and acknowledges each of them
+    after processing (messages of the next, prefetched batch stay
+    unacknowledged).
+
+    Pika connections are not thread-safe, so reserver opens its own one.
+    """
+
+    def __init__(self, worker_engine):
+        import pika
+
+        super().__init__(worker_engine)
+
+        self.connection = pika.BlockingConnection(
+            parameters=worker_engine.params)
+        self.channel = self.connection.channel()
+
+    def reserve(self, step, count):
+        queue_name = step.get_queue_name()
+        pickler = self.worker_engine.data_pickler
+
+        jobs = []
+        while len(jobs) < count:
+            method, properties, body = self.channel.basic_get(queue=queue_name)
+            if method is None:
+                break
+
+            jobs.append((pickler.loads(body), method.delivery_tag))
+
+        return jobs
+
+    def ack(self, step, receipts):
+        # `multiple` ack would confirm prefetched messages as well
+        for delivery_tag in receipts:
+            self.channel.basic_ack(delivery_tag=delivery_tag)
+
+    def close(self):
+        self.connection.close()
+
+
+def get_jobs_reserver(worker_engine) -> JobsReserver:
+    if SQSAdapter is not None and isinstance(worker_engine, SQSAdapter):
+        return SQSJobsReserver(worker_engine)
+
+    if RQAdapter is not None and isinstance(worker_engine, RQAdapter):
+        return RMQJobsReserver(worker_engine)
+
+    return JobsReserver(worker_engine)
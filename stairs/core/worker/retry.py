@@ -0,0 +1,188 @@
+"""
+Retries with exponential backoff, which don't block producers and workers.
+"""
+import time
+import uuid
+import random
+
+from redis.exceptions import WatchError
+from stepist.flow.workers.adapters import simple_queue
+
+from stairs.core.worker import queues
+
+
+class RetryPolicy:
+    """
+    Exponential backoff with jitter: delay before `attempt` retry is
+    `base_delay * 2 ** attempt` (but not bigger than `max_delay`), and random
+    part of it (up to half), so retries of many jobs are spread in time.
+    """
+
+    def __init__(self, max_retries=5, base_delay=1, max_delay=60):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def get_delay(self, attempt) -> float:
+        delay = min(self.max_delay, self.base_delay * 2 ** attempt)
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def can_retry(self, attempt) -> bool:
+        return attempt < self.max_retries
+
+
+class PendingChunk:
+    """
+    Chunk of jobs which writer didn't write yet (or failed to write, and
+    will retry later).
+
+    `updates` is a list of (ProducerState, value), which should be stored
+    together with the jobs (e.g. producer checkpoint).
+    """
+    __slots__ = ('jobs', 'updates', 'attempt', 'due_time')
+
+    def __init__(self, jobs, updates=()):
+        self.jobs = jobs
+        self.updates = list(updates)
+        self.attempt = 0
+        self.due_time = 0
+
+    def is_due(self) -> bool:
+        return self.due_time <= time.time()
+
+
+class DelayedQueue:
+    """
+    Failed jobs which should be returned to the step queue later.
+
+    For redis, jobs are stored in sorted set (by due time) near the step
+    queue. Workers move due jobs back to the queue (`move_due_jobs`).
+    SQS supports delayed messages itself. For other streaming services jobs
+    are returned to the queue immediately.
+
+    Amount of retries is stored in job payload (`retries` key). Jobs
+    returned to the queue immediately keep it in meta data, per step (meta
+    data is inherited by next jobs).
+    """
+
+    key_prefix = "stairs::delayed::"
+
+    # Meta data key of retries amount, for jobs returned to the queue
+    retries_meta_key = "stairs_retries"
+
+    # Max amount of due jobs moved to the queue at once
+    move_batch_size = 1000
+
+    def __init__(self, worker_engine, retry_policy: RetryPolicy):
+        self.worker_engine = worker_engine
+        self.retry_policy = retry_policy
+
+    def add(self, step, job) -> bool:
+        """
+        Schedule retry of the failed job.
+
+        :return: False if job has no retries left
+        """
+        attempt = self.get_attempt(step, job)
+        if not self.retry_policy.can_retry(attempt):
+            return False
+
+        job = dict(job, retries=attempt + 1, retry_id=uuid.uuid4().hex)
+        delay = self.retry_policy.get_delay(attempt)
+
+        if isinstance(self.worker_engine, simple_queue.SimpleQueueAdapter):
+            queue = self.worker_engine.queue
+            queue.redis_db.zadd(self.get_key(step),
+                                {queue.pickler.dumps(job): time.time() + delay})
+        elif queues.SQSAdapter is not None and \
+                isinstance(self.worker_engine, queues.SQSAdapter):
+            self.add_sqs_job(step, job, delay)
+        else:
+            # `return_jobs` keeps only flow and meta data of the job
+            queues.return_jobs(self.worker_engine, step,
+                               [self.set_meta_attempt(step, job,
+                                                      attempt + 1)])
+
+        return True
+
+    def get_attempt(self, step, job) -> int:
+        if 'retries' in job:
+            return job['retries']
+
+        meta_data = job.get('meta_data') or {}
+        retries = meta_data.get(self.retries_meta_key) or {}
+        return retries.get(step.step_key(), 0)
+
+    def set_meta_attempt(self, step, job, attempt):
+        meta_data = dict(job.get('meta_data') or {})
+
+        retries = dict(meta_data.get(self.retries_meta_key) or {})
+        retries[step.step_key()] = attempt
+        meta_data[self.retries_meta_key] = retries
+
+        return dict(job, meta_data=meta_data)
+
+    def add_sqs_job(self, step, job, delay):
+        queue_name = self.worker_engine.get_queue_name(step)
+        sqs_queue = self.worker_engine.sqs_resource.get_queue_by_name(
+            QueueName=queue_name)
+
+        # SQS limit for message delay is 15 minutes
+        sqs_queue.send_message(
+            MessageBody=self.worker_engine.data_pickler.dumps(job),
+            DelaySeconds=min(int(delay), 900)
+        )
+
+    def move_due_jobs(self, steps) -> int:
+        """
+        Move jobs which should be retried now to the steps queues.
+
+        :return: amount of moved jobs
+        """
+        if not isinstance(self.worker_engine, simple_queue.SimpleQueueAdapter):
+            return 0
+
+        moved = 0
+        for step in steps:
+            moved += self.move_redis_jobs(step)
+
+        return moved
+
+    def move_redis_jobs(self, step):
+        queue = self.worker_engine.queue
+        key = self.get_key(step)
+        queue_name = self.worker_engine.get_queue_name(step)
+
+        # Several workers could move the same jobs, so jobs are removed from
+        # sorted set and added to the queue in one transaction
+        with queue.redis_db.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(key)
+                    payloads = pipe.zrangebyscore(key, 0, time.time(),
+                                                  start=0,
+                                                  num=self.move_batch_size)
+                    if not payloads:
+                        pipe.unwatch()
+                        return 0
+
+                    pipe.multi()
+                    pipe.zrem(key, *payloads)
+                    pipe.lpush(queue_name, *[
+                        queue.pickler.dumps({'data': queue.pickler.loads(p)})
+                        for p in payloads
+                    ])
+                    pipe.execute()
+                    return len(payloads)
+                except WatchError:
+                    continue
+
+    def jobs_count(self, steps) -> int:
+        if not isinstance(self.worker_engine, simple_queue.SimpleQueueAdapter):
+            return 0
+
+        redis_db = self.worker_engine.queue.redis_db
+        return sum(redis_db.zcard(self.get_key(step)) for step in steps)
+
+    def get_key(self, step):
+        return self.key_prefix + self.worker_engine.get_queue_name(step)
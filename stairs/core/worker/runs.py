@@ -0,0 +1,205 @@
+"""
+Completion tracking of producer runs.
+
+Jobs of tracked producer run have run id in stepist meta data, so all jobs
+generated from them by workers (next pipelines, outputs) have it as well.
+Amount of outstanding jobs of the run is stored in redis:
+
+    - incremented before jobs are added to the queues
+    - decremented when worker successfully processed a job (after job's
+      next jobs were added)
+
+Producer itself holds one "job" until it's done. So when counter reaches
+zero, all data of the run passed through all pipelines, and completion event
+is published. Failed jobs are returned to the queue (or retried later), so
+they keep the run incomplete.
+
+Only successfully processed job completes. Job which exhausted its retries
+(and waits in the queue), or which is dropped without processing (e.g. by
+worker which doesn't return failed jobs, or by streaming service), keeps
+the run incomplete forever, and `RunTracker.wait` without timeout never
+returns for such run.
+
+Counting is done by wrapping `add_job` and `receive_job` of stepist steps
+(see `RunTracker.track_steps`), jobs added to the queues in other ways
+are not counted. Booster mode workers process jobs without these wrappers,
+so they can't be used with tracked producers (see
+`StairsProject.run_pipelines`).
+
+Counters of incomplete runs expire after `RunTracker.counter_ttl` seconds
+without new jobs, so expired run is never done as well.
+
+Inside worker outbox, job is completed when its next jobs are written, and
+next jobs discarded by outbox are unregistered.
+"""
+import uuid
+
+from stepist.flow import session
+
+from stairs.core.worker import outbox
+
+
+# Key of run id in stepist meta data
+RUN_ID_KEY = 'stairs_run_id'
+
+
+def get_run_id(meta_data=None):
+    """
+    :param meta_data: stepist meta data, by default meta data of current
+    flow session
+    :return: run id of the job or None if job is not tracked
+    """
+    if meta_data is None:
+        meta_data = session.get_meta_data()
+
+    if not meta_data:
+        return None
+
+    return meta_data.get(RUN_ID_KEY)
+
+
+class RunTracker:
+    """
+    Outstanding jobs counters and completion events of producer runs.
+    """
+
+    key_prefix = "stairs::run::"
+
+    # How long to keep "done" flag of the run (in seconds)
+    done_ttl = 24 * 60 * 60
+
+    # How long to keep outstanding jobs counter of the run (in seconds),
+    # refreshed when new jobs added
+    counter_ttl = 7 * 24 * 60 * 60
+
+    # Max time to wait for event before checking "done" flag again
+    poll_timeout = 1
+
+    def __init__(self, redis_db):
+        self.redis_db = redis_db
+
+    def start(self) -> str:
+        """
+        Start new run, which is not done until `complete` called for it
+        (by producer, when all jobs are written).
+
+        :return: run id
+        """
+        run_id = uuid.uuid4().hex
+        self.add(run_id, 1)
+        return run_id
+
+    def add(self, run_id, jobs_count):
+        """
+        Register `jobs_count` new jobs of the run (negative to unregister
+        jobs which were not added to the queues).
+        """
+        with self.redis_db.pipeline() as pipe:
+            pipe.incrby(self.get_counter_key(run_id), jobs_count)
+            pipe.expire(self.get_counter_key(run_id), self.counter_ttl)
+            pipe.execute()
+
+    def complete(self, run_id, jobs_count=1):
+        """
+        Mark jobs of the run as done, publish completion event if there is
+        no more outstanding jobs.
+        """
+        outstanding = self.redis_db.decrby(self.get_counter_key(run_id),
+                                           jobs_count)
+        if outstanding > 0:
+            return
+
+        with self.redis_db.pipeline() as pipe:
+            pipe.set(self.get_done_key(run_id), 1, ex=self.done_ttl)
+            pipe.delete(self.get_counter_key(run_id))
+            pipe.publish(self.get_channel(run_id), run_id)
+            pipe.execute()
+
+    def is_done(self, run_id) -> bool:
+        return bool(self.redis_db.exists(self.get_done_key(run_id)))
+
+    def outstanding_jobs(self, run_id) -> int:
+        return int(self.redis_db.get(self.get_counter_key(run_id)) or 0)
+
+    def wait(self, run_id, timeout=None) -> bool:
+        """
+        Block until run done. Run with failed (not processed) jobs is never
+        done, see module docs.
+
+        :param timeout: max time to wait (in seconds), None - wait forever
+        :return: True if run done
+        """
+        pubsub = self.redis_db.pubsub(ignore_subscribe_messages=True)
+        # Subscribe before checking the flag, so event is not missed
+        pubsub.subscribe(self.get_channel(run_id))
+
+        try:
+            waited = 0
+            while not self.is_done(run_id):
+                if timeout is not None and waited >= timeout:
+                    return False
+
+                wait_time = self.poll_timeout
+                if timeout is not None:
+                    wait_time = min(wait_time, timeout - waited)
+
+                if pubsub.get_message(timeout=wait_time) is not None:
+                    return True
+                waited += wait_time
+
+            return True
+        finally:
+            pubsub.close()
+
+    def track_steps(self, steps):
+        """
+        Count jobs which workers of `steps` add to each other, and jobs which
+        they complete. `add_job` and `receive_job` methods of the steps are
+        replaced by counting wrappers.
+        """
+        for step in steps:
+            if getattr(step, 'stairs_tracked', False):
+                continue
+
+            step.add_job = self.wrap_add_job(step.add_job)
+            step.receive_job = self.wrap_receive_job(step.receive_job)
+            step.stairs_tracked = True
+
+    def wrap_add_job(self, add_job):
+        def tracked_add_job(*args, **kwargs):
+            run_id = get_run_id()
+            if run_id is None:
+                return add_job(*args, **kwargs)
+
+            self.add(run_id, 1)
+            try:
+                result = add_job(*args, **kwargs)
+            except Exception:
+                self.add(run_id, -1)
+                raise
+
+            outbox.on_discard(self.add, run_id, -1)
+            return result
+
+        return tracked_add_job
+
+    def wrap_receive_job(self, receive_job):
+        def tracked_receive_job(**data):
+            result = receive_job(**data)
+
+            run_id = get_run_id(data.get('meta_data') or {})
+            if run_id is not None:
+                outbox.after_flush(self.complete, run_id)
+
+            return result
+
+        return tracked_receive_job
+
+    def get_counter_key(self, run_id):
+        return "%s%s::outstanding" % (self.key_prefix, run_id)
+
+    def get_done_key(self, run_id):
+        return "%s%s::done" % (self.key_prefix, run_id)
+
+    def get_channel(self, run_id):
+        return "%s%s::events" % (self.key_prefix, run_id)
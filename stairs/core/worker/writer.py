@@ -0,0 +1,368 @@
+import time
+import json
+import logging
+import threading
+
+from collections import deque
+
+from stairs.core.pipeline.chunk import to_job_data
+from stairs.core.worker import queues
+from stairs.core.worker import outbox
+from stairs.core.worker.retry import RetryPolicy, PendingChunk
+
+logger = logging.getLogger(__name__)
+
+
+class JobsWriter:
+    """
+    Buffers jobs and writes them to the queues of all steps by one bulk
+    request (see `queues.add_jobs`), instead of request per job and step.
+
+    Buffer is written when it has `chunk_size` jobs, or when `flush_interval`
+    seconds passed since last write (checked by background thread, so jobs
+    don't wait for the next one when producer is slow). If `chunk_size` is
+    None, all jobs are written on `flush` in one transaction.
+
+    If `backpressure` defined (see QueueBackpressure), writer waits before
+    each write while queues are full.
+
+    Failed chunks are retried later (see RetryPolicy), writer keeps buffering
+    new jobs meanwhile. Chunks are written in the same order as they were
+    buffered. Writer blocks only when it has `max_pending_chunks` not written
+    chunks, and on exit until all of them are written.
+
+    If `checkpoints` state defined, checkpoints could be added between jobs
+    (see `add_checkpoint`). Checkpoint is stored when all jobs added before
+    it are written (in the same transaction for redis).
+
+    If `watermarks` state defined, last watermark (see `set_watermark`) is
+    stored after all jobs are written, only if writer exited without error.
+
+        with JobsWriter(stepist_app, steps, chunk_size=1000) as writer:
+            for job in jobs:
+                writer.add(job)
+    """
+
+    max_pending_chunks = 10
+
+    def __init__(self, stepist_app, steps, chunk_size=None,
+                 flush_interval=None, meta_data=None, backpressure=None,
+                 retry_policy=None, checkpoints=None, watermarks=None):
+        self.stepist_app = stepist_app
+        self.steps = list(steps)
+        self.chunk_size = chunk_size
+        self.flush_interval = flush_interval
+        self.meta_data = meta_data
+        self.backpressure = backpressure
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.checkpoints = checkpoints
+        self.watermarks = watermarks
+        self.watermark = None
+
+        self.jobs = []
+        self.pending_chunks = deque()
+        # Amount of jobs written to streaming service (not per step)
+        self.written_jobs = 0
+        self.last_flush_time = time.time()
+
+        # Writing is serialized between producer and background flush
+        self.lock = threading.RLock()
+        self.closed = threading.Event()
+        self.flush_thread = None
+        self.flush_error = None
+
+    def __enter__(self):
+        # inside worker outbox jobs are written by the worker
+        if self.chunk_size and self.flush_interval and \
+                outbox.get_current_outbox() is None:
+            self.flush_thread = threading.Thread(target=self.flush_on_interval,
+                                                 daemon=True)
+            self.flush_thread.start()
+
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop_flush_thread()
+
+        # jobs which were added before error, should be written as well
+        if exc_type is None:
+            self.raise_flush_error()
+            self.flush(updates=self.get_final_updates())
+        else:
+            self.flush()
+        self.write_pending_chunks(wait=True)
+
+    def add(self, job):
+        job = to_job_data(job)
+
+        with self.lock:
+            self.raise_flush_error()
+            self.jobs.append(job)
+
+            if self.chunk_size and len(self.jobs) >= self.chunk_size:
+                self.flush()
+            elif self.flush_interval is not None and \
+                    time.time() - self.last_flush_time >= self.flush_interval:
+                self.flush()
+            elif self.pending_chunks and self.pending_chunks[0].is_due():
+                self.write_pending_chunks()
+
+    def flush_on_interval(self):
+        """
+        Background thread, writes buffered jobs when they are waiting
+        longer than `flush_interval` (and retries failed chunks).
+        """
+        while True:
+            time_left = self.last_flush_time + self.flush_interval - \
+                time.time()
+            if self.closed.wait(max(time_left, 0) or self.flush_interval):
+                return
+
+            with self.lock:
+                try:
+                    if self.jobs and time.time() - self.last_flush_time >= \
+                            self.flush_interval:
+                        self.flush()
+                    elif self.pending_chunks and \
+                            self.pending_chunks[0].is_due():
+                        self.write_pending_chunks()
+                except Exception as e:
+                    # raised to producer on next job
+                    self.flush_error = e
+                    return
+
+    def stop_flush_thread(self):
+        self.closed.set()
+        if self.flush_thread is not None:
+            self.flush_thread.join()
+            self.flush_thread = None
+
+    def raise_flush_error(self):
+        if self.flush_error is not None:
+            error, self.flush_error = self.flush_error, None
+            raise error
+
+    def add_checkpoint(self, value):
+        """
+        Checkpoint closes current chunk, and stored together with it.
+        Ignored if writer has no checkpoints state.
+        """
+        if self.checkpoints is None:
+            return
+
+        with self.lock:
+            self.flush(updates=[(self.checkpoints, value)])
+
+    def set_watermark(self, value):
+        """
+        Watermark (e.g. max `updated_at` of written data) is stored when
+        writing finished successfully. Ignored if writer has no watermarks
+        state.
+        """
+        self.watermark = value
+
+    def get_final_updates(self) -> list:
+        if self.watermarks is None or self.watermark is None:
+            return []
+
+        return [(self.watermarks, self.watermark)]
+
+    def flush(self, updates=()):
+        """
+        Write buffered jobs, if previous chunks are not written yet - jobs
+        will be written after them.
+        """
+        self.last_flush_time = time.time()
+
+        if not self.steps:
+            self.jobs = []
+
+        if not self.jobs and not updates:
+            return
+
+        jobs, self.jobs = self.jobs, []
+        self.pending_chunks.append(PendingChunk(jobs, updates))
+
+        wait = len(self.pending_chunks) > self.max_pending_chunks
+        self.write_pending_chunks(wait=wait)
+
+    def write_pending_chunks(self, wait=False):
+        """
+        Write pending chunks in order, until first failed one.
+
+        :param wait: If True - wait and retry failed chunks until all chunks
+        written. Error raised when chunk has no retries left.
+        """
+        while self.pending_chunks:
+            chunk = self.pending_chunks[0]
+
+            if not chunk.is_due():
+                if not wait:
+                    return
+                time.sleep(max(0, chunk.due_time - time.time()))
+
+            if self.backpressure is not None and chunk.attempt == 0:
+                self.backpressure.wait(len(chunk.jobs))
+
+            try:
+                self.write_chunk(chunk)
+            except Exception as e:
+                if not self.retry_policy.can_retry(chunk.attempt):
+                    raise
+
+                delay = self.retry_policy.get_delay(chunk.attempt)
+                logger.warning("Can't write %s jobs (%s), retry in %.2f sec",
+                               len(chunk.jobs), e, delay)
+
+                chunk.attempt += 1
+                chunk.due_time = time.time() + delay
+                continue
+
+            self.pending_chunks.popleft()
+            self.written_jobs += len(chunk.jobs)
+
+    def write_chunk(self, chunk):
+        """
+        Write jobs of the chunk, and update producer state (e.g. checkpoint)
+        """
+        jobs_by_step = []
+        if chunk.jobs:
+            jobs_by_step = [(step, chunk.jobs) for step in self.steps]
+
+        updates = self.get_state_updates(chunk)
+
+        if updates and queues.is_redis_engine(self.stepist_app):
+            def transaction(pipe):
+                for state, value in updates:
+                    state.set(value, pipe=pipe)
+
+            queues.add_jobs(self.stepist_app,
+                            jobs_by_step,
+                            meta_data=self.meta_data,
+                            transaction=transaction)
+        else:
+            queues.add_jobs(self.stepist_app,
+                            jobs_by_step,
+                            meta_data=self.meta_data)
+
+            for state, value in updates:
+                state.set(value)
+
+        self.on_chunk_written(chunk)
+
+    def get_state_updates(self, chunk) -> list:
+        """
+        :return: list of (ProducerState, value) to store with the chunk
+        """
+        return chunk.updates
+
+    def on_chunk_written(self, chunk):
+        pass
+
+
+class ProducerState:
+    """
+    Producer value (e.g. checkpoint) stored in redis, as json.
+
+    If jobs are written to redis, state is stored in the same redis and
+    updated in the same transaction with jobs. Otherwise state is stored
+    in project redis, right after jobs written.
+    """
+
+    key_prefix = "stairs::producer_state::"
+
+    def __init__(self, stepist_app, project_redis, key):
+        self.key = self.key_prefix + key
+
+        if queues.is_redis_engine(stepist_app):
+            self.redis_db = stepist_app.worker_engine.queue.redis_db
+        else:
+            self.redis_db = project_redis
+
+    def get(self, default=None):
+        value = self.redis_db.get(self.key)
+        if value is None:
+            return default
+
+        return json.loads(value)
+
+    def set(self, value, pipe=None):
+        (pipe or self.redis_db).set(self.key, json.dumps(value))
+
+    def reset(self):
+        self.redis_db.delete(self.key)
+
+
+class ChunksProgress(ProducerState):
+    """
+    Amount of jobs committed by transactional writer.
+    """
+
+    key_prefix = "stairs::committed_jobs::"
+
+    def get(self, default=0) -> int:
+        return super().get(default)
+
+
+class CheckpointState(ProducerState):
+    """
+    Last checkpoint of producer, which was written with all previous jobs.
+    """
+
+    key_prefix = "stairs::checkpoint::"
+
+
+class WatermarkState(ProducerState):
+    """
+    High-water mark of the last successful producer run.
+    """
+
+    key_prefix = "stairs::watermark::"
+
+
+class TransactionalJobsWriter(JobsWriter):
+    """
+    Writes jobs by chunks of exactly `chunk_size` jobs (last one could be
+    smaller), each chunk is committed atomically together with amount of
+    committed jobs (see ChunksProgress).
+
+    It allows to resume failed writing from the first not committed chunk,
+    if jobs are generated in the same order. Checkpoints are not supported,
+    because they split chunks.
+    """
+
+    def __init__(self, stepist_app, steps, chunk_size, progress,
+                 meta_data=None, backpressure=None, retry_policy=None,
+                 watermarks=None):
+        super().__init__(stepist_app,
+                         steps,
+                         chunk_size=chunk_size,
+                         meta_data=meta_data,
+                         backpressure=backpressure,
+                         retry_policy=retry_policy,
+                         watermarks=watermarks)
+
+        self.progress = progress
+        self.committed_jobs = progress.get()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop_flush_thread()
+
+        # Not full chunk can't be committed on error, otherwise next run
+        # can't find where to resume from
+        if exc_type is None:
+            self.flush(updates=self.get_final_updates())
+        self.write_pending_chunks(wait=True)
+
+    def get_committed_jobs_count(self) -> int:
+        """
+        Amount of jobs which were committed before, and should be skipped.
+        """
+        return self.committed_jobs
+
+    def get_state_updates(self, chunk) -> list:
+        return chunk.updates + [(self.progress,
+                                 self.committed_jobs + len(chunk.jobs))]
+
+    def on_chunk_written(self, chunk):
+        self.committed_jobs += len(chunk.jobs)
@@ -5,6 +5,7 @@ from stairs.core.producer import run_jobs_processor
 from stairs.core.producer import Producer
 from stairs.core.producer.batch import BatchProducer
 from stairs.core.producer.spark import SparkProducer
+from stairs.core.producer.shards import run_shards, run_parallel
 from stairs import get_project
 
 
@@ -22,7 +23,19 @@ def producer_cli():
 @click.option(
     "--nobatch_reading", "-nb", is_flag=True, help="Disable auto reading", default=False
 )
-def run(name, noprint, nobatch_reading):
+@click.option(
+    "--resume", "-r", is_flag=True, default=False,
+    help="Continue from the last stored checkpoint"
+)
+@click.option(
+    "--shards", "-s", type=int, default=None,
+    help="Run producer in N processes, each one generates its shard of jobs"
+)
+@click.option(
+    "--parallel", "-p", is_flag=True, default=False,
+    help="Run producers matched by `app.*` in separate processes at once"
+)
+def run(name, noprint, nobatch_reading, resume, shards, parallel):
     """
     Run your producer.
 
@@ -32,6 +45,15 @@ def run(name, noprint, nobatch_reading):
     In case you are running batch producer will generate batches and automatically
     start batch reading process. To disable auto-reading specify --nobatch_reading
     flag.
+
+    Producers which yield `stairs.Checkpoint` could be continued from the last
+    stored checkpoint with --resume flag.
+
+    Producers with `shard_index` and `shard_count` arguments could be executed
+    by several processes with --shards N flag (each process runs producer once).
+
+    With `app.*` name all producers of the app are executed one by one, or
+    at once in separate processes with --parallel flag.
     """
     project = get_project()
     project.set_verbose(not noprint)
@@ -42,39 +64,31 @@ def run(name, noprint, nobatch_reading):
     if "." in name and "*" in name:
         app_name, _ = name.split(".")
         user_app = get_project().get_app_by_name(app_name)
-        producers_to_run = user_app.components.producers
+        producers_to_run = list(user_app.components.producers.values())
     else:
         producers_to_run = [get_project().get_producer_by_name(name)]
 
+    run_kwargs = dict(nobatch_reading=nobatch_reading,
+                      resume=resume,
+                      shards=shards)
+
+    if parallel and len(producers_to_run) > 1:
+        for producer in producers_to_run:
+            if producer is None:
+                raise RuntimeError("Producer not found")
+
+        run_parallel([(producer.key(), run_producer, dict(run_kwargs,
+                                                          producer=producer))
+                      for producer in producers_to_run])
+        return
+
     for producer in producers_to_run:
         if producer is None:
             raise RuntimeError("Producer not found")
 
-        if isinstance(producer, Producer):
-            producer()
-        elif isinstance(producer, BatchProducer):
-            producer(*[], **{})
-            if project.verbose:
-                print("Batch producer finished batch generation")
-            if not nobatch_reading:
-                if project.verbose:
-                    print(
-                        "Starting batches reading process "
-                        "and listening for a jobs ... "
-                    )
-                    print("Press Ctrl-C to cancel listening")
-                batch_handler = producer.producer
-                run_jobs_processor(get_project(), [batch_handler])
-        elif isinstance(producer, SparkProducer):
-            import time
-
-            t1 = time.time()
-            producer()
-            t2 = time.time()
-            print(t2 - t1)
-            continue
-
-        else:
+        try:
+            run_producer(producer, **run_kwargs)
+        except NotSupportedProducer:
             if len(producers_to_run) > 1:
                 # in case when we have multiple producers to run, we want just skip
                 # broken producer, and do not brake others
@@ -86,6 +100,50 @@ def run(name, noprint, nobatch_reading):
                 raise RuntimeError("Producer `%s` not found or not supported" % name)
 
 
+class NotSupportedProducer(Exception):
+    pass
+
+
+def run_producer(producer, nobatch_reading=False, resume=False, shards=None):
+    """
+    Run one producer (see `producer:run`).
+
+    :return: amount of written jobs, if known
+    """
+    project = get_project()
+
+    if shards and not isinstance(producer, Producer):
+        raise RuntimeError("Only simple producers could run in shards")
+
+    if isinstance(producer, Producer):
+        if shards:
+            return run_shards(producer, shards, resume=resume)
+        else:
+            return producer.run_repeated(resume=resume)
+    elif isinstance(producer, BatchProducer):
+        producer.run_repeated(resume=resume)
+        if project.verbose:
+            print("Batch producer finished batch generation")
+        if not nobatch_reading:
+            if project.verbose:
+                print(
+                    "Starting batches reading process "
+                    "and listening for a jobs ... "
+                )
+                print("Press Ctrl-C to cancel listening")
+            batch_handler = producer.producer
+            run_jobs_processor(get_project(), [batch_handler])
+    elif isinstance(producer, SparkProducer):
+        import time
+
+        t1 = time.time()
+        producer()
+        t2 = time.time()
+        print(t2 - t1)
+    else:
+        raise NotSupportedProducer()
+
+
 @producer_cli.command("producer:run_jobs")
 @click.argument("name", default=None)
 @click.option("--noprint", "-np", is_flag=True, help="Disable print")
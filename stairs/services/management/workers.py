@@ -18,7 +18,11 @@ def workers_cli():
 @click.option('--is_fork', '-if', is_flag=True, default=False,
               help="If false fork could be applied")
 @click.option('--booster', '-b', is_flag=True, default=False)
-def run(pipelines, noprint, processes, is_fork, booster):
+@click.option('--prefetch', nargs=1, default=None, type=int,
+              help="Amount of jobs to take from streaming service at once")
+@click.option('--retries', nargs=1, default=None, type=int,
+              help="Amount of retries (with backoff) for failed jobs")
+def run(pipelines, noprint, processes, is_fork, booster, prefetch, retries):
     """
     Run all or defined pipelines. Process listening for a jobs until you
     press CTRL-C to exit.
@@ -60,7 +64,9 @@ def run(pipelines, noprint, processes, is_fork, booster):
             for p in processes_objects:
                 p.join()
         else:
-            project.run_pipelines(pipelines_to_run, use_booster=booster)
+            project.run_pipelines(pipelines_to_run, use_booster=booster,
+                                  prefetch_count=prefetch,
+                                  max_retries=retries)
 
     if processes > 1 and not is_fork:
         processes_objects = []
@@ -72,7 +78,9 @@ def run(pipelines, noprint, processes, is_fork, booster):
         for p in processes_objects:
             p.join()
     else:
-        project.run_pipelines(pipelines_to_run, use_booster=booster)
+        project.run_pipelines(pipelines_to_run, use_booster=booster,
+                              prefetch_count=prefetch,
+                              max_retries=retries)
 
 
 def exec_current_one(use_booster=False):
@@ -4,6 +4,10 @@ from stepist.flow.steps.step import StepData
 from redis import ConnectionPool, Redis
 
 
+# Connections of current (executor) process, reused by all partitions
+_connections = dict()
+
+
 def get_connection(redis_engine):
     pool = redis_engine.redis_connection.connection_pool
 
@@ -25,17 +29,34 @@ class RedisConnection:
         self.queues = None
 
     def init_connection(self):
-        self.connection = Redis(connection_pool=ConnectionPool(
-            connection_class=self.connection_class,
-            max_connections=self.max_connections,
-            **self.connection_kwargs
-        ))
+        key = (self.connection_class,
+               repr(sorted(self.connection_kwargs.items())))
+
+        if key not in _connections:
+            _connections[key] = Redis(connection_pool=ConnectionPool(
+                connection_class=self.connection_class,
+                max_connections=self.max_connections,
+                **self.connection_kwargs
+            ))
+
+        self.connection = _connections[key]
 
     def add_job(self, step_key: str, data):
-        step_data = StepData(data)
-        step_data_str = ujson.dumps({'data': step_data.get_dict()})
-        self.connection.lpush(self.redis_queue_key(step_key), step_data_str)
+        self.add_jobs(step_key, [data])
+
+    def add_jobs(self, step_key: str, jobs):
+        """
+        Write jobs by one LPUSH command.
+        """
+        if not jobs:
+            return
+
+        payloads = [ujson.dumps({'data': StepData(data).get_dict()})
+                    for data in jobs]
+        self.connection.lpush(self.redis_queue_key(step_key), *payloads)
+
+    def jobs_count(self, step_key: str) -> int:
+        return self.connection.llen(self.redis_queue_key(step_key))
 
     def redis_queue_key(self, job_key):
         return "stepist::%s" % job_key
-
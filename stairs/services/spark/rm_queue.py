@@ -4,6 +4,11 @@ import ujson
 import pika
 
 
+# Connections and channels of current (executor) process, reused by all
+# partitions
+_connections = dict()
+
+
 def get_connection(rmq_engine):
     impl = rmq_engine.pika_connection._impl
     return RMQConnection(impl.__class__, impl.params)
@@ -16,28 +21,58 @@ class RMQConnection:
 
         self.connection = None
         self.channel = None
-        self.queues = None
+        self.queues = set()
 
     def init_connection(self):
-        self.connection = pika.BlockingConnection(_impl_class=self._impl_class,
-                                                  parameters=self.params)
-        self.channel = self.connection.channel()
+        key = (self._impl_class, repr(self.params))
+
+        connection, channel = _connections.get(key, (None, None))
+
+        if connection is None or connection.is_closed:
+            if channel is not None and channel.is_open:
+                channel.close()
+
+            connection = pika.BlockingConnection(
+                _impl_class=self._impl_class,
+                parameters=self.params
+            )
+            channel = None
+
+        if channel is None or not channel.is_open:
+            channel = connection.channel()
+
+        _connections[key] = (connection, channel)
+
+        self.connection = connection
+        self.channel = channel
 
     def register_queue(self, step_key):
         self.channel.queue_declare(queue=step_key,
                                    auto_delete=False,
                                    passive=True)
+        self.queues.add(step_key)
 
     def add_job(self, step_key: str, data):
+        self.add_jobs(step_key, [data])
+
+    def add_jobs(self, step_key: str, jobs):
         if step_key not in self.queues:
             self.register_queue(step_key)
 
-        step_data = StepData(data)
-        step_data_str = ujson.dumps({'data': step_data.get_dict()})
+        for data in jobs:
+            # the same payload as stepist RQAdapter writes (without
+            # `data` wrapper of redis queue)
+            step_data = StepData(data)
+            step_data_str = ujson.dumps(step_data.get_dict())
 
-        self.channel.basic_publish(
-            exchange='',
-            routing_key=step_key,
-            body=step_data_str
-        )
+            self.channel.basic_publish(
+                exchange='',
+                routing_key=step_key,
+                body=step_data_str
+            )
 
+    def jobs_count(self, step_key: str) -> int:
+        queue = self.channel.queue_declare(queue=step_key,
+                                           auto_delete=False,
+                                           passive=True)
+        return queue.method.message_count
@@ -3,6 +3,13 @@ from stepist.flow.steps.step import StepData
 import ujson
 
 
+# SQS limit of messages in one SendMessageBatch request
+MAX_BATCH_SIZE = 10
+
+# Clients of current (executor) process, reused by all partitions
+_clients = dict()
+
+
 def get_connection(sqs_engine):
     queues = sqs_engine._queues.keys()
     return SQSConnection(sqs_engine.session,
@@ -11,6 +18,24 @@ def get_connection(sqs_engine):
                          sqs_engine.visibility_timeout)
 
 
+def get_session_key(session):
+    """
+    Sessions with the same region, profile and credentials share clients.
+
+    Session may be a `boto3` module itself (stepist default), which has no
+    region, profile and credentials.
+    """
+    credentials = None
+    if hasattr(session, 'get_credentials'):
+        session_credentials = session.get_credentials()
+        if session_credentials is not None:
+            credentials = tuple(session_credentials.get_frozen_credentials())
+
+    return (getattr(session, 'region_name', None),
+            getattr(session, 'profile_name', None),
+            credentials)
+
+
 class SQSConnection:
     def __init__(self, sqs_session, queues_keys, message_retention_period,
                  visibility_timeout):
@@ -22,14 +47,20 @@ class SQSConnection:
 
         self.connection = None
         self.channel = None
-        self.queues = None
+        self.queues = dict()
 
     def init_connection(self):
-        self.sqs_client = self.sqs_session.client('sqs')
-        self.sqs_resource = self.sqs_session.resource('sqs')
+        key = get_session_key(self.sqs_session)
+        if key not in _clients:
+            _clients[key] = (self.sqs_session.client('sqs'),
+                             self.sqs_session.resource('sqs'),
+                             dict())
+
+        self.sqs_client, self.sqs_resource, self.queues = _clients[key]
 
         for q in self.queues_keys:
-            self.register_worker(q)
+            if q not in self.queues:
+                self.register_worker(q)
 
     def register_worker(self, queue_name):
         attrs = {}
@@ -48,13 +79,20 @@ class SQSConnection:
 
         self.queues[queue_name] = queue
 
-    def add_job(self, step_key: str, data):
+    def get_queue(self, step_key):
         queue = self.queues.get(step_key, None)
         if not queue:
             raise RuntimeError("Queue %s not found" % step_key)
 
+        return queue
+
+    def add_job(self, step_key: str, data):
+        queue = self.get_queue(step_key)
+
+        # the same payload as stepist SQSAdapter writes (without `data`
+        # wrapper of redis queue)
         step_data = StepData(data)
-        step_data_str = ujson.dumps({'data': step_data.get_dict()})
+        step_data_str = ujson.dumps(step_data.get_dict())
 
         kwargs = {
             'MessageBody': step_data_str,
@@ -65,3 +103,29 @@ class SQSConnection:
         ret = queue.send_message(**kwargs)
         return ret['MessageId']
 
+    def add_jobs(self, step_key: str, jobs):
+        """
+        Send jobs by batches of 10 messages (SQS limit).
+        """
+        queue = self.get_queue(step_key)
+
+        for i in range(0, len(jobs), MAX_BATCH_SIZE):
+            entries = [
+                {
+                    'Id': str(j),
+                    'MessageBody': ujson.dumps(StepData(data).get_dict()),
+                }
+                for j, data in enumerate(jobs[i:i + MAX_BATCH_SIZE])
+            ]
+
+            ret = queue.send_messages(Entries=entries)
+            if ret.get('Failed'):
+                raise RuntimeError("Can't send %s jobs to %s: %s" %
+                                   (len(ret['Failed']), step_key,
+                                    ret['Failed'][0].get('Message')))
+
+    def jobs_count(self, step_key: str) -> int:
+        queue = self.get_queue(step_key)
+        queue.load()
+        return int(queue.attributes.get('ApproximateNumberOfMessages', 0))
+
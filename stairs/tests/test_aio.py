@@ -0,0 +1,75 @@
+import asyncio
+import unittest
+
+from stairs import Checkpoint, Chunk, Encoded
+from stairs.core.producer.aio import iter_async_jobs
+
+
+async def fetch_page(page, delay):
+    await asyncio.sleep(delay)
+    return [dict(page=page, i=i) for i in range(2)]
+
+
+class AsyncJobsTestCase(unittest.TestCase):
+
+    def test_checkpoint_after_awaitables(self):
+        async def producer():
+            for page in range(3):
+                # first pages are the slowest
+                yield fetch_page(page, 0.01 * (3 - page))
+            yield Checkpoint(3)
+            yield fetch_page(3, 0)
+            yield Checkpoint(4)
+
+        jobs = list(iter_async_jobs(producer(), concurrency=5))
+
+        checkpoints = [i for i, job in enumerate(jobs)
+                       if isinstance(job, Checkpoint)]
+        self.assertEqual(checkpoints, [6, 9])
+        self.assertEqual(sorted(job['page'] for job in jobs[:6]),
+                         [0, 0, 1, 1, 2, 2])
+        self.assertEqual([job['page'] for job in jobs[7:9]], [3, 3])
+
+    def test_ordered_rejects_awaitables(self):
+        async def producer():
+            yield dict(page=0)
+            yield fetch_page(1, 0)
+
+        jobs = iter_async_jobs(producer(), ordered=True)
+
+        self.assertEqual(next(jobs), dict(page=0))
+        with self.assertRaises(RuntimeError):
+            next(jobs)
+
+    def test_ordered_jobs(self):
+        async def producer():
+            for i in range(5):
+                yield dict(i=i)
+                yield Checkpoint(i)
+
+        jobs = list(iter_async_jobs(producer(), ordered=True))
+
+        self.assertEqual([job['i'] for job in jobs[::2]], list(range(5)))
+        self.assertEqual([job.value for job in jobs[1::2]], list(range(5)))
+
+    def test_awaitable_results(self):
+        encoded = Encoded('{"page": 0}', source="api")
+        chunk = Chunk({'page': [1, 1]})
+
+        async def result(value):
+            return value
+
+        async def producer():
+            yield result(encoded)
+            yield result(chunk)
+            yield result(None)
+            yield result([dict(page=2), dict(page=3)])
+
+        jobs = list(iter_async_jobs(producer(), concurrency=1))
+
+        # results are converted to jobs the same way as yielded data
+        self.assertEqual(jobs, [encoded, chunk, dict(page=2), dict(page=3)])
+
+
+if __name__ == '__main__':
+    unittest.main()
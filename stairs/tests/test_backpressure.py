@@ -0,0 +1,172 @@
+import types
+import unittest
+from unittest import mock
+
+import redis
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+from stepist.flow.workers.adapters.rm_queue import RQAdapter
+from stepist.flow.workers.adapters.sqs_queue import SQSAdapter
+
+from stairs import StairsProject, App
+from stairs.core.worker import backpressure
+from stairs.core.worker import queues
+from stairs.core.worker.backpressure import QueueBackpressure
+
+
+class FakeStep:
+    def step_key(self):
+        return "app:step"
+
+    def get_queue_name(self):
+        return "app:step"
+
+
+class FakeEngine:
+    """
+    Worker engine with a queue which is processed by workers only while
+    producer sleeps.
+    """
+
+    def __init__(self, jobs_count, processed_per_sleep):
+        self.count = jobs_count
+        self.processed_per_sleep = processed_per_sleep
+        self.counts_seen = []
+
+    def jobs_count(self, step):
+        self.counts_seen.append(self.count)
+        return self.count
+
+    def sleep(self, seconds):
+        self.count = max(self.count - self.processed_per_sleep, 0)
+
+
+class QueueBackpressureTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.project = StairsProject()
+
+    def wait(self, engine, jobs_amount=1):
+        pressure = QueueBackpressure(engine, [FakeStep()],
+                                     high_watermark=10, low_watermark=4)
+        with mock.patch.object(backpressure.time, 'sleep', engine.sleep):
+            pressure.wait(jobs_amount)
+
+        return pressure
+
+    def test_pause_until_low_watermark(self):
+        engine = FakeEngine(jobs_count=10, processed_per_sleep=2)
+        pressure = self.wait(engine)
+
+        # paused at high watermark, resumed at low one
+        self.assertEqual(engine.counts_seen, [10, 8, 6, 4])
+        self.assertEqual(pressure.estimated_jobs_count, 5)
+
+    def test_no_pause_below_high_watermark(self):
+        engine = FakeEngine(jobs_count=9, processed_per_sleep=2)
+        self.wait(engine)
+
+        self.assertEqual(engine.counts_seen, [9])
+
+    def test_estimated_jobs_count(self):
+        engine = FakeEngine(jobs_count=0, processed_per_sleep=0)
+        pressure = self.wait(engine, jobs_amount=6)
+
+        # queue is checked again only when estimation reaches high watermark
+        pressure.wait(3)
+        self.assertEqual(engine.counts_seen, [0])
+
+        pressure.wait(1)
+        self.assertEqual(engine.counts_seen, [0, 0])
+
+
+@unittest.skipIf(fakeredis is None, "fakeredis is not installed")
+class ProducerBackpressureTestCase(unittest.TestCase):
+
+    def setUp(self):
+        server = fakeredis.FakeServer()
+
+        def fake_redis(*args, **kwargs):
+            return fakeredis.FakeRedis(server=server)
+
+        for name in ('Redis', 'StrictRedis'):
+            patcher = mock.patch.object(redis, name, fake_redis)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.project = StairsProject()
+        self.app = App("backpressure_%s" % self._testMethodName)
+
+    def test_producer_paused(self):
+        pipeline = self.app.pipeline()(
+            lambda pipeline, x: x.subscribe_func(lambda x: dict(),
+                                                 name='nothing'))
+
+        def producer():
+            for i in range(10):
+                yield dict(x=i)
+
+        producer = self.app.producer(pipeline, chunk_size=1, queue_limit=4,
+                                     queue_low_limit=2)(producer)
+        self.app.compile_components()
+
+        worker_engine = self.project.stepist_app.worker_engine
+        counts_on_sleep = []
+        processed = []
+
+        def process_job(seconds):
+            # worker takes one job, while producer waits
+            counts_on_sleep.append(queues.jobs_count(worker_engine,
+                                                     pipeline.step))
+            processed.extend(queues.receive_jobs(worker_engine,
+                                                 pipeline.step, 1))
+
+        with mock.patch.object(backpressure.time, 'sleep', process_job):
+            producer.run()
+
+        # paused at `queue_limit`, resumed at `queue_low_limit`
+        self.assertEqual(counts_on_sleep, [4, 3] * 3)
+        self.assertEqual(len(processed) + queues.jobs_count(worker_engine,
+                                                            pipeline.step),
+                         10)
+
+
+class JobsCountTestCase(unittest.TestCase):
+
+    def test_sqs(self):
+        client = mock.Mock()
+        client.get_queue_url.return_value = dict(QueueUrl='url')
+        client.get_queue_attributes.return_value = dict(
+            Attributes=dict(ApproximateNumberOfMessages='7'))
+
+        engine = SQSAdapter.__new__(SQSAdapter)
+        engine.sqs_client = client
+
+        self.assertEqual(queues.jobs_count(engine, FakeStep()), 7)
+        client.get_queue_url.assert_called_once_with(QueueName='app-step')
+        client.get_queue_attributes.assert_called_once_with(
+            QueueUrl='url', AttributeNames=['ApproximateNumberOfMessages'])
+
+    def test_rabbitmq(self):
+        counts = iter([5, 2])
+
+        def queue_declare(queue, auto_delete, passive):
+            self.assertTrue(passive)
+            method = types.SimpleNamespace(message_count=next(counts))
+            return types.SimpleNamespace(method=method)
+
+        engine = RQAdapter.__new__(RQAdapter)
+        engine.channel_producer = types.SimpleNamespace(
+            queue_declare=queue_declare)
+
+        # current amount of messages, not the one from queue registration
+        self.assertEqual(queues.jobs_count(engine, FakeStep()), 5)
+        self.assertEqual(queues.jobs_count(engine, FakeStep()), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+import unittest
+from unittest import mock
+
+import redis
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+from stairs import StairsProject, App
+from stairs.core.worker import queues
+from stairs.core.worker.bulk import BulkWorker
+
+
+@unittest.skipIf(fakeredis is None, "fakeredis is not installed")
+class BatchComponentTestCase(unittest.TestCase):
+    """
+    Batch component takes more jobs from its queue, calls function once
+    and forwards result of each job to the next component.
+    """
+
+    def setUp(self):
+        server = fakeredis.FakeServer()
+
+        def fake_redis(*args, **kwargs):
+            return fakeredis.FakeRedis(server=server)
+
+        for name in ('Redis', 'StrictRedis'):
+            patcher = mock.patch.object(redis, name, fake_redis)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.project = StairsProject()
+        self.app = App("batch_%s" % self._testMethodName)
+        self.worker_engine = self.project.stepist_app.worker_engine
+
+        self.batches = []
+        self.forwarded = []
+
+    def score(self, items):
+        self.batches.append([item['x'] for item in items])
+        return [dict(y=item['x'] * 10) for item in items]
+
+    def forward(self, x, y):
+        self.forwarded.append((x, y))
+        return dict()
+
+    def compile(self, score, forward):
+        def pipeline(pipeline, x):
+            return x.subscribe_func(score, batch_size=3, name='score') \
+                    .subscribe_func(forward, name='forward')
+
+        def producer():
+            for i in range(5):
+                yield dict(x=i)
+
+        pipeline = self.app.pipeline()(pipeline)
+        producer = self.app.producer(pipeline)(producer)
+        self.app.compile_components()
+
+        producer.run()
+
+        # move jobs from pipeline input to the queue of batch component
+        pipeline_step, batch_step = pipeline.get_workers_steps()
+        for job in queues.receive_jobs(self.worker_engine, pipeline_step, 5):
+            pipeline_step.receive_job(**job)
+
+        return batch_step
+
+    def jobs_count(self, step):
+        return queues.jobs_count(self.worker_engine, step)
+
+    def receive_batch(self, step):
+        """
+        Take one job, as stepist worker does, and let batch component
+        gather the rest.
+        """
+        job, = queues.receive_jobs(self.worker_engine, step, 1)
+        step.receive_job(**job)
+
+    def test_gather_and_scatter(self):
+        step = self.compile(self.score, self.forward)
+
+        self.receive_batch(step)
+        self.assertEqual(self.batches, [[0, 1, 2]])
+        self.assertEqual(self.forwarded, [(0, 0), (1, 10), (2, 20)])
+        self.assertEqual(self.jobs_count(step), 2)
+
+        self.receive_batch(step)
+        self.assertEqual(self.batches, [[0, 1, 2], [3, 4]])
+        self.assertEqual(self.forwarded[3:], [(3, 30), (4, 40)])
+        self.assertEqual(self.jobs_count(step), 0)
+
+    def test_batch_function_failed(self):
+        def score(items):
+            raise ValueError("Batch failed")
+
+        step = self.compile(score, self.forward)
+
+        with self.assertRaises(ValueError):
+            self.receive_batch(step)
+
+        # gathered jobs are returned, the first one is returned by worker
+        self.assertEqual(self.jobs_count(step), 4)
+
+    def test_next_step_failed(self):
+        def forward(x, y):
+            if x == 1:
+                raise ValueError("Next step failed")
+            return self.forward(x, y)
+
+        step = self.compile(self.score, forward)
+
+        with self.assertRaises(ValueError):
+            self.receive_batch(step)
+
+        self.assertEqual(self.forwarded, [(0, 0)])
+        self.assertEqual(self.jobs_count(step), 4)
+
+    def test_next_step_failed_in_outbox(self):
+        def forward(x, y):
+            if x == 1:
+                raise ValueError("Next step failed")
+            return self.forward(x, y)
+
+        step = self.compile(self.score, forward)
+
+        worker = BulkWorker(self.worker_engine, [step], prefetch_count=1,
+                            prefetch=False, die_when_empty=True)
+        with self.assertRaises(ValueError):
+            worker.run()
+
+        # all jobs of the batch are back in the queue
+        self.assertEqual(self.jobs_count(step), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+import time
+import unittest
+from unittest import mock
+
+import redis
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+from stairs import StairsProject, App
+from stairs.core.worker import outbox, queues
+from stairs.core.worker.bulk import BulkWorker, BatchFetcher
+
+
+class FakeReserver(queues.JobsReserver):
+    """
+    Reserver which gives a number to each job, and logs acknowledgements.
+    """
+
+    def __init__(self, worker_engine, log):
+        super().__init__(worker_engine)
+        self.log = log
+        self.receipts_count = 0
+
+    def reserve(self, step, count):
+        jobs = []
+        for job, _ in super().reserve(step, count):
+            jobs.append((job, self.receipts_count))
+            self.receipts_count += 1
+
+        return jobs
+
+    def ack(self, step, receipts):
+        self.log.append(('ack', list(receipts)))
+
+
+@unittest.skipIf(fakeredis is None, "fakeredis is not installed")
+class BulkWorkerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        server = fakeredis.FakeServer()
+
+        def fake_redis(*args, **kwargs):
+            return fakeredis.FakeRedis(server=server)
+
+        for name in ('Redis', 'StrictRedis'):
+            patcher = mock.patch.object(redis, name, fake_redis)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.project = StairsProject()
+        self.app = App("bulk_%s" % self._testMethodName)
+        self.worker_engine = self.project.stepist_app.worker_engine
+
+        self.log = []
+        patcher = mock.patch.object(
+            queues, 'get_jobs_reserver',
+            lambda worker_engine: FakeReserver(worker_engine, self.log))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        def multiply(x):
+            return dict(y=x * 10)
+
+        def pipeline(pipeline, x):
+            return x.subscribe_func(multiply, as_worker=True)
+
+        def producer():
+            for i in range(3):
+                yield dict(x=i)
+
+        self.pipeline = self.app.pipeline()(pipeline)
+        producer = self.app.producer(self.pipeline)(producer)
+        self.app.compile_components()
+
+        producer.run()
+        self.step = self.pipeline.get_stepist_step()
+
+    def jobs_count(self, step):
+        return queues.jobs_count(self.worker_engine, step)
+
+    def test_ack_after_outbox_flush(self):
+        write_jobs = queues.write_jobs
+
+        def log_write_jobs(stepist_app, jobs_by_step, transaction=None):
+            self.log.append(('write', sum(len(jobs)
+                                          for step, jobs in jobs_by_step)))
+            write_jobs(stepist_app, jobs_by_step, transaction)
+
+        worker = BulkWorker(self.worker_engine, [self.step],
+                            prefetch_count=10, prefetch=False,
+                            die_when_empty=True)
+        worker.wait_time_for_job = 0
+
+        with mock.patch.object(outbox.queues, 'write_jobs', log_write_jobs):
+            worker.run()
+
+        # jobs are acknowledged only after their output is written
+        self.assertEqual(self.log, [('write', 3), ('ack', [0, 1, 2])])
+
+        _, multiply_step = self.pipeline.get_workers_steps()
+        self.assertEqual(self.jobs_count(multiply_step), 3)
+
+    def test_stop_returns_prefetched_jobs(self):
+        fetcher = BatchFetcher(self.worker_engine, [self.step], batch_size=2)
+
+        fetcher.request_batch()
+        batch = fetcher.get_batch()
+        self.assertEqual(len(batch), 2)
+
+        # next batch is prefetched while current one in progress
+        fetcher.request_batch()
+        deadline = time.time() + 2
+        while fetcher.results.empty() and time.time() < deadline:
+            time.sleep(0.01)
+
+        fetcher.ack(batch)
+        fetcher.stop()
+
+        # prefetched job is back in the queue, and acknowledged
+        self.assertEqual(self.jobs_count(self.step), 1)
+        self.assertEqual(self.log, [('ack', [0, 1]), ('ack', [2])])
+
+
+class RMQJobsReserverTestCase(unittest.TestCase):
+
+    def test_ack_each_receipt(self):
+        reserver = queues.RMQJobsReserver.__new__(queues.RMQJobsReserver)
+        reserver.channel = mock.Mock()
+
+        reserver.ack(None, [3, 5])
+
+        # prefetched messages (e.g. 4) are not acknowledged
+        self.assertEqual(reserver.channel.basic_ack.call_args_list,
+                         [mock.call(delivery_tag=3),
+                          mock.call(delivery_tag=5)])
+
+
+if __name__ == '__main__':
+    unittest.main()
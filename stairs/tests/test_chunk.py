@@ -0,0 +1,142 @@
+import unittest
+
+from stairs import StairsProject, App, Chunk
+from stairs.core.pipeline.chunk import CHUNK_KEY, iter_rows
+
+
+class ChunkPipelineTestCase(unittest.TestCase):
+    """
+    Chunk job goes through the pipeline in the same way as its rows,
+    one by one.
+    """
+
+    def setUp(self):
+        self.project = StairsProject()
+        self.app = App("chunk_%s" % self._testMethodName)
+        self.seen = []
+
+    def see(self, x, y=None, z=None):
+        self.seen.append((x, y, z))
+        return dict(seen=(x, y, z))
+
+    def compile(self, pipeline_func):
+        pipeline = self.app.pipeline()(pipeline_func)
+        self.app.compile_components()
+        return pipeline
+
+    def run_rows(self, pipeline, values):
+        outputs = [pipeline(x=x) for x in values]
+        return outputs, self.pop_seen()
+
+    def run_chunk(self, pipeline, values):
+        output = pipeline(**Chunk({'x': values}).to_job())
+
+        outputs = None
+        if output is not None:
+            outputs = list(iter_rows(output, output[CHUNK_KEY]))
+        return outputs, self.pop_seen()
+
+    def pop_seen(self):
+        seen, self.seen = self.seen, []
+        return seen
+
+    def assert_same_outputs(self, rows_outputs, chunk_outputs):
+        self.assertEqual(len(rows_outputs), len(chunk_outputs))
+
+        for row_output, chunk_output in zip(rows_outputs, chunk_outputs):
+            # rows without some key get None in chunk column
+            for key, value in chunk_output.items():
+                self.assertEqual(row_output.get(key), value)
+
+    def test_when(self):
+        def multiply(x):
+            return dict(y=x * 10)
+
+        pipeline = self.compile(
+            lambda pipeline, x: x.subscribe_func(multiply,
+                                                 when=lambda x: x > 1)
+                                 .subscribe_func(self.see))
+
+        rows_outputs, rows_seen = self.run_rows(pipeline, [1, 2, 3])
+        chunk_outputs, chunk_seen = self.run_chunk(pipeline, [1, 2, 3])
+
+        self.assertEqual(rows_seen, [(1, None, None),
+                                     (2, 20, None),
+                                     (3, 30, None)])
+        self.assertEqual(chunk_seen, rows_seen)
+        self.assert_same_outputs(rows_outputs, chunk_outputs)
+
+    def test_mixed_result_keys(self):
+        def split(x):
+            # even rows overwrite input value
+            if x % 2:
+                return dict(y=x)
+            return dict(x=x * 100, z=x)
+
+        pipeline = self.compile(
+            lambda pipeline, x: x.subscribe_func(split)
+                                 .subscribe_func(self.see))
+
+        rows_outputs, rows_seen = self.run_rows(pipeline, [1, 2, 3])
+        chunk_outputs, chunk_seen = self.run_chunk(pipeline, [1, 2, 3])
+
+        self.assertEqual(rows_seen, [(1, 1, None),
+                                     (200, None, 2),
+                                     (3, 3, None)])
+        self.assertEqual(chunk_seen, rows_seen)
+        self.assert_same_outputs(rows_outputs, chunk_outputs)
+
+    def test_producer(self):
+        def produce(x):
+            for i in range(x):
+                yield dict(y=i) if i % 2 else dict(x=x * 100, z=i)
+
+        pipeline = self.compile(
+            lambda pipeline, x: x.subscribe_func_as_producer(produce)
+                                 .subscribe_func(self.see))
+
+        _, rows_seen = self.run_rows(pipeline, [1, 3])
+        _, chunk_seen = self.run_chunk(pipeline, [1, 3])
+
+        self.assertEqual(rows_seen, [(100, None, 0),
+                                     (300, None, 0),
+                                     (3, 1, None),
+                                     (300, None, 2)])
+        self.assertEqual(chunk_seen, rows_seen)
+
+    def test_consumer(self):
+        consumer = self.app.consumer()(self.see)
+
+        pipeline = self.compile(
+            lambda pipeline, x: x.subscribe_func(lambda x: dict(y=x * 10),
+                                                 name='multiply')
+                                 .subscribe_consumer(consumer))
+
+        rows_outputs, rows_seen = self.run_rows(pipeline, [1, 2, 3])
+        chunk_outputs, chunk_seen = self.run_chunk(pipeline, [1, 2, 3])
+
+        self.assertEqual(rows_seen, [(1, 10, None),
+                                     (2, 20, None),
+                                     (3, 30, None)])
+        self.assertEqual(chunk_seen, rows_seen)
+        self.assert_same_outputs(rows_outputs, chunk_outputs)
+
+    def test_apply_func_vectorized(self):
+        calls = []
+
+        def multiply(x):
+            calls.append(len(x))
+            return dict(y=x * 10)
+
+        pipeline = self.compile(
+            lambda pipeline, x: x.apply_func(multiply, vectorized=True))
+
+        chunk_outputs, _ = self.run_chunk(pipeline, [1, 2, 3])
+
+        # called once with the whole column
+        self.assertEqual(calls, [3])
+        self.assertEqual([row['y'] for row in chunk_outputs], [10, 20, 30])
+
+
+if __name__ == '__main__':
+    unittest.main()
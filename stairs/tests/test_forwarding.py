@@ -0,0 +1,194 @@
+import time
+import unittest
+from unittest import mock
+
+import redis
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+from stairs import StairsProject, App, concatenate
+from stairs.core.pipeline import forwarding
+from stairs.core.worker import queues
+
+
+def make_target(name):
+    def target(pipeline, x):
+        return x.subscribe_func(lambda x: dict(), name='nothing')
+
+    target.__name__ = name
+    return target
+
+
+@unittest.skipIf(fakeredis is None, "fakeredis is not installed")
+class ForwardingTestCase(unittest.TestCase):
+    """
+    `call_pipeline` with `batch_size` buffers forwarded jobs and writes
+    them in bulk.
+    """
+
+    def setUp(self):
+        server = fakeredis.FakeServer()
+
+        def fake_redis(*args, **kwargs):
+            return fakeredis.FakeRedis(server=server)
+
+        for name in ('Redis', 'StrictRedis'):
+            patcher = mock.patch.object(redis, name, fake_redis)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.project = StairsProject()
+        self.app = App("forwarding_%s" % self._testMethodName)
+        self.worker_engine = self.project.stepist_app.worker_engine
+
+        self.target = self.app.pipeline()(make_target('target'))
+
+    def compile(self, batch_size, max_wait_ms=None):
+        def forward(pipeline, x):
+            return x.call_pipeline(self.target,
+                                   batch_size=batch_size,
+                                   max_wait_ms=max_wait_ms)
+
+        pipeline = self.app.pipeline()(forward)
+        self.app.compile_components()
+
+        return pipeline
+
+    def jobs_count(self):
+        return queues.jobs_count(self.worker_engine,
+                                 self.target.get_stepist_step())
+
+    def wait_jobs(self, count, timeout=2):
+        deadline = time.time() + timeout
+        while self.jobs_count() < count and time.time() < deadline:
+            time.sleep(0.01)
+
+        return self.jobs_count()
+
+    def test_batch_size(self):
+        pipeline = self.compile(batch_size=3)
+
+        pipeline(x=1)
+        pipeline(x=2)
+        self.assertEqual(self.jobs_count(), 0)
+
+        pipeline(x=3)
+        self.assertEqual(self.jobs_count(), 3)
+
+    def test_max_wait_ms(self):
+        pipeline = self.compile(batch_size=100, max_wait_ms=20)
+
+        # written by flusher, without waiting for the next job
+        pipeline(x=1)
+        self.assertEqual(self.wait_jobs(1), 1)
+
+        pipeline(x=2)
+        self.assertEqual(self.wait_jobs(2), 2)
+
+    def test_flush_at_exit(self):
+        pipeline = self.compile(batch_size=100)
+
+        pipeline(x=1)
+        pipeline(x=2)
+        self.assertEqual(self.jobs_count(), 0)
+
+        forwarding.flush_all()
+        self.assertEqual(self.jobs_count(), 2)
+
+    def test_write_failed(self):
+        pipeline = self.compile(batch_size=2)
+
+        pipeline(x=1)
+        with mock.patch.object(queues, 'write_jobs',
+                               side_effect=ConnectionError("Write failed")):
+            with self.assertRaises(ConnectionError):
+                pipeline(x=2)
+
+        # jobs stay in the buffer and written later
+        self.assertEqual(self.jobs_count(), 0)
+
+        forwarding.flush_all()
+        self.assertEqual(self.jobs_count(), 2)
+
+
+@unittest.skipIf(fakeredis is None, "fakeredis is not installed")
+class RouteTestCase(unittest.TestCase):
+    """
+    `DataFrame.route` forwards each job to the pipeline of its key.
+    """
+
+    def setUp(self):
+        server = fakeredis.FakeServer()
+
+        def fake_redis(*args, **kwargs):
+            return fakeredis.FakeRedis(server=server)
+
+        for name in ('Redis', 'StrictRedis'):
+            patcher = mock.patch.object(redis, name, fake_redis)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.project = StairsProject()
+        self.app = App("route_%s" % self._testMethodName)
+        self.worker_engine = self.project.stepist_app.worker_engine
+
+        self.targets = {name: self.app.pipeline()(make_target(name))
+                        for name in ('clicks', 'views', 'other')}
+
+    def compile(self, **route_kwargs):
+        routes = {'click': self.targets['clicks'],
+                  'view': self.targets['views']}
+
+        def route(pipeline, event, x):
+            return concatenate(event=event, x=x) \
+                .route(lambda event: event, routes, **route_kwargs)
+
+        pipeline = self.app.pipeline()(route)
+        self.app.compile_components()
+
+        return pipeline
+
+    def forwarded(self, name):
+        step = self.targets[name].get_stepist_step()
+        jobs = queues.receive_jobs(self.worker_engine, step, 100)
+        return sorted(job['flow_data']['x'] for job in jobs)
+
+    def send_events(self, pipeline):
+        for i, event in enumerate(['click', 'view', 'click', 'scroll']):
+            pipeline(event=event, x=i)
+
+    def test_route(self):
+        pipeline = self.compile()
+        self.send_events(pipeline)
+
+        self.assertEqual(self.forwarded('clicks'), [0, 2])
+        self.assertEqual(self.forwarded('views'), [1])
+        self.assertEqual(self.forwarded('other'), [])
+
+    def test_default(self):
+        pipeline = self.compile(default=self.targets['other'])
+        self.send_events(pipeline)
+
+        self.assertEqual(self.forwarded('clicks'), [0, 2])
+        self.assertEqual(self.forwarded('other'), [3])
+
+    def test_batch_size(self):
+        pipeline = self.compile(batch_size=3)
+
+        self.send_events(pipeline)
+        # all routes share one buffer
+        self.assertEqual(self.forwarded('clicks'), [0, 2])
+        self.assertEqual(self.forwarded('views'), [1])
+
+        pipeline(event='view', x=4)
+        self.assertEqual(self.forwarded('views'), [])
+
+        forwarding.flush_all()
+        self.assertEqual(self.forwarded('views'), [4])
+
+
+if __name__ == '__main__':
+    unittest.main()
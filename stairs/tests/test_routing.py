@@ -0,0 +1,191 @@
+import itertools
+import unittest
+
+from stairs.core.pipeline.pipeline_objects import PipelineFunction
+from stairs.core.pipeline.pipeline_objects.context import RoutingPlan
+from stairs.core.pipeline.pipeline_objects.transformation import KeyToKey, \
+    KeysToDict, AllKeys
+
+
+def old_input_data(component, data):
+    """
+    Input routing before `RoutingPlan`.
+    """
+    input_data = dict()
+    for key, value in data.items():
+        if '->' in key and component.id in key:
+            input_data[key.split('->')[0]] = value
+
+    return input_data
+
+
+def old_output_data(component, data):
+    """
+    Output routing before `RoutingPlan`.
+    """
+    output_data = dict()
+    data_to_transform = dict()
+    contexts = component.get_context_list()
+
+    for key, value in data.items():
+        related = '->' in key and component.id in key
+
+        if related and not component.update_pipe_data:
+            continue
+
+        if '->' not in key:
+            if not contexts:
+                output_data[key] = value
+            data_to_transform[key] = value
+        elif related:
+            data_to_transform[key.split('->')[0]] = value
+        else:
+            output_data[key] = value
+
+    if contexts:
+        for context in contexts:
+            transformed_data = context.transformation(data_to_transform)
+            output_data.update(context.assign_labels(transformed_data))
+    elif component.update_pipe_data:
+        output_data.update(data_to_transform)
+
+    return output_data
+
+
+class UncachedRoutingPlan(RoutingPlan):
+    __slots__ = ()
+
+    max_cached_keys = 1
+
+
+def make_component(name, update_pipe_data=False):
+    return PipelineFunction(pipeline=None,
+                            component=lambda **kwargs: kwargs,
+                            name=name,
+                            config=dict(),
+                            update_pipe_data=update_pipe_data)
+
+
+TRANSFORMATIONS = {
+    'key_to_key': lambda: KeyToKey({}),
+    'key_to_key_map': lambda: KeyToKey({'a': 'x', 'b': 'y'}),
+    'keys_to_dict': lambda: KeysToDict('d', {}),
+    'keys_to_dict_map': lambda: KeysToDict('d', {'a': 'x'}),
+    'all_keys': lambda: AllKeys({}),
+    'all_keys_map': lambda: AllKeys({'b': 'z'}),
+}
+
+
+class RoutingPlanTestCase(unittest.TestCase):
+    """
+    `RoutingPlan` routes data in the same way as components did before it.
+    """
+
+    def setUp(self):
+        self.next_component = make_component('routing_next')
+        self.other_component = make_component('routing_other')
+
+    def get_data_samples(self, component):
+        current = component.id
+        next_id = self.next_component.id
+        other = self.other_component.id
+
+        return [
+            dict(),
+            dict(a=1, b=2),
+            {'a': 1, 'a->%s' % current: 2, 'c->%s' % current: 3},
+            {'b': 1, 'b->%s' % next_id: 2, 'c->%s' % next_id: 3},
+            {'a->%s' % other: 1, 'a->%s' % current: 2, 'a': 3},
+            {'a': 1, 'b': 2, 'c': 3,
+             'a->%s' % current: 4, 'b->%s' % next_id: 5,
+             'c->%s' % other: 6},
+        ]
+
+    def get_components(self):
+        """
+        Components with all kinds of contexts, "apply" and "subscribe" ones.
+        """
+        for update_pipe_data in (False, True):
+            yield make_component('routing_last', update_pipe_data)
+
+            for name, transformation in TRANSFORMATIONS.items():
+                component = make_component('routing_' + name,
+                                           update_pipe_data)
+                component.add_context(self.next_component, transformation())
+                yield component
+
+            # several contexts
+            component = make_component('routing_many', update_pipe_data)
+            for name, transformation in TRANSFORMATIONS.items():
+                component.add_context(make_component('routing_to_' + name),
+                                      transformation())
+            yield component
+
+    def test_input_data(self):
+        for component in self.get_components():
+            plan = RoutingPlan(component)
+
+            # second pass uses cached routes
+            for data in self.get_data_samples(component) * 2:
+                self.assertEqual(plan.get_input_data(data),
+                                 old_input_data(component, data))
+
+    def test_output_data(self):
+        for component in self.get_components():
+            plan = RoutingPlan(component)
+
+            for data in self.get_data_samples(component) * 2:
+                self.assertEqual(plan.get_output_data(data),
+                                 old_output_data(component, data),
+                                 (component.id, data))
+
+    def test_component_routing(self):
+        for component in self.get_components():
+            data = self.get_data_samples(component)[-1]
+
+            self.assertEqual(component.validate_input_data(data),
+                             old_input_data(component, data))
+            self.assertEqual(component.validate_output_data(data),
+                             old_output_data(component, data))
+
+    def test_result_over_kwargs(self):
+        """
+        Routed result overwrites routed kwargs, as `{**kwargs, **result}`.
+        """
+        for component in self.get_components():
+            samples = self.get_data_samples(component)
+
+            for kwargs, result in itertools.product(samples, samples):
+                output = component.validate_output_data(kwargs)
+                output = component.validate_output_data(result, output)
+
+                self.assertEqual(output,
+                                 {**old_output_data(component, kwargs),
+                                  **old_output_data(component, result)})
+
+    def test_forwarded_key_of_result(self):
+        component = make_component('routing_forward')
+        component.add_context(self.next_component, KeyToKey({}))
+        key = 'a->%s' % self.next_component.id
+
+        output = component.validate_output_data({key: 'kwargs'})
+        output = component.validate_output_data({key: 'result'}, output)
+        self.assertEqual(output, {key: 'result'})
+
+        # label of the current component wins over forwarded key
+        output = component.validate_output_data({key: 'forwarded',
+                                                 'a': 'label'})
+        self.assertEqual(output, {key: 'label'})
+
+    def test_output_data_without_cache(self):
+        for component in self.get_components():
+            plan = UncachedRoutingPlan(component)
+
+            for data in self.get_data_samples(component) * 2:
+                self.assertEqual(plan.get_output_data(data),
+                                 old_output_data(component, data),
+                                 (component.id, data))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+import threading
+import unittest
+from unittest import mock
+
+import redis
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+from stairs import StairsProject, App
+
+
+@unittest.skipIf(fakeredis is None, "fakeredis is not installed")
+class RunTrackerTestCase(unittest.TestCase):
+    """
+    Jobs of tracked producer run are counted while they go through workers,
+    and completion event is published when all of them processed.
+    """
+
+    def setUp(self):
+        server = fakeredis.FakeServer()
+
+        def fake_redis(*args, **kwargs):
+            return fakeredis.FakeRedis(server=server)
+
+        for name in ('Redis', 'StrictRedis'):
+            patcher = mock.patch.object(redis, name, fake_redis)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.project = StairsProject()
+        self.app = App("runs_%s" % self._testMethodName)
+        self.runs = self.project.runs
+        self.outstanding = []
+
+    def compile(self, last_func):
+        def multiply(x):
+            return dict(y=x * 10)
+
+        def pipeline(pipeline, x):
+            return x.subscribe_func(multiply, as_worker=True) \
+                    .subscribe_func(last_func, as_worker=True)
+
+        def producer():
+            for i in range(3):
+                yield dict(x=i)
+
+        pipeline = self.app.pipeline()(pipeline)
+        producer = self.app.producer(pipeline, track_runs=True)(producer)
+        self.app.compile_components()
+
+        return pipeline, producer
+
+    def remember_outstanding(self, y):
+        self.outstanding.append(self.runs.outstanding_jobs(self.run_id))
+        return dict()
+
+    def test_run_completed(self):
+        pipeline, producer = self.compile(self.remember_outstanding)
+
+        producer.run()
+        self.run_id = producer.last_run_id
+
+        # producer completed itself, its jobs are outstanding
+        self.assertEqual(self.runs.outstanding_jobs(self.run_id), 3)
+        self.assertFalse(self.runs.is_done(self.run_id))
+
+        waited = []
+        waiter = threading.Thread(
+            target=lambda: waited.append(self.runs.wait(self.run_id,
+                                                        timeout=10)))
+        waiter.start()
+
+        self.project.run_pipelines([pipeline], die_when_empty=True,
+                                   prefetch_count=10)
+        waiter.join()
+
+        # each job of the next worker was counted until it's processed
+        self.assertEqual(len(self.outstanding), 3)
+        self.assertTrue(all(count >= 1 for count in self.outstanding))
+
+        self.assertEqual(waited, [True])
+        self.assertTrue(self.runs.is_done(self.run_id))
+        self.assertEqual(self.runs.outstanding_jobs(self.run_id), 0)
+
+    def test_failed_job(self):
+        failures = [ValueError("Job failed")]
+
+        def fail_once(y):
+            if y == 10 and failures:
+                raise failures.pop()
+            return dict()
+
+        pipeline, producer = self.compile(fail_once)
+
+        producer.run()
+        run_id = producer.last_run_id
+
+        with self.assertRaises(ValueError):
+            self.project.run_pipelines([pipeline], die_when_empty=True,
+                                       prefetch_count=10)
+
+        # failed job (and the rest of the batch) is returned to the queue,
+        # run is not done until it's processed
+        self.assertGreaterEqual(self.runs.outstanding_jobs(run_id), 1)
+        self.assertFalse(self.runs.wait(run_id, timeout=0.1))
+
+        self.project.run_pipelines([pipeline], die_when_empty=True,
+                                   prefetch_count=10)
+
+        self.assertTrue(self.runs.wait(run_id, timeout=1))
+
+    def test_counter_ttl(self):
+        run_id = self.runs.start()
+        counter_key = self.runs.get_counter_key(run_id)
+        redis_db = self.project.dbs.redis_db
+
+        # run which is never completed doesn't stay in redis forever
+        self.assertGreater(redis_db.ttl(counter_key), 0)
+
+        redis_db.expire(counter_key, 10)
+        self.runs.add(run_id, 2)
+        self.assertGreater(redis_db.ttl(counter_key), 10)
+        self.assertEqual(self.runs.outstanding_jobs(run_id), 3)
+
+    def test_booster_not_supported(self):
+        pipeline, producer = self.compile(self.remember_outstanding)
+
+        with self.assertRaisesRegex(RuntimeError, "can't be tracked"):
+            self.project.run_pipelines([pipeline], die_when_empty=True,
+                                       use_booster=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import types
+import unittest
+
+from stairs.services.spark import sqs_queue
+
+
+class FakeQueue:
+    def __init__(self):
+        self.messages = []
+
+    def send_messages(self, Entries):
+        self.messages.extend(entry['MessageBody'] for entry in Entries)
+        return dict(Successful=Entries)
+
+
+class FakeSQS:
+    def __init__(self):
+        self.created = []
+        self.queues = dict()
+
+    def create_queue(self, QueueName, Attributes):
+        self.created.append(QueueName)
+        self.queues.setdefault(QueueName, FakeQueue())
+
+    def get_queue_by_name(self, QueueName):
+        return self.queues[QueueName]
+
+
+def fake_session_module():
+    """
+    Stub of `boto3` module, which stepist SQSAdapter uses as a default
+    session. Module has no `region_name` and `profile_name`.
+    """
+    sqs = FakeSQS()
+    return types.SimpleNamespace(client=lambda name: sqs,
+                                 resource=lambda name: sqs), sqs
+
+
+def fake_session(access_key):
+    """
+    Stub of `boto3.session.Session` with explicit credentials.
+    """
+    sqs = FakeSQS()
+    credentials = types.SimpleNamespace(
+        get_frozen_credentials=lambda: (access_key, 'secret', None))
+
+    return types.SimpleNamespace(client=lambda name: sqs,
+                                 resource=lambda name: sqs,
+                                 region_name='us-east-1',
+                                 profile_name=None,
+                                 get_credentials=lambda: credentials), sqs
+
+
+class SQSConnectionTestCase(unittest.TestCase):
+
+    def setUp(self):
+        sqs_queue._clients.clear()
+
+    def tearDown(self):
+        sqs_queue._clients.clear()
+
+    def connect(self, session, queues):
+        connection = sqs_queue.SQSConnection(session, queues, None, None)
+        connection.init_connection()
+        return connection
+
+    def test_session_module(self):
+        session, sqs = fake_session_module()
+
+        connection = self.connect(session, ['step'])
+        connection.add_jobs('step', [dict(x=i) for i in range(25)])
+
+        self.assertEqual(len(sqs.queues['step'].messages), 25)
+
+    def test_clients_reused(self):
+        session, sqs = fake_session_module()
+
+        self.connect(session, ['step'])
+        self.connect(session, ['step', 'other_step'])
+
+        # queue registered once per executor process
+        self.assertEqual(sqs.created, ['step', 'other_step'])
+
+    def test_sessions_with_different_credentials(self):
+        first_session, first_sqs = fake_session('first_key')
+        second_session, second_sqs = fake_session('second_key')
+
+        self.connect(first_session, ['step'])
+        connection = self.connect(second_session, ['step'])
+        connection.add_jobs('step', [dict(x=1)])
+
+        # jobs are written to the account of their session
+        self.assertEqual(first_sqs.created, ['step'])
+        self.assertEqual(second_sqs.created, ['step'])
+        self.assertEqual(len(second_sqs.queues['step'].messages), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from stairs.core.pipeline.chunk import iter_rows
+from stairs.core.producer.tables import TableReader
+
+
+ROWS_COUNT = 100
+RANGE_SIZES = (1, 3, 10, 33, 1000)
+
+
+class TableReaderTestCase(unittest.TestCase):
+    """
+    Each row of the table is read exactly once, when all ranges of the
+    split are read.
+    """
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.sqlite')
+        os.close(fd)
+
+        # sparse integer key, unique text key (in other order) and text
+        # key with duplicates
+        rows = [(i * 7, "name_%04d" % (ROWS_COUNT - i), "kind_%d" % (i % 6))
+                for i in range(ROWS_COUNT)]
+
+        connection = sqlite3.connect(self.path)
+        connection.execute("CREATE TABLE items (id INTEGER, name TEXT, "
+                           "kind TEXT)")
+        connection.executemany("INSERT INTO items VALUES (?, ?, ?)", rows)
+        connection.commit()
+        connection.close()
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def connect(self):
+        return sqlite3.connect(self.path)
+
+    def read_all(self, key, range_size, rows_per_job=None):
+        reader = TableReader(self.connect, 'items', key, fetch_size=4)
+
+        rows = []
+        for table_range in reader.split(range_size):
+            for job in reader.read(rows_per_job=rows_per_job, **table_range):
+                if rows_per_job:
+                    rows.extend(iter_rows(job.columns, len(job)))
+                else:
+                    rows.append(job)
+
+        return rows
+
+    def assert_read_once(self, rows):
+        ids = sorted(row['id'] for row in rows)
+        self.assertEqual(ids, [i * 7 for i in range(ROWS_COUNT)])
+
+    def test_integer_key(self):
+        for range_size in RANGE_SIZES:
+            self.assert_read_once(self.read_all('id', range_size))
+
+    def test_text_key(self):
+        for range_size in RANGE_SIZES:
+            self.assert_read_once(self.read_all('name', range_size))
+
+    def test_text_key_with_duplicates(self):
+        for range_size in RANGE_SIZES:
+            self.assert_read_once(self.read_all('kind', range_size))
+
+    def test_chunks(self):
+        self.assert_read_once(self.read_all('id', 50, rows_per_job=8))
+
+
+if __name__ == '__main__':
+    unittest.main()
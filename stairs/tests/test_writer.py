@@ -0,0 +1,96 @@
+import time
+import unittest
+from unittest import mock
+
+import redis
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+from stairs import StairsProject, App
+from stairs.core.worker import queues
+from stairs.core.worker.writer import JobsWriter
+
+
+@unittest.skipIf(fakeredis is None, "fakeredis is not installed")
+class JobsWriterTestCase(unittest.TestCase):
+
+    def setUp(self):
+        server = fakeredis.FakeServer()
+
+        def fake_redis(*args, **kwargs):
+            return fakeredis.FakeRedis(server=server)
+
+        for name in ('Redis', 'StrictRedis'):
+            patcher = mock.patch.object(redis, name, fake_redis)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.project = StairsProject()
+        self.app = App("writer_%s" % self._testMethodName)
+
+        self.pipeline = self.app.pipeline()(
+            lambda pipeline, x: x.subscribe_func(lambda x: dict(),
+                                                 name='nothing'))
+        self.app.compile_components()
+
+        self.stepist_app = self.project.stepist_app
+        self.step = self.pipeline.get_stepist_step()
+
+    def jobs_count(self):
+        return queues.jobs_count(self.stepist_app.worker_engine, self.step)
+
+    def wait_jobs(self, count, timeout=2):
+        deadline = time.time() + timeout
+        while self.jobs_count() < count and time.time() < deadline:
+            time.sleep(0.01)
+
+        return self.jobs_count()
+
+    def test_chunk_size(self):
+        with JobsWriter(self.stepist_app, [self.step], chunk_size=2,
+                        flush_interval=60) as writer:
+            writer.add(dict(x=1))
+            self.assertEqual(self.jobs_count(), 0)
+
+            writer.add(dict(x=2))
+            self.assertEqual(self.jobs_count(), 2)
+
+            writer.add(dict(x=3))
+
+        self.assertEqual(self.jobs_count(), 3)
+        self.assertEqual(writer.written_jobs, 3)
+
+    def test_flush_interval_without_new_jobs(self):
+        with JobsWriter(self.stepist_app, [self.step], chunk_size=1000,
+                        flush_interval=0.05) as writer:
+            writer.add(dict(x=1))
+
+            # producer is slow, job is written without waiting for the next
+            self.assertEqual(self.wait_jobs(1), 1)
+
+            writer.add(dict(x=2))
+            self.assertEqual(self.wait_jobs(2), 2)
+
+        self.assertEqual(writer.written_jobs, 2)
+
+    def test_slow_producer(self):
+        jobs_written_before_next = []
+
+        def producer():
+            yield dict(x=1)
+            jobs_written_before_next.append(self.wait_jobs(1))
+            yield dict(x=2)
+
+        producer = self.app.producer(self.pipeline,
+                                     flush_interval=0.05)(producer)
+        producer.run()
+
+        self.assertEqual(jobs_written_before_next, [1])
+        self.assertEqual(self.jobs_count(), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()